@@ -62,12 +62,11 @@ class HyperparameterConfigValidator():
 			missing_keys = demanded_keys.difference(config_keys)
 			redundant_keys = config_keys.difference(demanded_keys)
 			if missing_keys:
+				# if a boolean value is missing from the config, we assume the user wants its value to be `False`
+				missing_required_keys = {key for key in missing_keys if demanded_fields_as_dict[key] != bool}
+				assert not missing_required_keys, f'your config is missing {missing_required_keys}'
 				for key in missing_keys:
-					# if a boolean value is missing from the config, we assume the user wants its value to be `False`
-					if demanded_fields_as_dict[key] == bool:
-						config[key] = False
-					else:
-						assert False, f'your config is missing {missing_keys}'
+					config[key] = False
 			if redundant_keys:
 				for key in redundant_keys:
 					config.pop(key)
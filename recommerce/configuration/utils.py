@@ -1,6 +1,5 @@
 import importlib
 import os
-import random
 import re
 
 import numpy as np
@@ -21,24 +20,111 @@ def ensure_results_folders_exist():
 		os.makedirs(os.path.join(PathManager.results_path, folder), exist_ok=True)
 
 
-def shuffle_quality(config: AttrDict) -> int:
-	return min(max(int(np.random.normal(config.max_quality / 2, 2 * config.max_quality / 5)), 1), config.max_quality)
+def get_random_generator(random_generator=None) -> np.random.Generator:
+	"""
+	Resolve the different ways of specifying a source of randomness to a `np.random.Generator`.
+
+	Args:
+		random_generator (np.random.Generator, np.random.SeedSequence, int or None, optional): An existing generator is returned as is.
+			A seed or seed sequence creates a new generator from it. None creates a generator with fresh entropy. Defaults to None.
+
+	Returns:
+		np.random.Generator: The generator.
+	"""
+	if isinstance(random_generator, np.random.Generator):
+		return random_generator
+	assert random_generator is None or isinstance(random_generator, (int, np.integer, np.random.SeedSequence)), \
+		f'random_generator must be a np.random.Generator, a np.random.SeedSequence, an int or None: {random_generator}'
+	return np.random.default_rng(random_generator)
+
+
+def spawn_random_generators(random_generator, number_of_generators: int) -> list:
+	"""
+	Create independent child generators, e.g. one per environment of a batch or one per worker process.
+	The children of a seeded parent are reproducible, but do not overlap with each other.
+
+	Args:
+		random_generator (np.random.Generator, np.random.SeedSequence, int or None): The parent, see `get_random_generator`.
+			A generator is advanced by drawing the entropy of the children from it.
+		number_of_generators (int): The number of child generators.
+
+	Returns:
+		list: The child generators.
+	"""
+	assert isinstance(number_of_generators, int) and number_of_generators >= 0, 'number_of_generators must be a non-negative integer'
+	if isinstance(random_generator, np.random.Generator):
+		seed_sequence = np.random.SeedSequence(random_generator.integers(np.iinfo(np.int64).max, size=4))
+	elif isinstance(random_generator, np.random.SeedSequence):
+		seed_sequence = random_generator
+	else:
+		seed_sequence = np.random.SeedSequence(random_generator)
+	return [np.random.default_rng(child_sequence) for child_sequence in seed_sequence.spawn(number_of_generators)]
+
+
+def shuffle_quality(config: AttrDict, random_generator: np.random.Generator = None) -> int:
+	random_generator = get_random_generator(random_generator)
+	return min(max(int(random_generator.normal(config.max_quality / 2, 2 * config.max_quality / 5)), 1), config.max_quality)
 
 
 def softmax(preferences: np.array) -> np.array:
-	preferences = np.minimum(np.ones(len(preferences)) * 20, preferences)  # This avoids an overflow error in the next line
+	"""
+	Calculate the softmax over the last axis of the preferences.
+	If preferences is two-dimensional, every row is treated as an independent set of preferences.
+
+	Args:
+		preferences (np.array): The preferences, either of shape (n_options,) or (batch, n_options).
+
+	Returns:
+		np.array: The probabilities, same shape as preferences.
+	"""
+	preferences = np.minimum(preferences, 20)  # This avoids an overflow error in the next line
 	exp_preferences = np.exp(preferences)
-	return exp_preferences / sum(exp_preferences)
+	return exp_preferences / exp_preferences.sum(axis=-1, keepdims=True)
+
+
+def shuffle_from_probabilities(probabilities: np.array, random_generator: np.random.Generator = None) -> int:
+	return int(sample_from_probabilities(np.asarray(probabilities)[np.newaxis], random_generator)[0])
 
 
-def shuffle_from_probabilities(probabilities: np.array) -> int:
-	randomnumber = random.random()
-	probability_sum = 0
-	for i, p in enumerate(probabilities):
-		probability_sum += p
-		if randomnumber <= probability_sum:
-			return i
-	return len(probabilities) - 1
+def sample_from_probabilities(probabilities: np.array, random_generator: np.random.Generator = None) -> np.array:
+	"""
+	Draw one index from every row of a probability matrix with one cumulative sum and one comparison for the whole batch.
+	The rows are normalized by their sums, so they may be e.g. float32 softmax outputs which do not sum up to exactly 1.
+	Indices with the probability 0 are never drawn.
+
+	Args:
+		probabilities (np.array): The probabilities, shape (batch_size, n).
+		random_generator (np.random.Generator, optional): The source of the uniform numbers. Defaults to None, which means np.random.
+
+	Returns:
+		np.array: The drawn indices, shape (batch_size,).
+	"""
+	cumulative_probabilities = np.cumsum(probabilities, axis=1)
+	uniform = random_generator.random(len(probabilities)) if random_generator is not None else np.random.random(len(probabilities))
+	# 1 - uniform lies in (0, 1], so the drawn value is never below the first non-zero probability
+	thresholds = (1 - uniform) * cumulative_probabilities[:, -1]
+	indices = np.count_nonzero(cumulative_probabilities < thresholds[:, np.newaxis], axis=1)
+	return np.minimum(indices, probabilities.shape[1] - 1)
+
+
+def decode_discrete_actions(actions: np.array, max_price: int, actions_dimension: int) -> np.array:
+	"""
+	The vectorized form of `agent_output_to_market_form` of the discrete agents.
+	A flat action index encodes one price per action dimension in base max_price, the first price is the most significant digit.
+
+	Args:
+		actions (np.array): The flat action indices, shape (n,).
+		max_price (int): The number of possible prices per action dimension.
+		actions_dimension (int): The number of prices per action.
+
+	Returns:
+		np.array: The actions in market form. If actions_dimension is 1, these are the indices, otherwise one price tuple per row.
+	"""
+	actions = np.asarray(actions, dtype=np.int64)
+	if actions_dimension == 1:
+		return actions
+	place_values = max_price ** np.arange(actions_dimension - 1, -1, -1)
+	return actions[:, np.newaxis] // place_values % max_price
 
 
 def cartesian_product(list_a, list_b):
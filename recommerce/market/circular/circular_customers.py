@@ -5,6 +5,34 @@ from recommerce.market.customer import Customer
 
 
 class CustomerCircular(Customer):
+	# The tables are only available for discrete price grids, see `__init__`.
+	refurbished_preference_table = None
+	new_preference_table = None
+
+	def __init__(self, max_price: int = None) -> None:
+		"""
+		Initialize the customer.
+		With discrete action spaces, all prices are integers in [0, max_price).
+		In this case the preferences for all prices are precomputed once, so the customer only has to look them up.
+
+		Args:
+			max_price (int, optional): The upper bound of the discrete price grid. Defaults to None, which means the preferences
+				are calculated for every offer. This is needed for continuous action spaces.
+		"""
+		if max_price is not None:
+			assert isinstance(max_price, int) and max_price > 0, 'max_price must be a positive integer'
+			prices = np.arange(max_price)
+			self.refurbished_preference_table = self._calculate_refurbished_preferences(prices + 1)
+			self.new_preference_table = self._calculate_new_preferences(prices + 1)
+
+	@staticmethod
+	def _calculate_refurbished_preferences(price_refurbished: np.array) -> np.array:
+		return 5.5 / price_refurbished - np.exp(price_refurbished - 5)
+
+	@staticmethod
+	def _calculate_new_preferences(price_new: np.array) -> np.array:
+		return 10 / price_new - np.exp(price_new - 8)
+
 	def generate_purchase_probabilities_from_offer(self, common_state, vendor_specific_state, vendor_actions) -> np.array:
 		"""
 		This method calculates the purchase probability for each vendor in a linear setup.
@@ -14,21 +42,23 @@ class CustomerCircular(Customer):
 		Check the docstring in the superclass for interface description.
 		"""
 		assert isinstance(common_state, np.ndarray), 'common_state must be a np.ndarray'
-		assert isinstance(vendor_specific_state, list), 'vendor_specific_state must be a list'
-		assert isinstance(vendor_actions, list), 'vendor_actions must be a list'
+		assert isinstance(vendor_specific_state, np.ndarray), 'vendor_specific_state must be a np.ndarray'
+		assert isinstance(vendor_actions, np.ndarray), 'vendor_actions must be a np.ndarray'
 		assert len(vendor_specific_state) == len(vendor_actions), \
 			'Both the vendor_specific_state and vendor_actions contain one element per vendor. So they must have the same length.'
 		assert len(vendor_specific_state) > 0, 'there must be at least one vendor.'
 
-		nothingpreference = 1
-		preferences = [nothingpreference]
-		for vendor_idx in range(len(vendor_actions)):
-			price_refurbished = vendor_actions[vendor_idx][0] + 1
-			price_new = vendor_actions[vendor_idx][1] + 1
-			assert price_refurbished >= 1 and price_new >= 1, 'price_refurbished and price_new need to be >= 1'
+		assert np.all(vendor_actions[:, :2] >= 0), 'price_refurbished and price_new need to be >= 0'
 
-			ratio_old = 5.5 / price_refurbished - np.exp(price_refurbished - 5)
-			ratio_new = 10 / price_new - np.exp(price_new - 8)
-			preferences += [ratio_old, ratio_new]
+		nothingpreference = 1
+		# preferences are ordered as: nothing, refurbished of vendor 0, new of vendor 0, refurbished of vendor 1, ...
+		preferences = np.empty(1 + 2 * len(vendor_actions))
+		preferences[0] = nothingpreference
+		if self.refurbished_preference_table is not None and np.issubdtype(vendor_actions.dtype, np.integer):
+			preferences[1::2] = self.refurbished_preference_table[vendor_actions[:, 0]]
+			preferences[2::2] = self.new_preference_table[vendor_actions[:, 1]]
+		else:
+			preferences[1::2] = self._calculate_refurbished_preferences(vendor_actions[:, 0] + 1)
+			preferences[2::2] = self._calculate_new_preferences(vendor_actions[:, 1] + 1)
 
-		return ut.softmax(np.array(preferences))
+		return ut.softmax(preferences)
@@ -9,6 +9,7 @@ import recommerce.market.owner as owner
 from recommerce.configuration.common_rules import greater_zero_even_rule, greater_zero_rule, non_negative_rule
 from recommerce.market.circular.circular_customers import CustomerCircular
 from recommerce.market.customer import Customer
+from recommerce.market.large_oligopoly import LargeOligopoly
 from recommerce.market.owner import Owner
 from recommerce.market.sim_market import SimMarket
 
@@ -60,14 +61,17 @@ class CircularEconomy(SimMarket, ABC):
 			list: a list with only the number of elements in the storage of one specific vendor.
 			It is chosen randomly between 0 and `max_storage`.
 		"""
-		return [int(np.random.rand() * self.max_storage)]
+		return [int(self._random_generator.random() * self.max_storage)]
 
 	def _reset_common_state(self) -> None:
-		self.in_circulation = int(5 * np.random.rand() * self.max_storage)
+		self.in_circulation = int(5 * self._random_generator.random() * self.max_storage)
 
 	def _get_common_state_array(self) -> np.array:
 		return np.array([self.in_circulation])
 
+	def _set_common_state_array(self, common_state: np.array) -> None:
+		self.in_circulation = int(common_state[0])
+
 	def _reset_vendor_actions(self) -> tuple:
 		"""
 		Reset the prices in the circular economy (without rebuy price)
@@ -77,7 +81,7 @@ class CircularEconomy(SimMarket, ABC):
 		return (self.config.production_price, self.config.production_price + 1)
 
 	def _choose_customer(self) -> Customer:
-		return CustomerCircular()
+		return CustomerCircular(None if self.support_continuous_action_space else self.config.max_price)
 
 	def _choose_owner(self) -> Owner:
 		return owner.UniformDistributionOwner()
@@ -87,7 +91,7 @@ class CircularEconomy(SimMarket, ABC):
 		The call of this method will decrease the in_circulation counter by frequency-items.
 		Call it with the amount of owners that decided to throw away their products.
 		"""
-		self._output_dict['owner/throw_away'] += frequency
+		self._add_to_metric('owner/throw_away', frequency)
 		self.in_circulation -= frequency
 
 	def _transfer_product_to_storage(self, vendor, profits, rebuy_price, frequency) -> None:
@@ -101,12 +105,12 @@ class CircularEconomy(SimMarket, ABC):
 			frequency (int): The number of transferred items.
 		"""
 		assert profits is not None, 'profits must not be None'
-		self._output_dict['owner/rebuys'][f'vendor_{vendor}'] += frequency
+		self._add_to_metric('owner/rebuys', frequency, vendor)
 		# receive the product only if you have space for it. Otherwise throw it away. But you have to pay anyway.
-		self.vendor_specific_state[vendor][0] = min(self.vendor_specific_state[vendor][0] + frequency, self.max_storage)
+		self.vendor_specific_state[vendor, 0] = min(self.vendor_specific_state[vendor, 0] + frequency, self.max_storage)
 		self.in_circulation -= frequency
 		rebuy_cost = frequency * rebuy_price
-		self._output_dict['profits/rebuy_cost'][f'vendor_{vendor}'] -= rebuy_cost
+		self._add_to_metric('profits/rebuy_cost', -rebuy_cost, vendor)
 		profits[vendor] -= rebuy_cost
 
 	def _simulate_owners(self, profits) -> None:
@@ -123,8 +127,8 @@ class CircularEconomy(SimMarket, ABC):
 		assert len(return_probabilities) == 2 + self._number_of_vendors, \
 			'the length of return_probabilities must be the number of vendors plus 2'
 
-		number_of_owners = int(0.05 * self.in_circulation / self._number_of_vendors)
-		owner_decisions = np.random.multinomial(number_of_owners, return_probabilities).tolist()
+		number_of_owners = int(0.05 * self.in_circulation / self._get_number_of_rounds())
+		owner_decisions = self._random_generator.multinomial(number_of_owners, return_probabilities).tolist()
 
 		# owner decisions can be as follows:
 		# 0: Hold/Do nothing
@@ -155,30 +159,30 @@ class CircularEconomy(SimMarket, ABC):
 		chosen_vendor = customer_decision // 2
 		if customer_decision % 2 == 0:
 			# Calculate how many refurbished can be sold
-			possible_refurbished_sales = min(frequency, self.vendor_specific_state[chosen_vendor][0])
+			possible_refurbished_sales = min(frequency, self.vendor_specific_state[chosen_vendor, 0].item())
 
 			# Increase the profit and decrease the storage
-			profit = possible_refurbished_sales * self.vendor_actions[chosen_vendor][0]
-			self.vendor_specific_state[chosen_vendor][0] -= possible_refurbished_sales
+			profit = possible_refurbished_sales * self.vendor_actions[chosen_vendor, 0].item()
+			self.vendor_specific_state[chosen_vendor, 0] -= possible_refurbished_sales
 			profits[chosen_vendor] += profit
-			self._output_dict['customer/purchases_refurbished'][f'vendor_{chosen_vendor}'] += possible_refurbished_sales
-			self._output_dict['profits/by_selling_refurbished'][f'vendor_{chosen_vendor}'] += profit
+			self._add_to_metric('customer/purchases_refurbished', possible_refurbished_sales, chosen_vendor)
+			self._add_to_metric('profits/by_selling_refurbished', profit, chosen_vendor)
 
 			# Punish the agent for not having enough second-hand-products
 			impossible_refurbished_sales = frequency - possible_refurbished_sales
 			punishment = 2 * self.config.max_price * impossible_refurbished_sales
 			profits[chosen_vendor] -= punishment
-			self._output_dict['profits/by_selling_refurbished'][f'vendor_{chosen_vendor}'] -= punishment
+			self._add_to_metric('profits/by_selling_refurbished', -punishment, chosen_vendor)
 
 		else:
-			self._output_dict['customer/purchases_new'][f'vendor_{chosen_vendor}'] += frequency
-			profit = frequency * (self.vendor_actions[chosen_vendor][1] - self.config.production_price)
+			self._add_to_metric('customer/purchases_new', frequency, chosen_vendor)
+			profit = frequency * (self.vendor_actions[chosen_vendor, 1].item() - self.config.production_price)
 			profits[chosen_vendor] += profit
-			self._output_dict['profits/by_selling_new'][f'vendor_{chosen_vendor}'] += profit
+			self._add_to_metric('profits/by_selling_new', profit, chosen_vendor)
 			# The number of items in circulation is bounded
 			self.in_circulation = min(self.in_circulation + frequency, self.max_circulation)
 
-		assert self.vendor_specific_state[chosen_vendor][0] >= 0, 'Your code must ensure a non-negative storage'
+		assert self.vendor_specific_state[chosen_vendor, 0] >= 0, 'Your code must ensure a non-negative storage'
 
 	def _consider_storage_costs(self, profits) -> None:
 		"""
@@ -186,34 +190,41 @@ class CircularEconomy(SimMarket, ABC):
 		Args:
 			profits (np.array(int)): The profits of all vendors.
 		"""
-		for vendor in range(self._number_of_vendors):
-			storage_cost_per_timestep = -self.vendor_specific_state[vendor][0] * self.config.storage_cost_per_product
+		storage_costs_per_timestep = -self.vendor_specific_state[:, 0] * self.config.storage_cost_per_product
+		self._set_metric('profits/storage_cost', storage_costs_per_timestep)
+		for vendor, storage_cost_per_timestep in enumerate(storage_costs_per_timestep.tolist()):
 			profits[vendor] += storage_cost_per_timestep
-			self._output_dict['profits/storage_cost'][f'vendor_{vendor}'] = storage_cost_per_timestep
 
-	def _initialize_output_dict(self):
+	def _declare_metrics(self) -> None:
 		"""
-		Initialize the _output_dict with the state of the environment and the actions the agents takes.
-		Furthermore, the dictionary entries for all events which shall be monitored in the market are initialized.
+		Declare the state of the environment and the actions the agents take as metrics.
+		Furthermore, all events which shall be monitored in the market are declared.
 		"""
-		self._output_dict['state/in_circulation'] = self.in_circulation
-		self._ensure_output_dict_has('state/in_storage',
-			[self.vendor_specific_state[vendor][0] for vendor in range(self._number_of_vendors)])
-		self._ensure_output_dict_has('actions/price_refurbished',
-			[self.vendor_actions[vendor][0] for vendor in range(self._number_of_vendors)])
-		self._ensure_output_dict_has('actions/price_new',
-			[self.vendor_actions[vendor][1] for vendor in range(self._number_of_vendors)])
+		schema = self._metrics_schema
+		schema.add('state/in_circulation')
+		schema.add('state/in_storage', per_vendor=True)
+		schema.add('actions/price_refurbished', per_vendor=True, is_integer=not self.support_continuous_action_space)
+		schema.add('actions/price_new', per_vendor=True, is_integer=not self.support_continuous_action_space)
+
+		schema.add('owner/throw_away')
+		schema.add('owner/rebuys', per_vendor=True)
+		schema.add('profits/rebuy_cost', per_vendor=True, is_integer=False)
 
-		self._ensure_output_dict_has('owner/throw_away')
-		self._ensure_output_dict_has('owner/rebuys', [0] * self._number_of_vendors)
-		self._ensure_output_dict_has('profits/rebuy_cost', [0] * self._number_of_vendors)
+		schema.add('customer/purchases_refurbished', per_vendor=True)
+		schema.add('customer/purchases_new', per_vendor=True)
+		schema.add('profits/by_selling_refurbished', per_vendor=True, is_integer=False)
+		schema.add('profits/by_selling_new', per_vendor=True, is_integer=False)
 
-		self._ensure_output_dict_has('customer/purchases_refurbished', [0] * self._number_of_vendors)
-		self._ensure_output_dict_has('customer/purchases_new', [0] * self._number_of_vendors)
-		self._ensure_output_dict_has('profits/by_selling_refurbished', [0] * self._number_of_vendors)
-		self._ensure_output_dict_has('profits/by_selling_new', [0] * self._number_of_vendors)
+		schema.add('profits/storage_cost', per_vendor=True, is_integer=False)
 
-		self._ensure_output_dict_has('profits/storage_cost', [0] * self._number_of_vendors)
+	def _initialize_metrics(self) -> None:
+		"""
+		Record the state of the environment and the actions the agents take at the beginning of the step.
+		"""
+		self._set_metric('state/in_circulation', self.in_circulation)
+		self._set_metric('state/in_storage', self.vendor_specific_state[:, 0])
+		self._set_metric('actions/price_refurbished', self.vendor_actions[:, 0])
+		self._set_metric('actions/price_new', self.vendor_actions[:, 1])
 
 	def get_n_actions(self):
 		n_actions = 1
@@ -254,7 +265,7 @@ class CircularEconomyDuopoly(CircularEconomy):
 		return 1
 
 	def _get_competitor_list(self) -> list:
-		return [circular_vendors.RuleBasedCEAgent(config_market=self.config)]
+		return [circular_vendors.RuleBasedCEAgent(config_market=self.config, compiled=True)]
 
 
 class CircularEconomyOligopoly(CircularEconomy):
@@ -267,13 +278,21 @@ class CircularEconomyOligopoly(CircularEconomy):
 
 	def _get_competitor_list(self) -> list:
 		return [
-			circular_vendors.RuleBasedCEAgent(config_market=self.config),
-			circular_vendors.RuleBasedCEAgent(config_market=self.config),
+			circular_vendors.RuleBasedCEAgent(config_market=self.config, compiled=True),
+			circular_vendors.RuleBasedCEAgent(config_market=self.config, compiled=True),
 			circular_vendors.FixedPriceCEAgent(config_market=self.config, fixed_price=(3, 5)),
 			circular_vendors.FixedPriceCEAgent(config_market=self.config, fixed_price=(2, 6))
 			]
 
 
+class CircularEconomyLargeOligopoly(LargeOligopoly, CircularEconomyOligopoly):
+	"""
+	This is a circular economy with many vendors, see `LargeOligopoly`.
+	The competitors are ranked by their price for new products.
+	"""
+	_ranking_action_column = 1
+
+
 class CircularEconomyRebuyPrice(CircularEconomy, ABC):
 	@staticmethod
 	def get_competitor_classes() -> list:
@@ -309,19 +328,22 @@ class CircularEconomyRebuyPrice(CircularEconomy, ABC):
 	def _choose_owner(self) -> Owner:
 		return owner.OwnerRebuy()
 
-	def _initialize_output_dict(self) -> None:
+	def _declare_metrics(self) -> None:
 		"""
-		Initialize the _output_dict with the state of the environment and the actions the agents takes.
-		Furthermore, the dictionary entries for all events which shall be monitored in the market are initialized.
-		Also extend the the _output_dict initialized by the superclass with entries concerning the rebuy price and cost.
+		Extend the metrics declared by the superclass with the rebuy price.
 		"""
-		super()._initialize_output_dict()
-		self._ensure_output_dict_has('actions/price_rebuy', [self.vendor_actions[vendor][2] for vendor in range(self._number_of_vendors)])
+		super()._declare_metrics()
+		self._metrics_schema.add('actions/price_rebuy', per_vendor=True, is_integer=not self.support_continuous_action_space)
 
-		self._ensure_output_dict_has('profits/rebuy_cost', [0] * self._number_of_vendors)
+	def _initialize_metrics(self) -> None:
+		"""
+		Record the state of the environment and the actions the agents take, including the rebuy price.
+		"""
+		super()._initialize_metrics()
+		self._set_metric('actions/price_rebuy', self.vendor_actions[:, 2])
 
 	def _get_rebuy_price(self, vendor_idx) -> int:
-		return self.vendor_actions[vendor_idx][2]
+		return self.vendor_actions[vendor_idx, 2].item()
 
 
 class CircularEconomyRebuyPriceMonopoly(CircularEconomyRebuyPrice):
@@ -349,7 +371,7 @@ class CircularEconomyRebuyPriceDuopoly(CircularEconomyRebuyPrice):
 
 	def _get_competitor_list(self) -> list:
 		return [circular_vendors.RuleBasedCERebuyAgentCompetitive(config_market=self.config,
-			continuous_action_space=self.support_continuous_action_space)]
+			continuous_action_space=self.support_continuous_action_space, compiled=True)]
 
 
 class CircularEconomyRebuyPriceOligopoly(CircularEconomyRebuyPrice):
@@ -364,10 +386,18 @@ class CircularEconomyRebuyPriceOligopoly(CircularEconomyRebuyPrice):
 	def _get_competitor_list(self) -> list:
 		return [
 			circular_vendors.RuleBasedCERebuyAgentCompetitive(config_market=self.config,
-				continuous_action_space=self.support_continuous_action_space),
+				continuous_action_space=self.support_continuous_action_space, compiled=True),
 			circular_vendors.RuleBasedCERebuyAgent(config_market=self.config,
-				continuous_action_space=self.support_continuous_action_space),
+				continuous_action_space=self.support_continuous_action_space, compiled=True),
 			circular_vendors.FixedPriceCERebuyAgent(config_market=self.config, fixed_price=(3, 6, 2)),
 			circular_vendors.RuleBasedCERebuyAgentStorageMinimizer(config_market=self.config,
-				continuous_action_space=self.support_continuous_action_space),
+				continuous_action_space=self.support_continuous_action_space, compiled=True),
 			]
+
+
+class CircularEconomyRebuyPriceLargeOligopoly(LargeOligopoly, CircularEconomyRebuyPriceOligopoly):
+	"""
+	This is a circular economy with rebuy price and many vendors, see `LargeOligopoly`.
+	The competitors are ranked by their price for new products.
+	"""
+	_ranking_action_column = 1
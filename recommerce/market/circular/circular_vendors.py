@@ -1,4 +1,4 @@
-from abc import ABC
+from abc import ABC, abstractmethod
 from statistics import median
 
 import numpy as np
@@ -86,38 +86,157 @@ class FixedPriceCERebuyAgent(FixedPriceCEAgent):
 		return self.fixed_price
 
 
-class RuleBasedCEAgent(RuleBasedAgent, CircularAgent):
+# The compiled policy tables are shared by all agents of the same class and market config, see `CompilableRuleBasedAgent`.
+_compiled_policy_tables = {}
+
+
+def _linear_quantile(values: list, quantile: float) -> float:
 	"""
-	This vendor's policy does not consider the competitor's prices.
-	It tries to succeed by taking its own storage costs into account.
+	Calculate a quantile the same way as `np.quantile` with its default linear interpolation, but without creating arrays.
+
+	Args:
+		values (list): The values. They do not need to be sorted.
+		quantile (float): The quantile between 0 and 1.
+
+	Returns:
+		float: The quantile of the values.
+	"""
+	sorted_values = sorted(values)
+	position = quantile * (len(sorted_values) - 1)
+	lower_index = int(position)
+	upper_index = min(lower_index + 1, len(sorted_values) - 1)
+	fraction = position - lower_index
+	lower_value, upper_value = sorted_values[lower_index], sorted_values[upper_index]
+	# this is the interpolation used by numpy, it is exact at both ends of the interval
+	if fraction >= 0.5:
+		return upper_value - (upper_value - lower_value) * (1 - fraction)
+	return lower_value + (upper_value - lower_value) * fraction
+
+
+class CompilableRuleBasedAgent(RuleBasedAgent, CircularAgent, ABC):
 	"""
-	def __init__(self, config_market: AttrDict, name='', continuous_action_space: bool = False):
+	A rule-based vendor whose prices only depend on a few features of the observation.
+	Subclasses split their policy into `_get_policy_features`, which extracts the features,
+	and `_decide_prices`, which maps the features to prices.
+
+	With discrete action spaces, all features lie on a small grid which is enumerated by `_get_feature_grid`.
+	In compiled mode, the prices for the whole grid are tabulated once per market config and `policy` becomes a table lookup.
+	Features outside of the grid fall back to `_decide_prices`, so both modes return the same prices.
+	"""
+	def __init__(self, config_market: AttrDict, name='', continuous_action_space: bool = False, compiled: bool = False):
+		"""
+		Args:
+			config_market (AttrDict): The config of the market the vendor acts in.
+			name (str, optional): The name of the vendor. Defaults to the class name.
+			continuous_action_space (bool, optional): Whether the market has a continuous action space. Defaults to False.
+			compiled (bool, optional): Whether the policy should be answered by a precomputed table. It has no effect in
+				continuous action spaces. Defaults to False.
+		"""
 		self.continuous_action_space = continuous_action_space
 		self.name = name if name != '' else type(self).__name__
 		self.config_market = config_market
+		self._policy_table = self._get_compiled_policy_table() if compiled and not continuous_action_space else None
+
+	def _get_compiled_policy_table(self) -> dict:
+		"""
+		Tabulate `_decide_prices` over the feature grid, or reuse the table of an agent with the same class and market config.
+
+		Returns:
+			dict: The prices for every features tuple of the grid.
+		"""
+		key = (type(self), self.config_market.max_price, self.config_market.max_storage, self.config_market.production_price)
+		if key not in _compiled_policy_tables:
+			_compiled_policy_tables[key] = {features: self._decide_prices(*features) for features in self._get_feature_grid()}
+		return _compiled_policy_tables[key]
+
+	def _get_storage_bucket(self, storage, fractions_of_max_storage) -> int:
+		"""
+		Args:
+			storage (float): The number of products in storage.
+			fractions_of_max_storage (tuple): The divisors of max_storage which separate the buckets, in descending order.
+
+		Returns:
+			int: The index of the first threshold which is higher than the storage, or the number of thresholds.
+		"""
+		for bucket, divisor in enumerate(fractions_of_max_storage):
+			if storage < self.config_market.max_storage / divisor:
+				return bucket
+		return len(fractions_of_max_storage)
 
+	def policy(self, observation, *_) -> tuple:
+		features = self._get_policy_features(observation)
+		if self._policy_table is not None:
+			prices = self._policy_table.get(features)
+			if prices is not None:
+				return prices
+		return self._decide_prices(*features)
+
+	@abstractmethod
+	def _get_policy_features(self, observation) -> tuple:  # pragma: no cover
+		"""
+		Extract the features the prices depend on.
+
+		Args:
+			observation (np.ndarray): The observation of the vendor.
+
+		Returns:
+			tuple: The features, which are passed to `_decide_prices`.
+		"""
+		raise NotImplementedError('This method is abstract. Use a subclass')
+
+	@abstractmethod
+	def _decide_prices(self, *features) -> tuple:  # pragma: no cover
+		"""
+		Map the features to prices.
+
+		Returns:
+			tuple: The prices of the vendor.
+		"""
+		raise NotImplementedError('This method is abstract. Use a subclass')
+
+	@abstractmethod
+	def _get_feature_grid(self) -> list:  # pragma: no cover
+		"""
+		Enumerate all features which can occur if all prices are integers between 0 and max_price - 1.
+
+		Returns:
+			list: All feature tuples of the discrete grid.
+		"""
+		raise NotImplementedError('This method is abstract. Use a subclass')
+
+
+class RuleBasedCEAgent(CompilableRuleBasedAgent):
+	"""
+	This vendor's policy does not consider the competitor's prices.
+	It tries to succeed by taking its own storage costs into account.
+	"""
 	def convert_price_format(self, price_refurbished, price_new, rebuy_price):
 		return (price_refurbished, price_new)
 
-	def policy(self, observation, epsilon=0) -> tuple:
+	def _get_policy_features(self, observation) -> tuple:
 		# this policy sets the prices according to the amount of available storage
-		products_in_storage = observation[1]
+		return (self._get_storage_bucket(observation[1], (15, 10, 8)),)
+
+	def _get_feature_grid(self) -> list:
+		return [(storage_bucket,) for storage_bucket in range(4)]
+
+	def _decide_prices(self, storage_bucket) -> tuple:
 		price_refurbished = 0
 		price_new = self.config_market.production_price
 		rebuy_price = 0
-		if products_in_storage < self.config_market.max_storage / 15:
+		if storage_bucket == 0:
 			# fill up the storage immediately
 			price_refurbished = int(self.config_market.max_price * 6 / 10)
 			price_new += int(self.config_market.max_price * 6 / 10)
 			rebuy_price = price_refurbished - 1
 
-		elif products_in_storage < self.config_market.max_storage / 10:
+		elif storage_bucket == 1:
 			# fill up the storage
 			price_refurbished = int(self.config_market.max_price * 5 / 10)
 			price_new += int(self.config_market.max_price * 5 / 10)
 			rebuy_price = price_refurbished - 2
 
-		elif products_in_storage < self.config_market.max_storage / 8:
+		elif storage_bucket == 2:
 			# storage content is ok
 			price_refurbished = int(self.config_market.max_price * 4 / 10)
 			price_new += int(self.config_market.max_price * 4 / 10)
@@ -141,16 +260,11 @@ class RuleBasedCERebuyAgent(RuleBasedCEAgent):
 		return (price_refurbished, price_new, rebuy_price)
 
 
-class RuleBasedCERebuyAgentCompetitive(RuleBasedAgent, CircularAgent):
+class RuleBasedCERebuyAgentCompetitive(CompilableRuleBasedAgent):
 	"""
 	This vendor's policy is aiming to succeed by undercutting the competitor's prices.
 	"""
-	def __init__(self, config_market: AttrDict, name='', continuous_action_space: bool = False):
-		self.continuous_action_space = continuous_action_space
-		self.name = name if name != '' else type(self).__name__
-		self.config_market = config_market
-
-	def policy(self, observation, *_) -> tuple:
+	def _get_policy_features(self, observation) -> tuple:
 		assert isinstance(observation, np.ndarray), 'observation must be a np.ndarray'
 		# TODO: find a proper way asserting the length of observation (as implemented in AC & QLearning via passing marketplace)
 
@@ -158,34 +272,53 @@ class RuleBasedCERebuyAgentCompetitive(RuleBasedAgent, CircularAgent):
 		own_storage = observation[1].item() if self.config_market.common_state_visibility else observation[0].item()
 		competitors_refurbished_prices, competitors_new_prices, competitors_rebuy_prices = self._get_competitor_prices(observation, True)
 
-		price_new = max(min(competitors_new_prices) - 1, self.config_market.production_price + 1)
+		storage_bucket = self._get_storage_bucket(own_storage, (15, 8))
+		if storage_bucket < 2:
+			refurbished_reference = min(competitors_refurbished_prices)
+		else:
+			refurbished_reference = round(_linear_quantile(competitors_refurbished_prices, 0.75))
+		return storage_bucket, min(competitors_new_prices), refurbished_reference, min(competitors_rebuy_prices)
+
+	def _get_feature_grid(self) -> list:
+		prices = range(self.config_market.max_price)
+		return [(storage_bucket, new_price, refurbished_price, rebuy_price)
+			for storage_bucket in range(3) for new_price in prices for refurbished_price in prices for rebuy_price in prices]
+
+	def _decide_prices(self, storage_bucket, min_new_price, refurbished_reference, min_rebuy_price) -> tuple:
+		"""
+		Args:
+			storage_bucket (int): 0 if the storage is almost empty, 1 if its content is ok and 2 if it is too full.
+			min_new_price (float): The lowest new price of the competitors.
+			refurbished_reference (float): The lowest refurbished price of the competitors,
+				or the rounded 75% quantile of their refurbished prices if the storage is too full.
+			min_rebuy_price (float): The lowest rebuy price of the competitors.
+
+		Returns:
+			tuple: (refurbished_price, new_price, rebuy_price)
+		"""
+		price_new = max(min_new_price - 1, self.config_market.production_price + 1)
 		# competitor's storage is ignored
-		if own_storage < self.config_market.max_storage / 15:
+		if storage_bucket == 0:
 			# fill up the storage immediately
-			price_refurbished = min(competitors_refurbished_prices) + 1
-			rebuy_price = max(min(competitors_rebuy_prices) + 1, 2)
-		elif own_storage < self.config_market.max_storage / 8:
+			price_refurbished = refurbished_reference + 1
+			rebuy_price = max(min_rebuy_price + 1, 2)
+		elif storage_bucket == 1:
 			# storage content is ok
-			rebuy_price = max(min(competitors_rebuy_prices) - 1, 0.25)
-			price_refurbished = max(min(competitors_refurbished_prices) - 1, rebuy_price + 1)
+			rebuy_price = max(min_rebuy_price - 1, 0.25)
+			price_refurbished = max(refurbished_reference - 1, rebuy_price + 1)
 		else:
 			# storage too full, we need to get rid of some refurbished products
-			rebuy_price = max(min(competitors_rebuy_prices) - 2, 0)
-			price_refurbished = max(round(np.quantile(competitors_refurbished_prices, 0.75)) - 2, rebuy_price + 1)
+			rebuy_price = max(min_rebuy_price - 2, 0)
+			price_refurbished = max(refurbished_reference - 2, rebuy_price + 1)
 
 		return (self._clamp_price(price_refurbished), self._clamp_price(price_new), self._clamp_price(rebuy_price))
 
 
-class RuleBasedCERebuyAgentStorageMinimizer(RuleBasedAgent, CircularAgent):
+class RuleBasedCERebuyAgentStorageMinimizer(CompilableRuleBasedAgent):
 	"""
 	This vendor's policy reacts to the competitors' prices and minimizes the usage of storage.
 	"""
-	def __init__(self, config_market: AttrDict, name='', continuous_action_space: bool = False):
-		self.continuous_action_space = continuous_action_space
-		self.name = name if name != '' else type(self).__name__
-		self.config_market = config_market
-
-	def policy(self, observation, *_) -> tuple:
+	def _get_policy_features(self, observation) -> tuple:
 		assert isinstance(observation, np.ndarray), 'observation must be a np.ndarray'
 		# TODO: find a proper way asserting the length of observation (as implemented in AC & QLearning via passing marketplace)
 
@@ -193,16 +326,42 @@ class RuleBasedCERebuyAgentStorageMinimizer(RuleBasedAgent, CircularAgent):
 		own_storage = observation[1].item() if self.config_market.common_state_visibility else observation[0].item()
 		competitors_refurbished_prices, competitors_new_prices, competitors_rebuy_prices = self._get_competitor_prices(observation, True)
 
-		price_new = max(median(competitors_new_prices) - 1, self.config_market.production_price + 1)
+		storage_bucket = self._get_storage_bucket(own_storage, (15,))
+		if storage_bucket == 0:
+			return storage_bucket, median(competitors_new_prices), max(competitors_new_prices + competitors_refurbished_prices), 0
+		return storage_bucket, median(competitors_new_prices), int(_linear_quantile(competitors_refurbished_prices, 0.25)), \
+			min(competitors_rebuy_prices)
+
+	def _get_feature_grid(self) -> list:
+		prices = range(self.config_market.max_price)
+		# the median of integer prices is either an integer or lies exactly between two integers
+		median_prices = [half_steps / 2 for half_steps in range(2 * self.config_market.max_price - 1)]
+		return [(0, median_price, refurbished_price, 0) for median_price in median_prices for refurbished_price in prices] + \
+			[(1, median_price, refurbished_price, rebuy_price)
+				for median_price in median_prices for refurbished_price in prices for rebuy_price in prices]
+
+	def _decide_prices(self, storage_bucket, median_new_price, refurbished_reference, min_rebuy_price) -> tuple:
+		"""
+		Args:
+			storage_bucket (int): 0 if the storage is almost empty, 1 otherwise.
+			median_new_price (float): The median of the new prices of the competitors.
+			refurbished_reference (float): The highest price of the competitors if the storage is almost empty,
+				otherwise the 25% quantile of their refurbished prices rounded down.
+			min_rebuy_price (float): The lowest rebuy price of the competitors. It is not needed if the storage is almost empty.
+
+		Returns:
+			tuple: (refurbished_price, new_price, rebuy_price)
+		"""
+		price_new = max(median_new_price - 1, self.config_market.production_price + 1)
 		# competitor's storage is ignored
-		if own_storage < self.config_market.max_storage / 15:
+		if storage_bucket == 0:
 			# fill up the storage immediately
-			price_refurbished = max(competitors_new_prices + competitors_refurbished_prices)
+			price_refurbished = refurbished_reference
 			rebuy_price = price_new - 1
 		else:
 			# storage too full, we need to get rid of some refurbished products
-			rebuy_price = min(competitors_rebuy_prices) - self.config_market.max_price / 0.1
+			rebuy_price = min_rebuy_price - self.config_market.max_price / 0.1
 			# rebuy_price = min(competitors_rebuy_prices + competitors_new_prices + competitors_refurbished_prices)
-			price_refurbished = int(np.quantile(competitors_refurbished_prices, 0.25))
+			price_refurbished = refurbished_reference
 
 		return (self._clamp_price(price_refurbished), self._clamp_price(price_new), self._clamp_price(rebuy_price))
@@ -0,0 +1,285 @@
+from typing import Tuple
+
+import numpy as np
+from attrdict import AttrDict
+
+import recommerce.configuration.utils as ut
+from recommerce.market.circular.circular_customers import CustomerCircular
+from recommerce.market.circular.circular_sim_market import CircularEconomyRebuyPrice
+from recommerce.market.metrics import MetricsInfo
+from recommerce.market.owner import OwnerRebuy
+
+
+class VectorizedCircularEconomyRebuyPrice():
+	"""
+	A batched counterpart to `CircularEconomyRebuyPrice.step`.
+	It holds the state of `number_of_markets` independent markets in numpy arrays and advances all of them with one call.
+	Customer sampling, owner rebuys, storage costs and observation building have the same semantics as in
+	`CircularEconomy._simulate_customers`, `CircularEconomy._simulate_owners` and `CircularEconomy._complete_purchase`.
+
+	All markets are stepped in lockstep, so they also finish their episodes at the same time.
+	"""
+	def __init__(
+			self,
+			config: AttrDict,
+			marketplace_class: CircularEconomyRebuyPrice,
+			number_of_markets: int = 128,
+			support_continuous_action_space: bool = False,
+			competitors: list = None,
+			random_generator=None) -> None:
+		"""
+		Initialize a batch of markets and reset all of them.
+
+		Args:
+			config (AttrDict): The market config used by all markets.
+			marketplace_class (subclass of CircularEconomyRebuyPrice): The market scenario which should be simulated.
+				It defines the competitors as well as the observation and action space.
+			number_of_markets (int, optional): The number of independent markets. Defaults to 128.
+			support_continuous_action_space (bool, optional): If True, the action space will be continuous. Defaults to False.
+			competitors (list, optional): If not None, this overwrites the default competitor list with a custom one.
+			random_generator (np.random.Generator, np.random.SeedSequence, int or None, optional): The source of all randomness of the batch,
+				see `configuration.utils.get_random_generator`. Defaults to None, which means fresh entropy.
+		"""
+		assert issubclass(marketplace_class, CircularEconomyRebuyPrice), \
+			f'the marketplace_class must be a subclass of CircularEconomyRebuyPrice: {marketplace_class}'
+		assert isinstance(number_of_markets, int) and number_of_markets > 0, 'number_of_markets must be a positive integer'
+		self._random_generator = ut.get_random_generator(random_generator)
+		# This market is never stepped. It defines the spaces, competitors, customers and owners of all markets in the batch.
+		self._prototype_market = marketplace_class(config=config, support_continuous_action_space=support_continuous_action_space,
+			competitors=competitors, random_generator=ut.spawn_random_generators(self._random_generator, 1)[0])
+		assert isinstance(self._prototype_market._customer, CustomerCircular), 'only the CustomerCircular can be simulated batched'
+		assert isinstance(self._prototype_market._owner, OwnerRebuy), 'only the OwnerRebuy can be simulated batched'
+
+		self.config = config
+		self.number_of_markets = number_of_markets
+		self.support_continuous_action_space = support_continuous_action_space
+		self.competitors = self._prototype_market.competitors
+		self.observation_space = self._prototype_market.observation_space
+		self.action_space = self._prototype_market.action_space
+		self.max_storage = self._prototype_market.max_storage
+		self.max_circulation = self._prototype_market.max_circulation
+		self._number_of_vendors = self._prototype_market._get_number_of_vendors()
+		self._action_dtype = np.float32 if support_continuous_action_space else np.int64
+		self._metrics_schema = self._prototype_market.get_metrics_schema()
+		self._metrics_rows = np.zeros((number_of_markets, self._metrics_schema.size))
+		self.reset()
+
+	def reset(self) -> np.array:
+		"""
+		Reset all markets.
+
+		Returns:
+			np.array: The initial observations of the agent in all markets, shape (number_of_markets, observation dimension).
+		"""
+		self.step_counter = 0
+		self.in_circulation = (5 * self._random_generator.random(self.number_of_markets) * self.max_storage).astype(np.int64)
+		self.in_storage = (self._random_generator.random((self.number_of_markets, self._number_of_vendors)) * self.max_storage).astype(np.int64)
+		self.vendor_actions = np.tile(
+			np.array(self._prototype_market._reset_vendor_actions(), dtype=self._action_dtype), (self.number_of_markets, self._number_of_vendors, 1))
+		return self._observation()
+
+	def step(self, actions) -> Tuple[np.array, np.array, np.array, list]:
+		"""
+		Simulate one step in all markets.
+
+		Args:
+			actions (np.array): The actions of the agent in all markets, shape (number_of_markets, 3).
+				Each row contains (refurbished_price, new_price, rebuy_price).
+
+		Returns:
+			Tuple[np.array, np.array, np.array, list]: The observations, the rewards and the done flags of all markets,
+			as well as one `MetricsInfo` per market. The infos use the metrics schema of the `marketplace_class`.
+		"""
+		actions = np.asarray(actions, dtype=self._action_dtype)
+		assert actions.shape == (self.number_of_markets, 3), f'actions must have the shape ({self.number_of_markets}, 3): {actions.shape}'
+		upper_bound_valid = actions <= self.config.max_price if self.support_continuous_action_space else actions < self.config.max_price
+		assert np.all(actions >= 0) and np.all(upper_bound_valid), f'the actions must be valid prices: {actions}'
+		self.vendor_actions[:, 0] = actions
+
+		self.step_counter += 1
+
+		profits = np.zeros((self.number_of_markets, self._number_of_vendors))
+		self._initialize_metrics()
+
+		customers_per_vendor_iteration = self.config.number_of_customers // self._number_of_vendors
+		for i in range(self._number_of_vendors):
+			self._simulate_customers(profits, customers_per_vendor_iteration)
+			self._simulate_owners(profits)
+
+			# the competitor, which turn it is, will update its pricing
+			if i < len(self.competitors):
+				self.vendor_actions[:, i + 1] = self._get_competitor_actions(i)
+
+		self._consider_storage_costs(profits)
+
+		self._set_metric('profits/all', profits)
+		is_done = np.full(self.number_of_markets, self.step_counter >= self.config.episode_length)
+		rewards = profits[:, 0] if not self.config.reward_mixed_profit_and_difference else 2 * profits[:, 0] - np.max(profits[:, 1:], axis=1)
+		infos = [MetricsInfo(self._metrics_schema, row) for row in self._metrics_rows.copy()]
+		return self._observation(), rewards, is_done, infos
+
+	def _get_competitor_actions(self, competitor_index: int) -> np.array:
+		"""
+		Ask a competitor for its actions in all markets.
+
+		Args:
+			competitor_index (int): The index of the competitor in the competitor list.
+
+		Returns:
+			np.array: The actions of the competitor, shape (number_of_markets, 3).
+		"""
+		return np.asarray(self.competitors[competitor_index].policy_batch(self._observation(competitor_index + 1)), dtype=self._action_dtype)
+
+	def _purchase_probabilities(self) -> np.array:
+		"""
+		The batched form of `CustomerCircular.generate_purchase_probabilities_from_offer`.
+
+		Returns:
+			np.array: The purchase probabilities, shape (number_of_markets, 1 + 2 * number_of_vendors).
+			The columns are ordered like the output of the `CustomerCircular`.
+		"""
+		customer = self._prototype_market._customer
+		preferences = np.ones((self.number_of_markets, 1 + 2 * self._number_of_vendors))
+		if customer.refurbished_preference_table is not None and not self.support_continuous_action_space:
+			preferences[:, 1::2] = customer.refurbished_preference_table[self.vendor_actions[:, :, 0]]
+			preferences[:, 2::2] = customer.new_preference_table[self.vendor_actions[:, :, 1]]
+		else:
+			preferences[:, 1::2] = customer._calculate_refurbished_preferences(self.vendor_actions[:, :, 0] + 1)
+			preferences[:, 2::2] = customer._calculate_new_preferences(self.vendor_actions[:, :, 1] + 1)
+		return ut.softmax(preferences)
+
+	def _return_probabilities(self) -> np.array:
+		"""
+		The batched form of `OwnerRebuy.generate_return_probabilities_from_offer`.
+
+		Returns:
+			np.array: The return probabilities, shape (number_of_markets, 2 + number_of_vendors).
+			The columns are ordered like the output of the `OwnerRebuy`.
+		"""
+		return OwnerRebuy.calculate_return_probabilities(self.vendor_actions)
+
+	def _simulate_customers(self, profits, number_of_customers) -> None:
+		"""
+		Simulate the customers of all markets and complete their purchases.
+
+		Args:
+			profits (np.array): The profits of all vendors in all markets, shape (number_of_markets, number_of_vendors).
+			number_of_customers (int): The number of customers eager to buy in each market.
+		"""
+		customer_decisions = self._random_generator.multinomial(number_of_customers, self._purchase_probabilities())
+		self._add_to_metric('customer/buy_nothing', customer_decisions[:, 0])
+
+		# Sell as many refurbished products as there are in storage and punish the vendor for the missing ones
+		wanted_refurbished = customer_decisions[:, 1::2]
+		possible_refurbished_sales = np.minimum(wanted_refurbished, self.in_storage)
+		self.in_storage -= possible_refurbished_sales
+		refurbished_profit = possible_refurbished_sales * self.vendor_actions[:, :, 0] - \
+			2 * self.config.max_price * (wanted_refurbished - possible_refurbished_sales)
+		profits += refurbished_profit
+		self._add_to_metric('customer/purchases_refurbished', possible_refurbished_sales)
+		self._add_to_metric('profits/by_selling_refurbished', refurbished_profit)
+
+		purchases_new = customer_decisions[:, 2::2]
+		new_profit = purchases_new * (self.vendor_actions[:, :, 1] - self.config.production_price)
+		profits += new_profit
+		self._add_to_metric('customer/purchases_new', purchases_new)
+		self._add_to_metric('profits/by_selling_new', new_profit)
+		# The number of items in circulation is bounded
+		self.in_circulation = np.minimum(self.in_circulation + purchases_new.sum(axis=1), self.max_circulation)
+
+	def _simulate_owners(self, profits) -> None:
+		"""
+		Simulate the owners of all markets, who either hold, throw away or sell back their products.
+
+		Args:
+			profits (np.array): The profits of all vendors in all markets, shape (number_of_markets, number_of_vendors).
+		"""
+		number_of_owners = (0.05 * self.in_circulation / self._number_of_vendors).astype(np.int64)
+		owner_decisions = self._random_generator.multinomial(number_of_owners, self._return_probabilities())
+
+		# owner decisions can be as follows:
+		# 0: Hold/Do nothing
+		# 1: Throw away
+		# x: Sell back to vendor x-2
+		self._add_to_metric('owner/throw_away', owner_decisions[:, 1])
+		self.in_circulation -= owner_decisions[:, 1]
+
+		rebuys = owner_decisions[:, 2:]
+		self._add_to_metric('owner/rebuys', rebuys)
+		# receive the product only if you have space for it. Otherwise throw it away. But you have to pay anyway.
+		self.in_storage = np.minimum(self.in_storage + rebuys, self.max_storage)
+		self.in_circulation -= rebuys.sum(axis=1)
+		rebuy_cost = rebuys * self.vendor_actions[:, :, 2]
+		self._add_to_metric('profits/rebuy_cost', -rebuy_cost)
+		profits -= rebuy_cost
+
+	def _consider_storage_costs(self, profits) -> None:
+		"""
+		The storage costs depend on the amount of refurbished products in storage.
+
+		Args:
+			profits (np.array): The profits of all vendors in all markets, shape (number_of_markets, number_of_vendors).
+		"""
+		storage_cost_per_timestep = -self.in_storage * self.config.storage_cost_per_product
+		profits += storage_cost_per_timestep
+		self._set_metric('profits/storage_cost', storage_cost_per_timestep)
+
+	def _initialize_metrics(self) -> None:
+		"""
+		Reset the metrics rows of all markets and record the state and the actions at the beginning of the step.
+		"""
+		self._metrics_rows.fill(0)
+		self._set_metric('state/in_circulation', self.in_circulation)
+		self._set_metric('state/in_storage', self.in_storage)
+		self._set_metric('actions/price_refurbished', self.vendor_actions[:, :, 0])
+		self._set_metric('actions/price_new', self.vendor_actions[:, :, 1])
+		self._set_metric('actions/price_rebuy', self.vendor_actions[:, :, 2])
+
+	def _set_metric(self, name, values) -> None:
+		"""
+		Overwrite a metric in the metrics rows of all markets.
+
+		Args:
+			name (str): The name of the metric.
+			values (np.array): The values of all markets, shape (number_of_markets,) or (number_of_markets, number_of_vendors).
+		"""
+		self._metrics_rows[:, self._metrics_schema.get_index(name)] = values
+
+	def _add_to_metric(self, name, values) -> None:
+		"""
+		Increase a metric in the metrics rows of all markets.
+
+		Args:
+			name (str): The name of the metric.
+			values (np.array): The values of all markets, shape (number_of_markets,) or (number_of_markets, number_of_vendors).
+		"""
+		self._metrics_rows[:, self._metrics_schema.get_index(name)] += values
+
+	def _observation(self, vendor_view=0) -> np.array:
+		"""
+		Create the view of one vendor for all markets.
+		The observations are built the same way as in `SimMarket._observation`.
+
+		Args:
+			vendor_view (int, optional): Index of the vendor whose view we create. Defaults to 0.
+
+		Returns:
+			np.array: The observations of all markets, shape (number_of_markets, observation dimension).
+		"""
+		common_state = [self.in_circulation[:, None]] if self.config.common_state_visibility else []
+		other_vendors = [vendor for vendor in range(self._number_of_vendors) if vendor != vendor_view]
+		other_vendors_state = self.vendor_actions[:, other_vendors]
+		if self.config.opposite_own_state_visibility:
+			other_vendors_state = np.concatenate((other_vendors_state, self.in_storage[:, other_vendors, None]), axis=2)
+		return np.concatenate(
+			common_state + [self.in_storage[:, vendor_view, None], other_vendors_state.reshape(self.number_of_markets, -1)],
+			axis=1, dtype=np.float32)
+
+	def get_observations_dimension(self) -> int:
+		return self._prototype_market.get_observations_dimension()
+
+	def get_n_actions(self) -> int:
+		return self._prototype_market.get_n_actions()
+
+	def get_actions_dimension(self) -> int:
+		return self._prototype_market.get_actions_dimension()
@@ -11,8 +11,8 @@ class Customer(ABC):
 		It returns the purchase probability for all vendors.
 		Args:
 			common_state (np.array): The common state array generated by the market
-			vendor_specific_state (list): The array of arrays whith an entry for each vendor
-			vendor_actions (list): The array containing the action for each vendor
+			vendor_specific_state (np.ndarray): The array of shape (number_of_vendors, state dimension) with one row per vendor
+			vendor_actions (np.ndarray): The array of shape (number_of_vendors, action dimension) with one row per vendor
 		Returns:
 			np.array: probability distribution for all possible purchase decisions.
 			In the first field, there is the probability that the customer does not buy anything.
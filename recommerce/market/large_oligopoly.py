@@ -0,0 +1,174 @@
+from abc import ABC
+
+import gym
+import numpy as np
+from attrdict import AttrDict
+
+from recommerce.market.sim_market import SimMarket
+
+
+class LargeOligopoly(SimMarket, ABC):
+	"""
+	A mixin for oligopolies with many vendors, e.g. hundreds of competitors.
+	Put it in front of a regular oligopoly in the list of base classes, its competitors are repeated up to `number_of_competitors`.
+
+	Two things differ from the regular oligopoly, so that a step stays cheap when the number of vendors grows:
+	All customers and owners of a step are simulated in one round, afterwards all competitors update their prices simultaneously.
+	Each competitor only sees the raw state of its `number_of_visible_competitors` cheapest competitors,
+	so the rule-based competitors interpret their observations like in a regular oligopoly.
+
+	The observation of the agent depends on the `observation_mode`:
+	'vendors' contains every competitor like the regular oligopoly,
+	'cheapest' contains the `number_of_visible_competitors` cheapest competitors like the observations of the competitors and
+	'aggregated' contains the minimum, the quartiles, the maximum and the mean of every column of the competitors.
+	"""
+	observation_modes = ('vendors', 'cheapest', 'aggregated')
+	_aggregation_quantiles = (0, 0.25, 0.5, 0.75, 1)
+	# The column of `vendor_actions` by which the competitors are ranked for the 'cheapest' views
+	_ranking_action_column = 0
+
+	def __init__(
+			self,
+			config: AttrDict,
+			support_continuous_action_space: bool = False,
+			competitors: list = None,
+			random_generator=None,
+			number_of_competitors: int = 100,
+			observation_mode: str = 'aggregated',
+			number_of_visible_competitors: int = 4) -> None:
+		"""
+		Initialize a large oligopoly.
+
+		Args:
+			support_continuous_action_space (bool, optional): If True, the action space will be continuous. Defaults to False.
+			competitors (list, optional): If not None, this overwrites the default competitor list with a custom one.
+			random_generator (np.random.Generator, np.random.SeedSequence, int or None, optional): The source of all randomness
+				of this market, see `SimMarket`. Defaults to None.
+			number_of_competitors (int, optional): The number of default competitors. It is ignored if competitors are given. Defaults to 100.
+			observation_mode (str, optional): How the agent observes its competitors, one of `observation_modes`. Defaults to 'aggregated'.
+			number_of_visible_competitors (int, optional): The number of competitors in the 'cheapest' views. Defaults to 4.
+		"""
+		assert isinstance(number_of_competitors, int) and number_of_competitors > 0, 'number_of_competitors must be a positive integer'
+		assert observation_mode in self.observation_modes, f'observation_mode must be one of {self.observation_modes}: {observation_mode}'
+		assert isinstance(number_of_visible_competitors, int) and number_of_visible_competitors > 0, \
+			'number_of_visible_competitors must be a positive integer'
+		self.number_of_competitors = number_of_competitors
+		self.observation_mode = observation_mode
+		self.number_of_visible_competitors = number_of_visible_competitors
+		super().__init__(config, support_continuous_action_space, competitors, random_generator)
+
+	def _get_competitor_list(self) -> list:
+		"""
+		Repeat the competitors of the regular oligopoly until there are `number_of_competitors`.
+
+		Returns:
+			list: The default competitors.
+		"""
+		competitors = []
+		while len(competitors) < self.number_of_competitors:
+			competitors += super()._get_competitor_list()
+		return competitors[:self.number_of_competitors]
+
+	def _setup_action_observation_space(self, support_continuous_action_space: bool) -> None:
+		super()._setup_action_observation_space(support_continuous_action_space)
+		# the observation_space of the 'vendors' mode, the summarized spaces are derived from it
+		self._vendors_observation_space = self.observation_space
+
+	def _setup_observation_indices(self) -> None:
+		"""
+		Extend the gather indices of the 'vendors' mode by the layout of the summarized observations.
+		A summarized observation starts like the regular one, with the common state and the own state of the vendor.
+		It is followed by rows with the columns of a competitor block, which are the actions and, if visible, the state of a vendor.
+		The observation_space of the agent is replaced according to the `observation_mode`.
+		"""
+		# the gather indices of the superclass are checked against the observation_space of the 'vendors' mode
+		self.observation_space = self._vendors_observation_space
+		super()._setup_observation_indices()
+		assert self.number_of_visible_competitors <= len(self.competitors), \
+			f'number_of_visible_competitors must not exceed the number of competitors: {self.number_of_visible_competitors}'
+		block_size = self.vendor_actions.shape[1] + (self.vendor_specific_state.shape[1] if self.config.opposite_own_state_visibility else 0)
+		self._observation_prefix_size = self._observation_indices.shape[1] - len(self.competitors) * block_size
+		if self.observation_mode == 'vendors':
+			return
+
+		number_of_rows = self.number_of_visible_competitors if self.observation_mode == 'cheapest' else len(self._aggregation_quantiles) + 1
+		bounds = []
+		for vendors_bound in (self._vendors_observation_space.low, self._vendors_observation_space.high):
+			block_bound = vendors_bound[self._observation_prefix_size:self._observation_prefix_size + block_size]
+			bounds.append(np.concatenate((vendors_bound[:self._observation_prefix_size], np.tile(block_bound, number_of_rows))))
+		self.observation_space = gym.spaces.Box(*bounds, dtype=np.float32)
+		assert self.get_observations_dimension() == self._observation_prefix_size + number_of_rows * block_size, \
+			'the summarized observations do not fit into the observation_space'
+
+	def _get_number_of_rounds(self) -> int:
+		return 1
+
+	def _simulate_rounds(self, profits) -> None:
+		"""
+		Simulate all customers and owners of the step in one round.
+		Afterwards all competitors update their pricing simultaneously, so they all observe the same market state.
+
+		Args:
+			profits (list): The profits of the vendors get added to this list.
+		"""
+		self._simulate_customers(profits, self.config.number_of_customers)
+		if self._owner is not None:
+			self._simulate_owners(profits)
+
+		competitor_observations = self._get_cheapest_views(np.arange(1, self._number_of_vendors))
+		competitor_actions = [self._get_competitor_action(competitor_index, observation)
+			for competitor_index, observation in enumerate(competitor_observations)]
+		for competitor_index, action_competitor in enumerate(competitor_actions):
+			self.vendor_actions[competitor_index + 1] = action_competitor
+
+	def _get_competitor_blocks(self) -> np.array:
+		"""
+		Returns:
+			np.array: One row per vendor with its actions followed by its state, if the states of other vendors are visible.
+		"""
+		if self.config.opposite_own_state_visibility:
+			return np.concatenate((self.vendor_actions, self.vendor_specific_state), axis=1)
+		return self.vendor_actions
+
+	def _observation(self, vendor_view=0) -> np.array:
+		"""
+		Create the view of the market for a vendor.
+		The agent observes its competitors according to the `observation_mode`, the competitors always get a 'cheapest' view.
+
+		Args:
+			vendor_view (int, optional): Index of the vendor whose view we create. Defaults to 0.
+
+		Returns:
+			np.array: the view for the vendor with index vendor_view
+		"""
+		if vendor_view == 0 and self.observation_mode == 'vendors':
+			return super()._observation(vendor_view)
+
+		if vendor_view != 0 or self.observation_mode == 'cheapest':
+			return self._get_cheapest_views(np.array([vendor_view]))[0]
+
+		self._update_flat_state()
+		prefix = self._flat_state.take(self._observation_indices[vendor_view, :self._observation_prefix_size])
+		other_blocks = np.delete(self._get_competitor_blocks(), vendor_view, axis=0)
+		summary = np.concatenate((np.quantile(other_blocks, self._aggregation_quantiles, axis=0), other_blocks.mean(axis=0, keepdims=True)))
+		return np.concatenate((prefix, summary.ravel()), dtype=np.float32)
+
+	def _get_cheapest_views(self, vendor_views: np.array) -> np.array:
+		"""
+		Create the 'cheapest' views of several vendors at once.
+		The competitors are ranked once, every vendor sees the first `number_of_visible_competitors` of the ranking except itself.
+
+		Args:
+			vendor_views (np.array): The indices of the vendors whose views we create.
+
+		Returns:
+			np.array: One view per row, in the order of vendor_views.
+		"""
+		self._update_flat_state()
+		prefixes = self._flat_state[self._observation_indices[vendor_views, :self._observation_prefix_size]]
+		ranking = np.argsort(self.vendor_actions[:, self._ranking_action_column], kind='stable')[:self.number_of_visible_competitors + 1]
+		is_visible = ranking != vendor_views[:, np.newaxis]
+		# the positions of the first number_of_visible_competitors vendors in the ranking which are not the viewing vendor
+		visible_positions = np.argsort(~is_visible, axis=1, kind='stable')[:, :self.number_of_visible_competitors]
+		visible_blocks = self._get_competitor_blocks()[ranking[visible_positions]]
+		return np.concatenate((prefixes, visible_blocks.reshape(len(vendor_views), -1)), axis=1, dtype=np.float32)
@@ -5,6 +5,27 @@ from recommerce.market.customer import Customer
 
 
 class CustomerLinear(Customer):
+	# The table is only available for discrete price grids, see `__init__`.
+	ratio_table = None
+
+	def __init__(self, max_price: int = None, max_quality: int = None) -> None:
+		"""
+		Initialize the customer.
+		With discrete action spaces, all prices are integers in [0, max_price) and all qualities are integers in [1, max_quality].
+		In this case the quality-price ratios of all combinations are precomputed once, so the customer only has to look them up.
+
+		Args:
+			max_price (int, optional): The upper bound of the discrete price grid. Defaults to None, which means the ratios
+				are calculated for every offer. This is needed for continuous action spaces.
+			max_quality (int, optional): The highest quality a product can have. Must be given if and only if max_price is given.
+		"""
+		assert (max_price is None) == (max_quality is None), 'max_price must be given if and only if max_quality is given'
+		if max_price is not None:
+			assert isinstance(max_price, int) and max_price > 0, 'max_price must be a positive integer'
+			assert isinstance(max_quality, int) and max_quality > 0, 'max_quality must be a positive integer'
+			# ratio_table[quality, price] contains the ratio of a product with this quality offered for this price
+			self.ratio_table = np.arange(max_quality + 1)[:, np.newaxis] / (np.arange(max_price)[np.newaxis, :] + 1)
+
 	def generate_purchase_probabilities_from_offer(self, common_state, vendor_specific_state, vendor_actions) -> np.array:
 		"""
 		This method calculates the purchase probability for each vendor in a linear setup.
@@ -15,17 +36,18 @@ class CustomerLinear(Customer):
 		"""
 		assert isinstance(common_state, np.ndarray), 'common_state must be a np.ndarray'
 		assert len(common_state) == 0, 'common_state must be an empty array in our linear setup'
-		assert isinstance(vendor_specific_state, list), 'vendor_specific_state must be a list'
-		assert isinstance(vendor_actions, list), 'vendor_actions must be a list'
+		assert isinstance(vendor_specific_state, np.ndarray), 'vendor_specific_state must be a np.ndarray'
+		assert isinstance(vendor_actions, np.ndarray), 'vendor_actions must be a np.ndarray'
 		assert len(vendor_specific_state) == len(vendor_actions), \
 			'Both the vendor_specific_state and vendor_actions contain one element per vendor. So they must have the same length.'
 		assert len(vendor_specific_state) > 0, 'there must be at least one vendor.'
 
 		nothingpreference = 1
-		ratios = [nothingpreference]
-		for vendor_idx in range(len(vendor_actions)):
-			quality = vendor_specific_state[vendor_idx][0]
-			price = vendor_actions[vendor_idx] + 1
-			ratio = quality / price
-			ratios.append(ratio)
-		return ut.softmax(np.array(ratios))
+		ratios = np.empty(1 + len(vendor_actions))
+		ratios[0] = nothingpreference
+		quality = vendor_specific_state[:, 0]
+		if self.ratio_table is not None and np.issubdtype(vendor_actions.dtype, np.integer):
+			ratios[1:] = self.ratio_table[quality, vendor_actions[:, 0]]
+		else:
+			ratios[1:] = quality / (vendor_actions[:, 0] + 1)
+		return ut.softmax(ratios)
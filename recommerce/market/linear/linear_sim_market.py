@@ -6,6 +6,7 @@ import numpy as np
 import recommerce.configuration.utils as ut
 from recommerce.configuration.common_rules import greater_zero_even_rule, greater_zero_rule, non_negative_rule
 from recommerce.market.customer import Customer
+from recommerce.market.large_oligopoly import LargeOligopoly
 from recommerce.market.linear.linear_customers import CustomerLinear
 from recommerce.market.linear.linear_vendors import Just2PlayersLEAgent, LERandomAgent, LinearRatio1LEAgent
 from recommerce.market.sim_market import SimMarket
@@ -62,10 +63,12 @@ class LinearEconomy(SimMarket, ABC):
 		See also:
 			`configuration.utils.shuffle_quality`
 		"""
-		return [ut.shuffle_quality(self.config)]
+		return [ut.shuffle_quality(self.config, self._random_generator)]
 
 	def _choose_customer(self) -> Customer:
-		return CustomerLinear()
+		if self.support_continuous_action_space:
+			return CustomerLinear()
+		return CustomerLinear(self.config.max_price, self.config.max_quality)
 
 	def _reset_vendor_actions(self) -> int:
 		"""
@@ -76,13 +79,16 @@ class LinearEconomy(SimMarket, ABC):
 		return self.config.production_price + 1
 
 	def _complete_purchase(self, profits, chosen_vendor, frequency) -> None:
-		profits[chosen_vendor] += frequency * (self.vendor_actions[chosen_vendor] - self.config.production_price)
-		self._output_dict['customer/purchases'][f'vendor_{chosen_vendor}'] += frequency
+		profits[chosen_vendor] += frequency * (self.vendor_actions[chosen_vendor, 0].item() - self.config.production_price)
+		self._add_to_metric('customer/purchases', frequency, chosen_vendor)
 
-	def _initialize_output_dict(self):
-		self._ensure_output_dict_has('state/quality', [self.vendor_specific_state[i][0] for i in range(self._number_of_vendors)])
+	def _declare_metrics(self) -> None:
+		self._metrics_schema.add('state/quality', per_vendor=True)
 
-		self._ensure_output_dict_has('customer/purchases', [0] * self._number_of_vendors)
+		self._metrics_schema.add('customer/purchases', per_vendor=True)
+
+	def _initialize_metrics(self) -> None:
+		self._set_metric('state/quality', self.vendor_specific_state[:, 0])
 
 	def get_n_actions(self):
 		return self.action_space.n
@@ -136,3 +142,10 @@ class LinearEconomyOligopoly(LinearEconomy):
 			LERandomAgent(config_market=self.config),
 			Just2PlayersLEAgent(config_market=self.config),
 		]
+
+
+class LinearEconomyLargeOligopoly(LargeOligopoly, LinearEconomyOligopoly):
+	"""
+	This is a linear economy with many vendors, see `LargeOligopoly`.
+	"""
+	pass
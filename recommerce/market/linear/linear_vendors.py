@@ -1,5 +1,4 @@
 import math
-import random
 from abc import ABC
 
 from attrdict import AttrDict
@@ -55,7 +54,10 @@ class LinearRatio1LEAgent(LinearAgent, RuleBasedAgent):
 
 class LERandomAgent(LinearAgent, RuleBasedAgent):
 	def policy(self, state, epsilon=0):
-		return random.randint(self.config_market.production_price + 1, self.config_market.max_price - 1)
+		return int(self.random_generator.integers(self.config_market.production_price + 1, self.config_market.max_price))
+
+	def policy_batch(self, observations):
+		return self.random_generator.integers(self.config_market.production_price + 1, self.config_market.max_price, size=len(observations))
 
 
 class Just2PlayersLEAgent(LinearAgent, RuleBasedAgent):
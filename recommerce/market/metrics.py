@@ -0,0 +1,182 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+import recommerce.configuration.utils as ut
+
+
+class MetricsSchema():
+	"""
+	Declares the metrics a market records during one step.
+	A metric is either global, which means it occupies one column, or it is recorded per vendor and occupies one column per vendor.
+	Together, the columns of all metrics form one row, which the market writes in place while it is simulated.
+	"""
+	def __init__(self, number_of_vendors: int) -> None:
+		"""
+		Initialize an empty schema.
+
+		Args:
+			number_of_vendors (int): The number of vendors in the market. Every per-vendor metric gets this many columns.
+		"""
+		assert isinstance(number_of_vendors, int) and number_of_vendors > 0, 'number_of_vendors must be a positive integer'
+		self.number_of_vendors = number_of_vendors
+		self.size = 0
+		self._first_columns = {}
+		self._is_per_vendor = {}
+		self._is_integer = {}
+
+	def add(self, name: str, per_vendor: bool = False, is_integer: bool = True) -> None:
+		"""
+		Append a metric to the schema.
+
+		Args:
+			name (str): The name of the metric. It is used as the key in the info dict.
+			per_vendor (bool, optional): Whether the metric is recorded once per vendor. Defaults to False.
+			is_integer (bool, optional): Whether the values of the metric are counts and should be reported as int. Defaults to True.
+		"""
+		assert name not in self._first_columns, f'the metric {name} is already part of the schema'
+		self._first_columns[name] = self.size
+		self._is_per_vendor[name] = per_vendor
+		self._is_integer[name] = is_integer
+		self.size += self.number_of_vendors if per_vendor else 1
+
+	def __contains__(self, name: str) -> bool:
+		return name in self._first_columns
+
+	def __iter__(self):
+		return iter(self._first_columns)
+
+	def __len__(self) -> int:
+		return len(self._first_columns)
+
+	def __eq__(self, other) -> bool:
+		return isinstance(other, MetricsSchema) and self.number_of_vendors == other.number_of_vendors and \
+			self._first_columns == other._first_columns and self._is_per_vendor == other._is_per_vendor and \
+			self._is_integer == other._is_integer
+
+	def get_index(self, name: str, vendor: int = None):
+		"""
+		Get the position of a metric within a row.
+
+		Args:
+			name (str): The name of the metric.
+			vendor (int, optional): The vendor whose column is requested. Defaults to None.
+
+		Returns:
+			int or slice: The column of a global metric or of the given vendor.
+			If vendor is None for a per-vendor metric, the slice of the columns of all vendors is returned.
+		"""
+		first_column = self._first_columns[name]
+		if not self._is_per_vendor[name]:
+			assert vendor is None, f'the metric {name} is not recorded per vendor'
+			return first_column
+		if vendor is None:
+			return slice(first_column, first_column + self.number_of_vendors)
+		return first_column + vendor
+
+	def create_row(self) -> np.array:
+		"""
+		Returns:
+			np.array: A row with one zero-initialized column for every global metric and every vendor of the per-vendor metrics.
+		"""
+		return np.zeros(self.size)
+
+	def get_value(self, row: np.array, name: str):
+		"""
+		Read a metric from a row in the format of the legacy info dict.
+
+		Args:
+			row (np.array): A row created by `create_row`.
+			name (str): The name of the metric.
+
+		Returns:
+			int, float or dict: The value of a global metric or a dict mapping `vendor_i` to the values of a per-vendor metric.
+		"""
+		to_python_number = int if self._is_integer[name] else float
+		if not self._is_per_vendor[name]:
+			return to_python_number(row[self._first_columns[name]])
+		return {f'vendor_{vendor}': to_python_number(value) for vendor, value in enumerate(row[self.get_index(name)])}
+
+	def to_dict(self, row: np.array) -> dict:
+		"""
+		Convert a row into the legacy info dict.
+
+		Args:
+			row (np.array): A row created by `create_row`.
+
+		Returns:
+			dict: A dict containing every metric of the schema, see `get_value`.
+		"""
+		assert row.shape == (self.size,), f'the row must have the shape ({self.size},): {row.shape}'
+		return {name: self.get_value(row, name) for name in self._first_columns}
+
+
+class MetricsInfo(MutableMapping):
+	"""
+	The info returned by `SimMarket.step`.
+	It wraps the metrics row of one step and only builds the nested entries of the legacy info dict when they are accessed.
+	Keys which are not part of the schema, e.g. losses added by a trainer, can be set like in a dict.
+	Note that the entries of per-vendor metrics are created on every access, so changing them does not change the info.
+	"""
+	def __init__(self, schema: MetricsSchema, row: np.array) -> None:
+		"""
+		Args:
+			schema (MetricsSchema): The schema describing the row.
+			row (np.array): The metrics row. The info takes ownership of it, so it must not be written to afterwards.
+		"""
+		self.schema = schema
+		self.row = row
+		self._extras = {}
+
+	def __getitem__(self, key: str):
+		if key in self._extras:
+			return self._extras[key]
+		if key in self.schema:
+			return self.schema.get_value(self.row, key)
+		raise KeyError(key)
+
+	def __setitem__(self, key: str, value) -> None:
+		self._extras[key] = value
+
+	def __delitem__(self, key: str) -> None:
+		del self._extras[key]
+
+	def __iter__(self):
+		yield from (name for name in self.schema if name not in self._extras)
+		yield from self._extras
+
+	def __len__(self) -> int:
+		return len(self.schema) + sum(1 for key in self._extras if key not in self.schema)
+
+	def __repr__(self) -> str:
+		return f'{self.__class__.__name__}({self.to_dict()})'
+
+	def copy(self) -> 'MetricsInfo':
+		"""
+		Returns:
+			MetricsInfo: An independent copy of this info.
+		"""
+		info_copy = MetricsInfo(self.schema, self.row.copy())
+		info_copy._extras = dict(self._extras)
+		return info_copy
+
+	def accumulate(self, other: 'MetricsInfo') -> None:
+		"""
+		Add the metrics of another info with an equal schema to this info in place.
+		The infos may come from different markets of the same scenario.
+
+		Args:
+			other (MetricsInfo): The info to add.
+		"""
+		assert other.schema is self.schema or other.schema == self.schema, 'only infos with the same schema can be accumulated'
+		self.row += other.row
+		self._extras = ut.add_content_of_two_dicts(self._extras, other._extras)
+
+	def to_dict(self) -> dict:
+		"""
+		Returns:
+			dict: The legacy info dict, containing the metrics of the schema and all keys that were set.
+		"""
+		info_dict = self.schema.to_dict(self.row)
+		info_dict.update(self._extras)
+		return info_dict
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
 import numpy as np
 
@@ -17,8 +18,8 @@ class Owner(ABC):
 		An owner can throw away his product, he can hold his product or return it to one of the vendors
 		Args:
 			common_state (np.array): The common state array generated by the market
-			vendor_specific_state (list): The array of arrays whith an entry for each vendor
-			vendor_actions (list): The array containing the action for each vendor
+			vendor_specific_state (np.ndarray): The array of shape (number_of_vendors, state dimension) with one row per vendor
+			vendor_actions (np.ndarray): The array of shape (number_of_vendors, action dimension) with one row per vendor
 		Returns:
 			np.array: The first entry is the probability that the holds his product.
 			The second entry is the probability that the owner throws away his product.
@@ -27,6 +28,51 @@ class Owner(ABC):
 		raise NotImplementedError('This method is abstract. Use a subclass')
 
 
+def _assert_valid_offer(common_state, vendor_specific_state, vendor_actions) -> None:
+	assert isinstance(common_state, np.ndarray), 'offers needs to be a np.ndarray'
+	assert isinstance(vendor_specific_state, np.ndarray), 'vendor_specific_state must be a np.ndarray'
+	assert isinstance(vendor_actions, np.ndarray), 'vendor_actions must be a np.ndarray'
+	assert len(vendor_specific_state) == len(vendor_actions), \
+		'Both the vendor_specific_state and vendor_actions contain one element per vendor. So they must have the same length.'
+	assert len(vendor_specific_state) > 0, 'there must be at least one vendor.'
+
+
+@lru_cache(maxsize=4096)
+def _cached_return_probabilities(owner_class, vendor_actions_bytes: bytes, number_of_vendors: int) -> np.array:
+	"""
+	Memoize the return probabilities of an owner for a discrete price tuple.
+	The results are read-only, because they are shared by all callers asking for the same prices.
+
+	Args:
+		owner_class (type): A subclass of `Owner` offering `calculate_return_probabilities`.
+		vendor_actions_bytes (bytes): The raw bytes of the int64 vendor_actions of all vendors.
+		number_of_vendors (int): The number of vendors.
+
+	Returns:
+		np.array: The return probabilities, see `Owner.generate_return_probabilities_from_offer`.
+	"""
+	vendor_actions = np.frombuffer(vendor_actions_bytes, dtype=np.int64).reshape(number_of_vendors, -1)
+	return_probabilities = owner_class.calculate_return_probabilities(vendor_actions)
+	return_probabilities.setflags(write=False)
+	return return_probabilities
+
+
+def _look_up_return_probabilities(owner_class, vendor_actions: np.array) -> np.array:
+	"""
+	Return the return probabilities of an owner, memoized if the prices are discrete.
+
+	Args:
+		owner_class (type): A subclass of `Owner` offering `calculate_return_probabilities`.
+		vendor_actions (np.array): The actions of all vendors, shape (number_of_vendors, 3).
+
+	Returns:
+		np.array: The return probabilities. They are read-only for discrete prices.
+	"""
+	if not np.issubdtype(vendor_actions.dtype, np.integer):
+		return owner_class.calculate_return_probabilities(vendor_actions)
+	return _cached_return_probabilities(owner_class, vendor_actions.astype(np.int64, copy=False).tobytes(), len(vendor_actions))
+
+
 class UniformDistributionOwner(Owner):
 	def generate_return_probabilities_from_offer(self, common_state, vendor_specific_state, vendor_actions) -> np.array:
 		"""
@@ -35,15 +81,25 @@ class UniformDistributionOwner(Owner):
 		It assumes three entries per vendor (refurbished price, new price and in_storage but NO rebuy price)
 		Check the docstring in the superclass for interface description.
 		"""
-		assert isinstance(common_state, np.ndarray), 'offers needs to be a np.ndarray'
-		assert isinstance(vendor_specific_state, list), 'vendor_specific_state must be a list'
-		assert isinstance(vendor_actions, list), 'vendor_actions must be a list'
-		assert len(vendor_specific_state) == len(vendor_actions), \
-			'Both the vendor_specific_state and vendor_actions contain one element per vendor. So they must have the same length.'
-		assert len(vendor_specific_state) > 0, 'there must be at least one vendor.'
+		_assert_valid_offer(common_state, vendor_specific_state, vendor_actions)
+		return self.calculate_uniform_return_probabilities(len(vendor_specific_state))
 
-		number_of_options = len(vendor_specific_state) + 2
-		return np.array([1 / number_of_options] * int(number_of_options))
+	@staticmethod
+	@lru_cache(maxsize=None)
+	def calculate_uniform_return_probabilities(number_of_vendors: int) -> np.array:
+		"""
+		The distribution only depends on the number of vendors, so it is calculated once per number of vendors.
+
+		Args:
+			number_of_vendors (int): The number of vendors in the market.
+
+		Returns:
+			np.array: The read-only uniform distribution over holding, throwing away and returning to each vendor.
+		"""
+		number_of_options = number_of_vendors + 2
+		return_probabilities = np.full(number_of_options, 1 / number_of_options)
+		return_probabilities.setflags(write=False)
+		return return_probabilities
 
 
 class OwnerRebuyOld(Owner):
@@ -53,29 +109,33 @@ class OwnerRebuyOld(Owner):
 		The owner likes if the rebuy price is close to the price in the sell offer.
 		That will increase the probability that he will return his product.
 		If the rebuy price is very low, the owner will just throw away his product more often. Holding the product is the fallback option.
+		For discrete prices, the probabilities are memoized per price tuple.
 		Check the docstring in the superclass for interface description.
 		"""
-		assert isinstance(common_state, np.ndarray), 'offers needs to be a ndarray'
-		assert isinstance(vendor_specific_state, list), 'vendor_specific_state must be a list'
-		assert isinstance(vendor_actions, list), 'vendor_actions must be a list'
-		assert len(vendor_specific_state) == len(vendor_actions), \
-			'Both the vendor_specific_state and vendor_actions contain one element per vendor. So they must have the same length.'
-		assert len(vendor_specific_state) > 0, 'there must be at least one vendor.'
+		_assert_valid_offer(common_state, vendor_specific_state, vendor_actions)
+		return _look_up_return_probabilities(type(self), vendor_actions)
 
-		holding_preference = 1
-		discard_preference = 20
-		return_preferences = []
+	@staticmethod
+	def calculate_return_probabilities(vendor_actions: np.array) -> np.array:
+		"""
+		The batched kernel of `generate_return_probabilities_from_offer`.
 
-		for vendor_idx in range(len(vendor_specific_state)):
-			price_refurbished = vendor_actions[vendor_idx][0] + 1
-			price_new = vendor_actions[vendor_idx][1] + 1
-			price_rebuy = vendor_actions[vendor_idx][2] + 1
-			best_purchase_offer = min(price_refurbished, price_new)
-			return_preferences.append(2 * np.exp((price_rebuy - best_purchase_offer) / best_purchase_offer))
+		Args:
+			vendor_actions (np.array): The actions of the vendors, shape (..., number_of_vendors, 3).
+				Leading dimensions are treated as independent markets.
 
-			discard_preference = min(discard_preference, 2 / (price_rebuy + 1))
+		Returns:
+			np.array: The return probabilities, shape (..., 2 + number_of_vendors).
+		"""
+		price_refurbished = vendor_actions[..., 0] + 1
+		price_new = vendor_actions[..., 1] + 1
+		price_rebuy = vendor_actions[..., 2] + 1
+		best_purchase_offer = np.minimum(price_refurbished, price_new)
 
-		return ut.softmax(np.array([holding_preference, discard_preference] + return_preferences))
+		preferences = np.ones(vendor_actions.shape[:-2] + (2 + vendor_actions.shape[-2],))
+		preferences[..., 1] = np.minimum(20, np.min(2 / (price_rebuy + 1), axis=-1))
+		preferences[..., 2:] = 2 * np.exp((price_rebuy - best_purchase_offer) / best_purchase_offer)
+		return ut.softmax(preferences)
 
 
 class OwnerRebuy(Owner):
@@ -84,28 +144,27 @@ class OwnerRebuy(Owner):
 		This method tries a more sophisticated version of generating return probabilities.
 		The owner prefers higher rebuy prices.
 		If the rebuy price is very low, the owner will just throw away his product more often. Holding the product is the fallback option.
+		For discrete prices, the probabilities are memoized per price tuple.
 		Check the docstring in the superclass for interface description.
 		"""
-		assert isinstance(common_state, np.ndarray), 'offers needs to be a ndarray'
-		assert isinstance(vendor_specific_state, list), 'vendor_specific_state must be a list'
-		assert isinstance(vendor_actions, list), 'vendor_actions must be a list'
-		assert len(vendor_specific_state) == len(vendor_actions), \
-			'Both the vendor_specific_state and vendor_actions contain one element per vendor. So they must have the same length.'
-		assert len(vendor_specific_state) > 0, 'there must be at least one vendor.'
-
-		holding_preference = 1
-		return_preferences = []
-		lowest_purchase_offer = np.inf
-		best_rebuy_price = 0
-
-		for vendor_idx in range(len(vendor_specific_state)):
-			price_refurbished = vendor_actions[vendor_idx][0] + 1
-			price_new = vendor_actions[vendor_idx][1] + 1
-			price_rebuy = vendor_actions[vendor_idx][2] + 1
-			best_rebuy_price = max(best_rebuy_price, price_rebuy)
-			lowest_purchase_offer = min(lowest_purchase_offer, price_refurbished, price_new)
-			return_preferences.append(price_rebuy)
-
-		discard_preference = lowest_purchase_offer - best_rebuy_price
-
-		return ut.softmax(np.array([holding_preference, discard_preference] + return_preferences))
+		_assert_valid_offer(common_state, vendor_specific_state, vendor_actions)
+		return _look_up_return_probabilities(type(self), vendor_actions)
+
+	@staticmethod
+	def calculate_return_probabilities(vendor_actions: np.array) -> np.array:
+		"""
+		The batched kernel of `generate_return_probabilities_from_offer`.
+
+		Args:
+			vendor_actions (np.array): The actions of the vendors, shape (..., number_of_vendors, 3).
+				Leading dimensions are treated as independent markets.
+
+		Returns:
+			np.array: The return probabilities, shape (..., 2 + number_of_vendors).
+		"""
+		prices = vendor_actions + 1
+		# holding is the first option, its preference stays 1
+		preferences = np.ones(vendor_actions.shape[:-2] + (2 + vendor_actions.shape[-2],))
+		preferences[..., 1] = np.min(prices[..., :2], axis=(-2, -1)) - np.max(prices[..., 2], axis=-1)
+		preferences[..., 2:] = prices[..., 2]
+		return ut.softmax(preferences)
@@ -6,7 +6,8 @@ import numpy as np
 from attrdict import AttrDict
 
 from recommerce.configuration.json_configurable import JSONConfigurable
-from recommerce.configuration.utils import filtered_class_str_from_dir
+from recommerce.configuration.utils import filtered_class_str_from_dir, get_random_generator, spawn_random_generators
+from recommerce.market.metrics import MetricsInfo, MetricsSchema
 
 # An offer is a market state that contains all prices and qualities
 
@@ -30,9 +31,12 @@ class SimMarket(gym.Env, JSONConfigurable):
 	def get_possible_rl_agents() -> list:
 		import recommerce.rl.actorcritic.actorcritic_agent as ac_agents
 		import recommerce.rl.q_learning.q_learning_agent as q_agents
+		import recommerce.rl.q_learning.tabular_q_learning_agent as tabular_q_agents
 		from recommerce.rl.stable_baselines import sb_a2c, sb_ddpg, sb_ppo, sb_sac, sb_td3
 		all_actorcritic = filtered_class_str_from_dir('recommerce.rl.actorcritic.actorcritic_agent', dir(ac_agents), '^.*Agent.+|Discrete.+$')
 		all_qlearning = filtered_class_str_from_dir('recommerce.rl.q_learning.q_learning_agent', dir(q_agents), '^QLearningAgent$')
+		all_qlearning += filtered_class_str_from_dir('recommerce.rl.q_learning.tabular_q_learning_agent', dir(tabular_q_agents),
+			'^TabularQLearningAgent$')
 		all_stable_base_lines = filtered_class_str_from_dir('recommerce.rl.stable_baselines.sb_ddpg', dir(sb_ddpg), '^StableBaselines(?!Agent).*')
 		all_stable_base_lines += filtered_class_str_from_dir('recommerce.rl.stable_baselines.sb_a2c', dir(sb_a2c), '^StableBaselines(?!Agent).*')
 		all_stable_base_lines += filtered_class_str_from_dir('recommerce.rl.stable_baselines.sb_ppo', dir(sb_ppo), '^StableBaselines(?!Agent).*')
@@ -45,7 +49,12 @@ class SimMarket(gym.Env, JSONConfigurable):
 	def get_competitor_classes() -> list:
 		raise NotImplementedError
 
-	def __init__(self, config: AttrDict, support_continuous_action_space: bool = False, competitors: list = None) -> None:
+	def __init__(
+			self,
+			config: AttrDict,
+			support_continuous_action_space: bool = False,
+			competitors: list = None,
+			random_generator=None) -> None:
 		"""
 		Initialize a SimMarket instance.
 		Set up needed values such as competitors and action/observation-space and reset the environment.
@@ -55,15 +64,27 @@ class SimMarket(gym.Env, JSONConfigurable):
 		Args:
 			support_continuous_action_space (bool, optional): If True, the action space will be continuous. Defaults to False.
 			competitors (list, optional): If not None, this overwrites the default competitor list with a custom one.
+			random_generator (np.random.Generator, np.random.SeedSequence, int or None, optional): The source of all randomness
+				of this market, see `configuration.utils.get_random_generator`. The default competitors get child streams of it.
+				Defaults to None, which means fresh entropy.
 		"""
 		self.config = config
 		self.support_continuous_action_space = support_continuous_action_space
-		self.competitors = self._get_competitor_list() if not competitors else competitors
+		self._random_generator = get_random_generator(random_generator)
+		if competitors:
+			self.competitors = competitors
+		else:
+			self.competitors = self._get_competitor_list()
+			for competitor, competitor_random_generator in zip(
+					self.competitors, spawn_random_generators(self._random_generator, len(self.competitors))):
+				competitor.random_generator = competitor_random_generator
 		# The agent's price does not belong to the observation_space any more because an agent should not depend on it
 		self._setup_action_observation_space(support_continuous_action_space)
 		self._owner = None
 		self._customer = None
 		self._number_of_vendors = self._get_number_of_vendors()
+		self._allocate_vendor_arrays()
+		self._setup_metrics()
 		# TODO: Better testing for the observation and action space
 		assert (self.observation_space and self.action_space), 'Your observation or action space is not defined'
 		assert not self.config.reward_mixed_profit_and_difference or self._number_of_vendors > 1, \
@@ -89,13 +110,179 @@ class SimMarket(gym.Env, JSONConfigurable):
 
 		self._reset_common_state()
 
-		self.vendor_specific_state = [self._reset_vendor_specific_state() for _ in range(self._number_of_vendors)]
-		self.vendor_actions = [self._reset_vendor_actions() for _ in range(self._number_of_vendors)]
+		for vendor in range(self._number_of_vendors):
+			self.vendor_specific_state[vendor] = self._reset_vendor_specific_state()
+			self.vendor_actions[vendor] = self._reset_vendor_actions()
 
 		self._customer = self._choose_customer()
 		self._owner = self._choose_owner()
 
-		return self._observation()
+		observation = self._observation()
+		assert self.observation_space.contains(observation), f'{observation} ({type(observation)}) invalid observation'
+		return observation
+
+	def seed(self, seed=None) -> list:
+		"""
+		Replace the random stream of the market.
+		Every competitor with a random generator gets a child stream of the new stream, like the default competitors in `__init__`.
+		This method is required by the gym library, e.g. the vectorized environments of stable baselines call it.
+
+		Args:
+			seed (np.random.Generator, np.random.SeedSequence, int or None, optional): The new source of all randomness of this market,
+				see `configuration.utils.get_random_generator`. Defaults to None, which means fresh entropy.
+
+		Returns:
+			list: The seed, as required by the gym library.
+		"""
+		self._random_generator = get_random_generator(seed)
+		seeded_competitors = [competitor for competitor in self.competitors if hasattr(competitor, 'random_generator')]
+		for competitor, competitor_random_generator in zip(
+				seeded_competitors, spawn_random_generators(self._random_generator, len(seeded_competitors))):
+			competitor.random_generator = competitor_random_generator
+		return [seed]
+
+	def get_state(self) -> dict:
+		"""
+		Take a snapshot of the mutable simulation state of the market.
+		Competitors, spaces, customers and owners are not part of the snapshot because a step does not change them.
+		The random state of the market and of all competitors is included, so a restored market draws the same customers and owners again.
+
+		Returns:
+			dict: A flat dict of counters, arrays and random generator states, which can be passed to `set_state`.
+		"""
+		return {
+			'step_counter': self.step_counter,
+			'common_state': self._get_common_state_array().copy(),
+			'vendor_specific_state': self.vendor_specific_state.copy(),
+			'vendor_actions': self.vendor_actions.copy(),
+			'random_state': self._random_generator.bit_generator.state,
+			'competitor_random_states': [competitor.random_generator.bit_generator.state
+				if hasattr(competitor, 'random_generator') else None for competitor in self.competitors]
+		}
+
+	def set_state(self, state: dict) -> None:
+		"""
+		Restore a snapshot taken by `get_state` of this market or of a market with the same configuration and competitors.
+		Restoring only copies the content of a few arrays, so it is much cheaper than a deepcopy of the market.
+
+		Args:
+			state (dict): The snapshot to restore. It is not modified, so it can be restored several times.
+		"""
+		assert len(state['competitor_random_states']) == len(self.competitors), 'the state must be taken from a market with the same competitors'
+		self.step_counter = state['step_counter']
+		self._set_common_state_array(state['common_state'])
+		self.vendor_specific_state[:] = state['vendor_specific_state']
+		self.vendor_actions[:] = state['vendor_actions']
+		self._random_generator.bit_generator.state = state['random_state']
+		for competitor, competitor_random_state in zip(self.competitors, state['competitor_random_states']):
+			if competitor_random_state is not None:
+				competitor.random_generator.bit_generator.state = competitor_random_state
+
+	def _allocate_vendor_arrays(self) -> None:
+		"""
+		Preallocate the struct-of-arrays layout of the vendors.
+		`vendor_specific_state` gets the shape (number_of_vendors, state dimension) and
+		`vendor_actions` gets the shape (number_of_vendors, action dimension), so each vendor is one row.
+		Both arrays are reused for all episodes, `reset` only overwrites their content.
+		"""
+		state_dimension = np.array(self._reset_vendor_specific_state(), ndmin=1).size
+		action_dimension = np.array(self._reset_vendor_actions(), ndmin=1).size
+		self.vendor_specific_state = np.zeros((self._number_of_vendors, state_dimension), dtype=np.int64)
+		self.vendor_actions = np.zeros((self._number_of_vendors, action_dimension),
+			dtype=np.float32 if self.support_continuous_action_space else np.int64)
+		self._setup_observation_indices()
+
+	def _setup_observation_indices(self) -> None:
+		"""
+		Precompute where the observation of every vendor view can be found in the flat state vector.
+		The flat state vector is the common state followed by the rows of `vendor_specific_state` and the rows of `vendor_actions`.
+		Row `vendor_view` of `_observation_indices` lists the positions of the entries of that view in the order described in `_observation`.
+		The common state is reset here to determine its dimension.
+		"""
+		self._reset_common_state()
+		common_state_dimension = self._get_common_state_array().size
+		state_dimension = self.vendor_specific_state.shape[1]
+		action_dimension = self.vendor_actions.shape[1]
+		self._flat_state = np.zeros(common_state_dimension + self._number_of_vendors * (state_dimension + action_dimension), dtype=np.float32)
+
+		state_indices = common_state_dimension + np.arange(self._number_of_vendors * state_dimension).reshape(self._number_of_vendors, -1)
+		action_indices = state_indices.size + common_state_dimension + \
+			np.arange(self._number_of_vendors * action_dimension).reshape(self._number_of_vendors, -1)
+		observation_indices = []
+		for vendor_view in range(self._number_of_vendors):
+			view_indices = [np.arange(common_state_dimension)] if self.config.common_state_visibility else []
+			view_indices.append(state_indices[vendor_view])
+			for vendor_index in range(self._number_of_vendors):
+				if vendor_index == vendor_view:
+					continue
+				view_indices.append(action_indices[vendor_index])
+				if self.config.opposite_own_state_visibility:
+					view_indices.append(state_indices[vendor_index])
+			observation_indices.append(np.concatenate(view_indices))
+		self._observation_indices = np.array(observation_indices)
+		assert self._observation_indices.shape[1] == self.get_observations_dimension(), \
+			'the observations built from the vendor arrays do not fit into the observation_space'
+
+	def _setup_metrics(self) -> None:
+		"""
+		Declare the metrics recorded during each step once and preallocate the row they are written to.
+		The first metric is always `customer/buy_nothing` and the last one is always `profits/all`.
+		Everything in between is declared by the economy in `_declare_metrics`.
+		"""
+		self._metrics_schema = MetricsSchema(self._number_of_vendors)
+		self._metrics_schema.add('customer/buy_nothing')
+		self._declare_metrics()
+		self._metrics_schema.add('profits/all', per_vendor=True, is_integer=False)
+		self._metrics_row = self._metrics_schema.create_row()
+
+	def _set_metric(self, name, value, vendor=None) -> None:
+		"""
+		Overwrite a metric in the metrics row of the current step.
+
+		Args:
+			name (str): The name of the metric.
+			value (number or np.array): The new value. For a per-vendor metric without vendor, one value per vendor.
+			vendor (int, optional): The vendor whose value is set. Defaults to None.
+		"""
+		self._metrics_row[self._metrics_schema.get_index(name, vendor)] = value
+
+	def _add_to_metric(self, name, value, vendor=None) -> None:
+		"""
+		Increase a metric in the metrics row of the current step.
+
+		Args:
+			name (str): The name of the metric.
+			value (number or np.array): The value to add. For a per-vendor metric without vendor, one value per vendor.
+			vendor (int, optional): The vendor whose value is increased. Defaults to None.
+		"""
+		self._metrics_row[self._metrics_schema.get_index(name, vendor)] += value
+
+	def get_metrics_schema(self) -> MetricsSchema:
+		"""
+		Return the schema of the metrics this market records in each step.
+
+		Returns:
+			MetricsSchema: The schema of the rows wrapped by the infos returned by `step`.
+		"""
+		return self._metrics_schema
+
+	def get_vendor_specific_state(self) -> np.ndarray:
+		"""
+		Return the vendor specific state of all vendors.
+
+		Returns:
+			np.ndarray: The array of shape (number_of_vendors, state dimension). Row i contains the state of vendor i.
+		"""
+		return self.vendor_specific_state
+
+	def get_vendor_actions(self) -> np.ndarray:
+		"""
+		Return the current actions of all vendors.
+
+		Returns:
+			np.ndarray: The array of shape (number_of_vendors, action dimension). Row i contains the action of vendor i.
+		"""
+		return self.vendor_actions
 
 	@abstractmethod
 	def _is_probability_distribution_fitting_exactly(self, probability_distribution) -> None:
@@ -121,8 +308,8 @@ class SimMarket(gym.Env, JSONConfigurable):
 		assert isinstance(probability_distribution, np.ndarray), 'generate_purchase_probabilities_from_offer must return an np.ndarray'
 		assert self._is_probability_distribution_fitting_exactly(probability_distribution)
 
-		customer_decisions = np.random.multinomial(number_of_customers, probability_distribution).tolist()
-		self._output_dict['customer/buy_nothing'] += customer_decisions[0]
+		customer_decisions = self._random_generator.multinomial(number_of_customers, probability_distribution).tolist()
+		self._add_to_metric('customer/buy_nothing', customer_decisions[0])
 		for seller, frequency in enumerate(customer_decisions):
 			if seller == 0 or frequency == 0:
 				continue
@@ -137,10 +324,11 @@ class SimMarket(gym.Env, JSONConfigurable):
 			action (int | Tuple): The action of the agent. In discrete case: the action must be between 0 and number of actions -1.
 			Note that you must add one to this price to get the real price!
 		Returns:
-			Tuple[np.array, float, bool, dict]: A Tuple,
+			Tuple[np.array, float, bool, MetricsInfo]: A Tuple,
 			containing the observation the agents makes right before his next action,
 			the reward he made between these actions,
 			a flag indicating if the market closes and information about the market for logging purposes.
+			The information can be used like the dict of all metrics in the schema, see `get_metrics_schema`.
 		"""
 		if isinstance(action, np.ndarray) and len(action) == 1:
 			action = action.item()
@@ -154,30 +342,62 @@ class SimMarket(gym.Env, JSONConfigurable):
 
 		profits = [0] * self._number_of_vendors
 
-		self._output_dict = {'customer/buy_nothing': 0}
-		self._initialize_output_dict()
+		self._metrics_row.fill(0)
+		self._initialize_metrics()
+
+		self._simulate_rounds(profits)
+
+		self._consider_storage_costs(profits)
+
+		self._set_metric('profits/all', profits)
+		is_done = self.step_counter >= self.config.episode_length
+		reward = profits[0] if not self.config.reward_mixed_profit_and_difference else 2 * profits[0] - np.max(profits[1:])
+		observation = self._observation()
+		assert self.observation_space.contains(observation), f'{observation} ({type(observation)}) invalid observation'
+		return observation, float(reward), is_done, MetricsInfo(self._metrics_schema, self._metrics_row.copy())
+
+	def _simulate_rounds(self, profits) -> None:
+		"""
+		Simulate the customers and owners of one step in one round per vendor.
+		Each round gets an equal share of the customers, afterwards the competitor whose turn it is updates its pricing.
 
-		customers_per_vendor_iteration = self.config.number_of_customers // self._number_of_vendors
-		for i in range(self._number_of_vendors):
+		Args:
+			profits (list): The profits of the vendors get added to this list.
+		"""
+		customers_per_vendor_iteration = self.config.number_of_customers // self._get_number_of_rounds()
+		for i in range(self._get_number_of_rounds()):
 			self._simulate_customers(profits, customers_per_vendor_iteration)
 			if self._owner is not None:
 				self._simulate_owners(profits)
 
 			# the competitor, which turn it is, will update its pricing
 			if i < len(self.competitors):
-				action_competitor_i = self.competitors[i].policy(self._observation(i + 1))
-				if self.support_continuous_action_space:
-					action_competitor_i = np.array(action_competitor_i, dtype=np.float32)
-				assert self.action_space.contains(action_competitor_i), \
-					f'This vendor does not deliver a suitable action, action_space: {self.action_space}, action: {action_competitor_i}'
-				self.vendor_actions[i + 1] = action_competitor_i
+				self.vendor_actions[i + 1] = self._get_competitor_action(i, self._observation(i + 1))
 
-		self._consider_storage_costs(profits)
+	def _get_number_of_rounds(self) -> int:
+		"""
+		Returns:
+			int: The number of rounds the customers and owners of one step are split into.
+		"""
+		return self._number_of_vendors
 
-		self._ensure_output_dict_has('profits/all', profits)
-		is_done = self.step_counter >= self.config.episode_length
-		reward = profits[0] if not self.config.reward_mixed_profit_and_difference else 2 * profits[0] - np.max(profits[1:])
-		return self._observation(), float(reward), is_done, self._output_dict
+	def _get_competitor_action(self, competitor_index: int, observation: np.array):
+		"""
+		Let a competitor choose its action based on its view of the current market state.
+
+		Args:
+			competitor_index (int): The index of the competitor in `competitors`. Its vendor index is one larger.
+			observation (np.array): The view of the competitor.
+
+		Returns:
+			int, tuple or np.array: The action of the competitor, ready to be written to `vendor_actions`.
+		"""
+		action_competitor = self.competitors[competitor_index].policy(observation)
+		if self.support_continuous_action_space:
+			action_competitor = np.array(action_competitor, dtype=np.float32)
+		assert self.action_space.contains(action_competitor), \
+			f'This vendor does not deliver a suitable action, action_space: {self.action_space}, action: {action_competitor}'
+		return action_competitor
 
 	def _observation(self, vendor_view=0) -> np.array:
 		"""
@@ -186,37 +406,35 @@ class SimMarket(gym.Env, JSONConfigurable):
 		At the beginning of the array you have the common state.
 		Afterwards you have the vendor specific state for the vendor with index vendor_view but NOT its actions from prior steps.
 		Then, all other vendors follow with their actions and vendor specific state.
+		The state is written to the flat state vector once, the view is gathered from it with the indices of `_setup_observation_indices`.
+		Only the observations returned by `reset` and `step` are checked against the observation_space.
 		Args:
 			vendor_view (int, optional): Index of the vendor whose view we create. Defaults to 0.
 		Returns:
 			np.array: the view for the vendor with index vendor_view
 		"""
-		# observatons is the array containing the global states. We add everything relevant to it, then return a concatenated version.
-		observations = [self._get_common_state_array()] if self.config.common_state_visibility else []
-		if self.config.common_state_visibility:
-			assert isinstance(observations[0], np.ndarray), '_get_common_state_array must return an np.ndarray'
-
-		# first the state of the vendor whose view we create will be added
-		if self.vendor_specific_state[vendor_view] is not None:
-			observations.append(np.array(self.vendor_specific_state[vendor_view], ndmin=1, dtype=np.float32))
+		self._update_flat_state()
+		return self._flat_state.take(self._observation_indices[vendor_view])
 
-		# the rest of the vendors actions and states will be added
-		for vendor_index in range(self._number_of_vendors):
-			if vendor_index == vendor_view:
-				continue
-			observations.append(np.array(self.vendor_actions[vendor_index], ndmin=1, dtype=np.float32))
-			if self.vendor_specific_state[vendor_index] is not None and self.config.opposite_own_state_visibility:
-				observations.append(np.array(self.vendor_specific_state[vendor_index], ndmin=1, dtype=np.float32))
-
-		# The observation has to be part of the observation_space defined by the market
-		concatenated_observations = np.concatenate(observations, dtype=np.float32)
-		assert self.observation_space.contains(concatenated_observations), \
-			f'{concatenated_observations} ({type(concatenated_observations)}) invalid observation'
-		return concatenated_observations
+	def _update_flat_state(self) -> None:
+		"""
+		Write the common state, `vendor_specific_state` and `vendor_actions` to the flat state vector.
+		"""
+		np.concatenate((self._get_common_state_array(), self.vendor_specific_state.ravel(), self.vendor_actions.ravel()), out=self._flat_state)
 
 	def _reset_common_state(self) -> None:
 		pass
 
+	def _set_common_state_array(self, common_state: np.array) -> None:
+		"""
+		Overwrite the common state with an array returned by `_get_common_state_array`.
+		Markets with a common state must overwrite this method.
+
+		Args:
+			common_state (np.array): The common state to restore.
+		"""
+		assert len(common_state) == 0, 'this market has no common state'
+
 	@abstractmethod
 	def _get_common_state_array(self) -> None:
 		"""
@@ -327,29 +545,20 @@ class SimMarket(gym.Env, JSONConfigurable):
 		raise NotImplementedError
 
 	@abstractmethod
-	def _initialize_output_dict(self):
+	def _declare_metrics(self) -> None:
 		"""
-		Initialize the entries in the output dict for an economy.
+		Add the metrics of an economy to `self._metrics_schema`.
+		It is called once when the market is created.
 		"""
 		raise NotImplementedError
 
-	def _ensure_output_dict_has(self, name, init_for_all_vendors=None) -> None:
+	@abstractmethod
+	def _initialize_metrics(self) -> None:
 		"""
-		Ensure that the _output_dict has an entry with the given name and create an entry otherwise.
-		If a parameter for init_for_all_vendors is passed, it will be interpreted as creating a dict with the passed array as content.
-
-		Args:
-			name (string): name of the dict entry which should be checked.
-			init_for_all_vendors (list, optional): initialization values for all vendors in this entry. Defaults to None.
-		"""
-		if init_for_all_vendors is not None:
-			assert isinstance(init_for_all_vendors, list) and len(init_for_all_vendors) == self._number_of_vendors, \
-				'make sure you pass a list with length of number of vendors'
-		if name not in self._output_dict:
-			if init_for_all_vendors is None:
-				self._output_dict[name] = 0
-			else:
-				self._output_dict[name] = dict(zip([f'vendor_{i}' for i in range(self._number_of_vendors)], init_for_all_vendors))
+		Record the state and the actions at the beginning of a step in the metrics row.
+		The row is already reset to zero when this method is called.
+		"""
+		raise NotImplementedError
 
 	@abstractmethod
 	def get_configurable_fields() -> list:
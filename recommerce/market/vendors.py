@@ -1,14 +1,18 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
 from attrdict import AttrDict
 
+from recommerce.configuration.utils import get_random_generator
+
 
 # This file contains all abstract vendors who are not made for a specific market situation (like circular and linear)
 class Agent(ABC):
 
-	def __init__(self, config_market: AttrDict, name=''):
+	def __init__(self, config_market: AttrDict, name='', random_generator=None):
 		self.name = name if name != '' else type(self).__name__
 		self.config_market = config_market
+		self.random_generator = get_random_generator(random_generator)
 
 	@classmethod
 	def custom_init(cls, class_name, args):
@@ -28,6 +32,19 @@ class Agent(ABC):
 	def policy(self, observation, *_):  # pragma: no cover
 		raise NotImplementedError('This method is abstract. Use a subclass')
 
+	def policy_batch(self, observations: np.array) -> np.array:
+		"""
+		Ask the agent for its actions in several situations at once.
+		By default, `policy` is called for every observation. Agents override this method if they can answer the whole batch at once.
+
+		Args:
+			observations (np.array): The observations, one per row.
+
+		Returns:
+			np.array: The actions in market form, one per row.
+		"""
+		return np.array([self.policy(observation) for observation in observations])
+
 
 class HumanPlayer(ABC):
 	@abstractmethod
@@ -43,4 +60,5 @@ class FixedPriceAgent(RuleBasedAgent, ABC):
 	"""
 	An abstract class for FixedPriceAgents
 	"""
-	pass
+	def policy_batch(self, observations: np.array) -> np.array:
+		return np.array([self.fixed_price] * len(observations))
@@ -104,6 +104,7 @@ class Configurator():
 			# this is internal, but we need to change it...
 			self.marketplace._number_of_vendors = self.marketplace._get_number_of_vendors()
 			self.marketplace._setup_action_observation_space(self.marketplace.support_continuous_action_space)
+			self.marketplace._allocate_vendor_arrays()
 
 		for current_agent in agents_with_config:
 			if issubclass(current_agent[0], (RuleBasedAgent, HumanPlayer)):
@@ -215,8 +216,6 @@ class Configurator():
 					if not isinstance(competitor, Agent):
 						competitor = competitor(config_market=config_market)
 				assert separate_markets, 'competitors can only be provided if separate_markets is True'
-				assert all(isinstance(competitor, RuleBasedAgent) for competitor in competitors), \
-					'All competitors must be RuleBased, or `deepcopy` will fail'
 				assert marketplace.get_num_competitors() == np.inf or len(competitors) == marketplace.get_num_competitors(), \
 					f'The number of competitors given is invalid: was {len(competitors)} but should be {marketplace.get_num_competitors()}'
 
@@ -1,7 +1,6 @@
 import os
 import signal
 import sys
-from copy import deepcopy
 
 import torch
 from attrdict import AttrDict
@@ -61,11 +60,11 @@ class Monitor():
 			for _ in trange(1, self.configurator.episodes + 1, unit=' episodes', leave=False):
 				# reset the state & marketplace once to be used by all agents
 				source_state = self.configurator.marketplace.reset()
-				source_marketplace = self.configurator.marketplace
+				source_market_state = self.configurator.marketplace.get_state()
 
 				for current_agent_index in range(len(self.configurator.agents)):
-					# for every agent, set an equivalent "start-market"
-					self.configurator.marketplace = deepcopy(source_marketplace)
+					# for every agent, restore an equivalent "start-market"
+					self.configurator.marketplace.set_state(source_market_state)
 					state = source_state
 					is_done = False
 
@@ -35,6 +35,21 @@ class PolicyAnalyzer():
 		else:
 			return self.agent_to_analyze.policy(observation)
 
+	def _agents_policy_batch(self, observations) -> np.array:
+		"""
+		The batched form of `_agents_policy`, which asks the agent for all observations at once.
+
+		Args:
+			observations (np.array): The observations which should be used, one per row.
+
+		Returns:
+			np.array: The requested policy values, one per row.
+		"""
+		if isinstance(self.agent_to_analyze, ContinuousActorCriticAgent):
+			return self.agent_to_analyze.policy_batch(observations, mean_only=True)
+		else:
+			return self.agent_to_analyze.policy_batch(observations)
+
 	def _assert_analyzed_feature_valid(self, feature):
 		assert isinstance(feature, tuple), f'{feature}: such a feature must be a tuple'
 		assert len(feature) == 3, f'{feature}: such a feature must be a triple'
@@ -49,30 +64,23 @@ class PolicyAnalyzer():
 		return policy_value + 1
 
 	def _plot_one_depending_variable(self, base_input, analyzed_features, title, policyaccess):
-		pointsx = []
-		pointsy = []
-		for x in analyzed_features[0][2]:
-			base_input[analyzed_features[0][0]] = x
-			y = self._agents_policy(base_input)
-			y = self._access_and_adjust_policy(y, policyaccess)
-			pointsx.append(x)
-			pointsy.append(y)
+		pointsx = list(analyzed_features[0][2])
+		observations = np.tile(base_input, (len(pointsx), 1))
+		observations[:, analyzed_features[0][0]] = pointsx
+		pointsy = [self._access_and_adjust_policy(y, policyaccess) for y in self._agents_policy_batch(observations)]
 
 		plt.scatter(pointsx, pointsy)
 		plt.ylabel(title)
 		plt.grid(True)
 
 	def _plot_two_depending_variables(self, base_input, analyzed_features, title, policyaccess):
-		policyval = [[0 for _ in analyzed_features[0][2]] for _ in analyzed_features[1][2]]
-		x1base = list(analyzed_features[0][2])[0]
-		x2base = list(analyzed_features[1][2])[0]
-		for x1 in analyzed_features[0][2]:
-			for x2 in analyzed_features[1][2]:
-				base_input[analyzed_features[0][0]] = x1
-				base_input[analyzed_features[1][0]] = x2
-				y = self._agents_policy(base_input)
-				y = self._access_and_adjust_policy(y, policyaccess)
-				policyval[x2 - x2base][x1 - x1base] = y
+		# one row of the plot per value of the second feature and one column per value of the first feature
+		x1_values, x2_values = np.meshgrid(list(analyzed_features[0][2]), list(analyzed_features[1][2]))
+		observations = np.tile(base_input, (x1_values.size, 1))
+		observations[:, analyzed_features[0][0]] = x1_values.ravel()
+		observations[:, analyzed_features[1][0]] = x2_values.ravel()
+		policy_values = [self._access_and_adjust_policy(y, policyaccess) for y in self._agents_policy_batch(observations)]
+		policyval = np.reshape(policy_values, x1_values.shape).tolist()
 
 		shown_section = [min(analyzed_features[0][2]), max(analyzed_features[0][2]),
 					min(analyzed_features[1][2]), max(analyzed_features[1][2])]
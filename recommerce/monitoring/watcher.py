@@ -1,9 +1,11 @@
+import copy
 import json
 
 import numpy as np
 from attrdict import AttrDict
 
 import recommerce.configuration.utils as ut
+from recommerce.market.metrics import MetricsInfo
 
 
 class Watcher:
@@ -39,18 +41,48 @@ class Watcher:
 		with open(save_path, 'w') as f:
 			json.dump(float_dicts, f)
 
+	def get_state(self) -> dict:
+		"""
+		Take a snapshot of the finished episodes and of the episodes in progress, e.g. for a checkpoint of the training.
+
+		Returns:
+			dict: Copies of all dicts, the step counters and the accumulators, which can be passed to `set_state`.
+		"""
+		return copy.deepcopy({'all_dicts': self.all_dicts, 'step_counters': self.step_counters, 'info_accumulators': self.info_accumulators})
+
+	def set_state(self, state: dict) -> None:
+		"""
+		Restore a snapshot taken by `get_state` of a watcher with the same number of environments.
+
+		Args:
+			state (dict): The snapshot to restore. It is not modified.
+		"""
+		assert len(state['step_counters']) == self.number_envs, \
+			f'the state was taken from a watcher with {len(state["step_counters"])} environments, but this one has {self.number_envs}'
+		state = copy.deepcopy(state)
+		self.all_dicts = state['all_dicts']
+		self.step_counters = state['step_counters']
+		self.info_accumulators = state['info_accumulators']
+
 	def add_info(self, info: dict, index: int = 0):
 		"""
 		Add a info dict received from the environment to the accumulator.
 
+		Infos returned by the markets are summed up row-wise, all other infos are summed up dict by dict.
+
 		Args:
-			info (dict): A raw dict containing the information from the environment.
+			info (dict): A raw dict or a `MetricsInfo` containing the information from the environment.
 			index (int, optional): If there are multiple environments in parallel, this index is used to specify which environment was used.
 			Defaults to 0.
 		"""
 		assert index < self.number_envs and index >= 0
-		self.info_accumulators[index] = \
-			info if self.info_accumulators[index] is None else ut.add_content_of_two_dicts(self.info_accumulators[index], info)
+		accumulator = self.info_accumulators[index]
+		if accumulator is None:
+			self.info_accumulators[index] = info.copy() if isinstance(info, MetricsInfo) else info
+		elif isinstance(accumulator, MetricsInfo) and isinstance(info, MetricsInfo):
+			accumulator.accumulate(info)
+		else:
+			self.info_accumulators[index] = ut.add_content_of_two_dicts(accumulator, info)
 		self.step_counters[index] += 1
 		assert self.step_counters[index] <= self.config_market.episode_length
 		if self.step_counters[index] == self.config_market.episode_length:
@@ -62,7 +94,8 @@ class Watcher:
 		"""
 		assert index < self.number_envs and index >= 0
 		assert self.step_counters[index] == self.config_market.episode_length
-		self.all_dicts.append(self.info_accumulators[index])
+		accumulator = self.info_accumulators[index]
+		self.all_dicts.append(accumulator.to_dict() if isinstance(accumulator, MetricsInfo) else accumulator)
 		self.info_accumulators[index] = None
 		self.step_counters[index] = 0
 
@@ -1,3 +1,4 @@
+import copy
 from abc import ABC, abstractmethod
 
 import numpy as np
@@ -26,7 +27,8 @@ class ActorCriticAgent(ReinforcementLearningAgent, ABC):
 			load_path=None,
 			critic_path=None,
 			name='',
-			network_architecture=model.simple_network):
+			network_architecture=model.simple_network,
+			random_generator=None):
 		assert isinstance(marketplace, SimMarket), f'marketplace must be a SimMarket, but is {type(marketplace)}'
 
 		n_observations = marketplace.get_observations_dimension()
@@ -37,6 +39,7 @@ class ActorCriticAgent(ReinforcementLearningAgent, ABC):
 		self.config_rl = config_rl
 		self.device = device
 		self.name = name if name != '' else type(self).__name__
+		self.random_generator = ut.get_random_generator(random_generator)
 		print(f'Initializing an ActorCriticAgent using {self.device} device')
 		self.initialize_models_and_optimizer(n_observations, network_output_size, network_architecture)
 		if load_path is not None:
@@ -66,6 +69,22 @@ class ActorCriticAgent(ReinforcementLearningAgent, ABC):
 		"""
 		raise NotImplementedError('This method is abstract. Use a subclass')
 
+	@abstractmethod
+	def policy_batch(self, observations, verbose=False, raw_action=False) -> None:  # pragma: no cover
+		"""
+		Like `policy`, but for a batch of observations, which are passed through the networks at once.
+
+		Args:
+			observations (np.array): The current observations, one per row.
+			verbose (bool, optional): Flag to additionally return the network outputs and the value estimates. Defaults to False.
+			raw_action (bool, optional): Flag to make the agent return its actions without calling agent_output_to_market_form.
+			Defaults to False.
+
+		Returns:
+			np.array: The actions, one per row. If verbose, the network outputs and the value estimates follow as np.arrays.
+		"""
+		raise NotImplementedError('This method is abstract. Use a subclass')
+
 	def save(self, model_path: str) -> None:
 		"""
 		Save a trained model to the specified folder within 'trainedModels'.
@@ -75,7 +94,48 @@ class ActorCriticAgent(ReinforcementLearningAgent, ABC):
 			model_path (str): The path including the name where the model should be saved.
 		"""
 		assert model_path.endswith('.dat'), f'the modelname must end in ".dat": {model_path}'
-		torch.save(self.actor_net.state_dict(), model_path)
+		self.write_model_snapshot(self.get_model_snapshot(), model_path)
+
+	def get_model_snapshot(self):
+		"""
+		Returns:
+			dict: A copy of the parameters of the actor net, which `write_model_snapshot` writes like `save`, e.g. in a background thread.
+		"""
+		return copy.deepcopy(self.actor_net.state_dict())
+
+	@staticmethod
+	def write_model_snapshot(snapshot, model_path: str) -> None:
+		torch.save(snapshot, model_path)
+
+	def get_state(self) -> dict:
+		"""
+		Take a snapshot of everything the training changes, so it can be resumed from a checkpoint.
+
+		Returns:
+			dict: The parameters of all networks, the states of both optimizers and the random state.
+		"""
+		return {
+			'actor_net': self.actor_net.state_dict(),
+			'critic_net': self.critic_net.state_dict(),
+			'critic_tgt_net': self.critic_tgt_net.state_dict(),
+			'actor_optimizer': self.actor_optimizer.state_dict(),
+			'critic_optimizer': self.critic_optimizer.state_dict(),
+			'random_state': self.random_generator.bit_generator.state
+		}
+
+	def set_state(self, state: dict) -> None:
+		"""
+		Restore a snapshot taken by `get_state` of an agent with the same architecture.
+
+		Args:
+			state (dict): The snapshot to restore.
+		"""
+		self.actor_net.load_state_dict(state['actor_net'])
+		self.critic_net.load_state_dict(state['critic_net'])
+		self.critic_tgt_net.load_state_dict(state['critic_tgt_net'])
+		self.actor_optimizer.load_state_dict(state['actor_optimizer'])
+		self.critic_optimizer.load_state_dict(state['critic_optimizer'])
+		self.random_generator.bit_generator.state = state['random_state']
 
 	def train_batch(self, states, actions, rewards, next_states, regularization=False):
 		"""
@@ -100,7 +160,7 @@ class ActorCriticAgent(ReinforcementLearningAgent, ABC):
 
 		v_estimates = self.critic_net(states)
 		with torch.no_grad():
-			v_expected = (rewards + self.config_rl.gamma * self.critic_tgt_net(next_states).detach()).view(-1, 1)
+			v_expected = (rewards + self.config_rl.gamma * self.critic_tgt_net(next_states).detach().view(-1)).view(-1, 1)
 		critic_loss = torch.nn.MSELoss()(v_estimates, v_expected)
 		critic_loss.backward()
 
@@ -151,6 +211,19 @@ class ActorCriticAgent(ReinforcementLearningAgent, ABC):
 		"""
 		raise NotImplementedError('This method is abstract. Use a subclass')
 
+	@abstractmethod
+	def agent_output_to_market_form_batch(self, actions) -> None:  # pragma: no cover
+		"""
+		The vectorized form of `agent_output_to_market_form`.
+
+		Args:
+			actions (np.array): The raw actions, one per row.
+
+		Returns:
+			np.array: The actions accepted by the market, one per row.
+		"""
+		raise NotImplementedError('This method is abstract. Use a subclass')
+
 	@staticmethod
 	def get_configurable_fields() -> list:
 		return [
@@ -180,7 +253,7 @@ class DiscreteActorCriticAgent(ActorCriticAgent, LinearAgent, CircularAgent):
 				v_estimate = self.critic_net(observation).view(-1)
 
 		distribution = distribution.to('cpu').detach().numpy()
-		action = ut.shuffle_from_probabilities(distribution)
+		action = int(ut.sample_from_probabilities(distribution[np.newaxis], self.random_generator)[0])
 		action = action if raw_action else self.agent_output_to_market_form(action)
 
 		if verbose:
@@ -188,6 +261,22 @@ class DiscreteActorCriticAgent(ActorCriticAgent, LinearAgent, CircularAgent):
 		else:
 			return action
 
+	def policy_batch(self, observations, verbose=False, raw_action=False):
+		observations = torch.Tensor(np.array(observations)).to(self.device)
+		with torch.no_grad():
+			distributions = torch.softmax(self.actor_net(observations), dim=1)
+			if verbose:
+				v_estimates = self.critic_net(observations).view(-1)
+
+		distributions = distributions.to('cpu').detach().numpy()
+		actions = ut.sample_from_probabilities(distributions, self.random_generator)
+		market_actions = actions if raw_action else self.agent_output_to_market_form_batch(actions)
+
+		if verbose:
+			return market_actions, distributions[np.arange(len(actions)), actions], v_estimates.to('cpu').numpy()
+		else:
+			return market_actions
+
 	def log_probability_given_action(self, states, actions):
 		return -torch.log(torch.softmax(self.actor_net(states), dim=0).gather(1, actions.unsqueeze(-1)))
 
@@ -201,6 +290,9 @@ class DiscreteActorCriticAgent(ActorCriticAgent, LinearAgent, CircularAgent):
 		action_list.reverse()
 		return tuple(action_list)
 
+	def agent_output_to_market_form_batch(self, actions):
+		return ut.decode_discrete_actions(actions, self.config_market.max_price, self.actions_dimension)
+
 
 class ContinuousActorCriticAgent(ActorCriticAgent, LinearAgent, CircularAgent):
 	"""
@@ -257,6 +349,28 @@ class ContinuousActorCriticAgent(ActorCriticAgent, LinearAgent, CircularAgent):
 		else:
 			return action
 
+	def policy_batch(self, observations, verbose=False, raw_action=False, mean_only=False):
+		observations = torch.Tensor(np.array(observations)).to(self.device)
+		with torch.no_grad():
+			network_result = self.actor_net(observations)
+			means, stds = self.transform_network_output(len(observations), network_result)
+			if verbose:
+				v_estimates = self.critic_net(observations).view(-1)
+
+		if mean_only:
+			return means.cpu().numpy()
+
+		actions = torch.clamp(torch.round(torch.normal(means, stds)), 0, 9)
+		# Like in policy, a single price per observation is not wrapped in an array
+		actions = actions.type(torch.LongTensor).to('cpu').numpy().reshape(len(observations), -1).squeeze(axis=1 if means.shape[1] == 1 else ())
+		market_actions = actions if raw_action else self.agent_output_to_market_form_batch(actions)
+
+		if verbose:
+			transformed_network_outputs = np.concatenate((means.to('cpu').numpy(), stds.to('cpu').numpy()), axis=1)
+			return market_actions, transformed_network_outputs, v_estimates.to('cpu').numpy()
+		else:
+			return market_actions
+
 	def log_probability_given_action(self, states, actions):
 		network_result = self.actor_net(states)
 		mean, std = self.transform_network_output(network_result.shape[0], network_result)
@@ -280,6 +394,9 @@ class ContinuousActorCriticAgent(ActorCriticAgent, LinearAgent, CircularAgent):
 	def agent_output_to_market_form(self, action):
 		return action.tolist()
 
+	def agent_output_to_market_form_batch(self, actions):
+		return actions
+
 
 class ContinuousActorCriticAgentFixedOneStd(ContinuousActorCriticAgent):
 	def transform_network_output(self, number_outputs, network_result):
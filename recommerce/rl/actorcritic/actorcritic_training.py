@@ -1,9 +1,9 @@
-import random
-
 import numpy as np
 import torch
 
 import recommerce.rl.actorcritic.actorcritic_agent as actorcritic_agent
+from recommerce.monitoring.watcher import Watcher
+from recommerce.rl.environment_pool import EnvironmentPool, create_marketplace_factories
 from recommerce.rl.training import RLTrainer
 
 
@@ -21,78 +21,96 @@ class ActorCriticTrainer(RLTrainer):
 		Returns:
 			set: the distinct shuffled numbers
 		"""
-		chosen_envs = set()
-		while len(chosen_envs) < self.config_rl.batch_size:
-			number = random.randint(0, total_envs - 1)
-			if number not in chosen_envs:
-				chosen_envs.add(number)
-		return chosen_envs
-
-	def train_agent(self, number_of_training_steps=200, verbose=False, total_envs=128) -> None:
+		return set(self._random_generator.choice(total_envs, self.config_rl.batch_size, replace=False).tolist())
+
+	def train_agent(self, number_of_training_steps=200, verbose=False, total_envs=128, number_of_workers=None, checkpoint_interval=None,
+			resume_from=None) -> None:
 		"""
 		This is the central method you need to start training of actorcritic_agent.
 		You can customize the training by several parameters.
+		The environments are sharded across worker processes of an `EnvironmentPool`, the chosen environments of a batch are stepped
+		in parallel and the actions of the whole batch are computed in one forward pass.
 
 		Args:
 			number_of_training_steps (int, optional): The number of batches the agent is trained with. Defaults to 200.
 			verbose (bool, optional): Should additional information about agent steps be written to the tensorboard? Defaults to False.
 			total_envs (int, optional): The number of environments you use in parallel to fulfill the iid assumption. Defaults to 128.
+			number_of_workers (int, optional): The number of worker processes of the environments. Defaults to None, which means one per cpu.
+			checkpoint_interval (int, optional): The number of batches after which a checkpoint is written with `save_checkpoint`.
+				Defaults to None, which means that no checkpoints are written.
+			resume_from (str, optional): The path of a checkpoint of an interrupted training with the same parameters, which is continued.
+				Defaults to None.
 		"""
-		self.initialize_callback(number_of_training_steps * self.config_rl.batch_size)
-
+		assert checkpoint_interval is None or isinstance(checkpoint_interval, int) and checkpoint_interval > 0, \
+			f'checkpoint_interval must be a positive integer: {checkpoint_interval}'
+		training_parameters = {'number_of_training_steps': number_of_training_steps, 'total_envs': total_envs,
+			'batch_size': self.config_rl.batch_size}
+		marketplace = self.initialize_callback(number_of_training_steps * self.config_rl.batch_size, resume_from)
+		self.callback.watcher = Watcher(config_market=self.config_market, number_envs=total_envs)
+
+		first_step = 0
 		last_value_loss = 0
 		last_policy_loss = 0
 
 		finished_episodes = 0
 		self.callback.num_timesteps = 0
-		environments = [self.marketplace_class(config=self.config_market, competitors=self.competitors) for _ in range(total_envs)]
-
-		for step_number in range(number_of_training_steps):
-			chosen_envs = self.choose_random_envs(total_envs)
-
-			states = []
-			actions = []
-			rewards = []
-			states_dash = []
-			for env in chosen_envs:
-				self.callback.num_timesteps += 1
-				state = environments[env]._observation()
+		environments = EnvironmentPool(create_marketplace_factories(marketplace, total_envs, self._random_generator), number_of_workers)
+
+		try:
+			if resume_from is not None:
+				loop_state = self.load_checkpoint(resume_from)
+				assert loop_state['training_parameters'] == training_parameters, \
+					f'the checkpoint was written by a training with other parameters: {loop_state["training_parameters"]}'
+				first_step, finished_episodes = loop_state['step_number'], loop_state['finished_episodes']
+				last_value_loss, last_policy_loss = loop_state['last_value_loss'], loop_state['last_policy_loss']
+				environments.set_states(loop_state['market_states'])
+
+			for step_number in range(first_step, number_of_training_steps):
+				chosen_envs = np.array(sorted(self.choose_random_envs(total_envs)))
+				states = environments.get_observations(chosen_envs)
 				if not verbose:
-					action = self.callback.model.policy(state, verbose=False, raw_action=True)
+					actions = self.callback.model.policy_batch(states, verbose=False, raw_action=True)
 				else:
-					action, net_output, v_estimate = self.callback.model.policy(state, verbose=True, raw_action=True)
-				next_state, reward, is_done, info = environments[env].step(self.callback.model.agent_output_to_market_form(action))
-
-				# The following numbers are divided by the episode length because they will be summed up later in the watcher
-				info['loss/value'] = last_value_loss / self.config_market.episode_length
-				info['loss/policy'] = last_policy_loss / self.config_market.episode_length
-				if verbose:
-					if isinstance(net_output, np.float32):
-						info['verbose/net_output'] = net_output
-					else:
-						for action_num, output in enumerate(net_output):
-							info[f'verbose/information_{str(action_num)}'] = output / self.config_market.episode_length
-					info['verbose/v_estimate'] = v_estimate / self.config_market.episode_length
-
-				states.append(state)
-				actions.append(action)
-				rewards.append(reward)
-				states_dash.append(next_state)
-
-				if is_done:
-					finished_episodes += 1
-
-				self.callback._on_step(finished_episodes, info, env)
-				if is_done:
-					environments[env].reset()
-
-			last_policy_loss, last_value_loss = self.callback.model.train_batch(
-				torch.Tensor(np.array(states)),
-				torch.from_numpy(np.array(actions, dtype=np.int64)),
-				torch.Tensor(np.array(rewards)),
-				torch.Tensor(np.array(next_state)),
-				finished_episodes <= 500)
-
-			self.consider_sync_tgt_net(step_number)
+					actions, net_outputs, v_estimates = self.callback.model.policy_batch(states, verbose=True, raw_action=True)
+				states_dash, rewards, are_done, infos = environments.step(chosen_envs, self.callback.model.agent_output_to_market_form_batch(actions))
+
+				for batch_index, (env, is_done, info) in enumerate(zip(chosen_envs, are_done, infos)):
+					self.callback.num_timesteps += 1
+					# The following numbers are divided by the episode length because they will be summed up later in the watcher
+					info['loss/value'] = last_value_loss / self.config_market.episode_length
+					info['loss/policy'] = last_policy_loss / self.config_market.episode_length
+					if verbose:
+						if net_outputs.ndim == 1:
+							info['verbose/net_output'] = net_outputs[batch_index]
+						else:
+							for action_num, output in enumerate(net_outputs[batch_index]):
+								info[f'verbose/information_{str(action_num)}'] = output / self.config_market.episode_length
+						info['verbose/v_estimate'] = v_estimates[batch_index] / self.config_market.episode_length
+
+					if is_done:
+						finished_episodes += 1
+
+					self.callback._on_step(finished_episodes, info, int(env))
+
+				last_policy_loss, last_value_loss = self.callback.model.train_batch(
+					torch.Tensor(states),
+					torch.from_numpy(np.array(actions, dtype=np.int64)),
+					torch.Tensor(rewards),
+					torch.Tensor(states_dash),
+					finished_episodes <= 500)
+
+				self.consider_sync_tgt_net(step_number)
+
+				if self.is_checkpoint_due(checkpoint_interval, step_number):
+					self.save_checkpoint({
+						'training_parameters': training_parameters,
+						'step_number': step_number + 1,
+						'finished_episodes': finished_episodes,
+						'last_value_loss': last_value_loss,
+						'last_policy_loss': last_policy_loss,
+						'market_states': environments.get_states()
+					})
+		finally:
+			environments.close()
 
 		self.callback._on_training_end()
@@ -18,6 +18,7 @@ from recommerce.monitoring.consecutive_model_analyzer import analyze_consecutive
 from recommerce.monitoring.training_progress_visualizer import save_progress_plots
 from recommerce.monitoring.watcher import Watcher
 from recommerce.rl.actorcritic.actorcritic_agent import ActorCriticAgent
+from recommerce.rl.model_writer import BackgroundModelWriter
 from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
 from recommerce.rl.reinforcement_learning_agent import ReinforcementLearningAgent
 
@@ -27,6 +28,7 @@ class RecommerceCallback(BaseCallback):
 	This callback checks if the current mean return is better than the best mean return.
 	This check happens every episode.
 	After 'iteration_length' episodes, the best model in that time span is saved to disk.
+	The models are written by a `BackgroundModelWriter`, so the training does not wait for the disk.
 	"""
 	def __init__(
 		self,
@@ -38,7 +40,9 @@ class RecommerceCallback(BaseCallback):
 		iteration_length: int = 500,
 		file_ending: str = 'zip',
 		signature: str = 'train',
-		analyze_after_training: bool = True):
+		analyze_after_training: bool = True,
+		episode_hook=None,
+		path_name: str = None):
 
 		assert issubclass(agent_class, ReinforcementLearningAgent)
 		assert isinstance(marketplace, SimMarket)
@@ -47,9 +51,8 @@ class RecommerceCallback(BaseCallback):
 		super(RecommerceCallback, self).__init__(True)
 		self.config_rl = config_rl
 		self.config_market = config_market
-		# TODO: Change the number_envs=128 to the right parameter as soon as #211 is implemented.
-		self.watcher = Watcher(config_market=self.config_market, number_envs=128) if issubclass(agent_class, ActorCriticAgent) \
-			else Watcher(config_market=self.config_market)
+		# Trainers which step several environments replace the watcher by one with an accumulator per environment
+		self.watcher = Watcher(config_market=self.config_market)
 		self.best_mean_interim_reward = None
 		self.best_mean_overall_reward = None
 		self.agent_class = agent_class
@@ -61,10 +64,22 @@ class RecommerceCallback(BaseCallback):
 		self.saved_parameter_paths = []
 		self.last_finished_episode = 0
 		self.analyze_after_training = analyze_after_training
+		# called with the callback after every finished episode, a stable baselines training stops early if it returns False
+		self.episode_hook = episode_hook
+		# a resumed training continues writing to the folders of the interrupted one
+		self.path_name = path_name
+		self.model_writer = BackgroundModelWriter()
 		signal.signal(signal.SIGINT, self._signal_handler)
 
 		self.initialize_io_related()
 
+	def _init_callback(self) -> None:
+		"""
+		Called by stable baselines when the training starts.
+		The watcher gets one accumulator per environment, because a vectorized environment steps several marketplaces at once.
+		"""
+		self.watcher = Watcher(config_market=self.config_market, number_envs=self.training_env.num_envs)
+
 	def _signal_handler(self, signum, frame) -> None:  # pragma: no cover
 		"""
 		Handle any interruptions to the running process, such as a `KeyboardInterrupt`-event.
@@ -80,7 +95,7 @@ class RecommerceCallback(BaseCallback):
 		"""
 		ut.ensure_results_folders_exist()
 		self.curr_time = time.strftime('%b%d_%H-%M-%S')
-		path_name = f'{self.signature}_{self.curr_time}'
+		path_name = self.path_name if self.path_name is not None else f'{self.signature}_{self.curr_time}'
 		self.writer = SummaryWriter(log_dir=os.path.join(PathManager.results_path, 'runs', path_name))
 		self.save_path = os.path.join(PathManager.results_path, 'trainedModels', path_name)
 		os.makedirs(os.path.abspath(self.save_path), exist_ok=True)
@@ -98,7 +113,7 @@ class RecommerceCallback(BaseCallback):
 			env_index (int, optional): The index of the environment the last step was done in. Defaults to 0.
 
 		Returns:
-			bool: True should be returned. False will be interpreted as error.
+			bool: False if the `episode_hook` asks to stop the training, True otherwise.
 		"""
 		assert (finished_episodes is None) == (info is None), 'finished_episodes must be exactly None if info is None'
 
@@ -106,11 +121,16 @@ class RecommerceCallback(BaseCallback):
 		if not issubclass(self.agent_class, QLearningAgent) and not issubclass(self.agent_class, ActorCriticAgent):
 			# self.locals is a feature offered by stablebaselines
 			# locals is a dict with all local variables in the training method of stablebaselines
-			info = self.locals['infos'][0]
+			# There is one info and one done per environment, the environments are reset automatically at the end of their episodes.
+			for env_index, (env_info, is_done) in enumerate(zip(self.locals['infos'], self.locals['dones'])):
+				self.watcher.add_info(env_info, env_index)
+				assert is_done == (self.watcher.step_counters[env_index] == 0), \
+					'the episodes of the watcher must end together with the episodes of the environments'
+			self.tqdm_instance.update(len(self.locals['infos']))
 			finished_episodes = len(self.watcher.all_dicts)
-
-		self.watcher.add_info(info)
-		self.tqdm_instance.update()
+		else:
+			self.watcher.add_info(info, env_index)
+			self.tqdm_instance.update()
 		assert isinstance(finished_episodes, int)
 
 		assert finished_episodes >= self.last_finished_episode
@@ -121,17 +141,19 @@ class RecommerceCallback(BaseCallback):
 		ut.write_dict_to_tensorboard(
 			self.writer, self.watcher.get_average_dict(), finished_episodes,
 			is_cumulative=True, episode_length=self.config_market.episode_length)
+		# Several environments can finish their episodes in the same step, so the periodic actions check if a multiple was passed.
+		previous_finished_episodes = self.last_finished_episode
 		self.last_finished_episode = finished_episodes
 		mean_return = self.watcher.get_average_dict()['profits/all']['vendor_0']
 		assert isinstance(mean_return, float)
 
 		# consider print info
-		if (finished_episodes) % 10 == 0:
+		if finished_episodes // 10 > previous_finished_episodes // 10:
 			tqdm.write(f'{self.num_timesteps}: {finished_episodes} episodes trained, mean return {mean_return:.3f}')
 
 		# consider update best model
 		if self.best_mean_interim_reward is None or mean_return > self.best_mean_interim_reward + 15:
-			self.model.save(self.tmp_parameters)
+			self.model_writer.save_model(self.model, self.tmp_parameters)
 			self.best_mean_interim_reward = mean_return
 			if self.best_mean_overall_reward is None or self.best_mean_interim_reward > self.best_mean_overall_reward:
 				if self.best_mean_overall_reward is not None:
@@ -139,11 +161,51 @@ class RecommerceCallback(BaseCallback):
 				self.best_mean_overall_reward = self.best_mean_interim_reward
 
 		# consider save model
-		if (finished_episodes % self.iteration_length == 0 and finished_episodes > 0) and self.best_mean_interim_reward is not None:
+		passed_iteration_end = finished_episodes // self.iteration_length > previous_finished_episodes // self.iteration_length
+		if passed_iteration_end and self.best_mean_interim_reward is not None:
 			self.save_parameters(finished_episodes)
 
+		if self.episode_hook is not None and not self.episode_hook(self):
+			# the training is stopped early, e.g. a pruned trial of a sweep, so analyzing its models would waste the saved compute
+			self.analyze_after_training = False
+			return False
 		return True
 
+	def get_state(self) -> dict:
+		"""
+		Take a snapshot of the progress of the training, e.g. for a checkpoint.
+
+		Returns:
+			dict: The counters, the best rewards, the paths of the saved models and the state of the watcher.
+		"""
+		return {
+			'num_timesteps': self.num_timesteps,
+			'progress': self.tqdm_instance.n,
+			'best_mean_interim_reward': self.best_mean_interim_reward,
+			'best_mean_overall_reward': self.best_mean_overall_reward,
+			'last_finished_episode': self.last_finished_episode,
+			'saved_parameter_paths': list(self.saved_parameter_paths),
+			'watcher': self.watcher.get_state()
+		}
+
+	def set_state(self, state: dict) -> None:
+		"""
+		Restore a snapshot taken by `get_state`, the watcher must already have the number of environments of the training.
+
+		Args:
+			state (dict): The snapshot to restore.
+		"""
+		self.num_timesteps = state['num_timesteps']
+		self.tqdm_instance.update(state['progress'] - self.tqdm_instance.n)
+		self.best_mean_interim_reward = state['best_mean_interim_reward']
+		# the interim model may have been saved after the snapshot was taken
+		if not os.path.exists(self.tmp_parameters):
+			self.best_mean_interim_reward = None
+		self.best_mean_overall_reward = state['best_mean_overall_reward']
+		self.last_finished_episode = state['last_finished_episode']
+		self.saved_parameter_paths = list(state['saved_parameter_paths'])
+		self.watcher.set_state(state['watcher'])
+
 	def _on_training_end(self) -> None:
 		self.tqdm_instance.close()
 		if self.best_mean_interim_reward is not None:
@@ -151,12 +213,13 @@ class RecommerceCallback(BaseCallback):
 
 		# analyze trained agents
 		if len(self.saved_parameter_paths) == 0:
+			self.model_writer.close()
 			print('No agents saved! Nothing to monitor.')
 			return
 
 		print('Saving watchers...')
-		# write self watchers as json to save path
-		self.watcher.save_all_dicts_to_json(os.path.join(self.save_path, 'watcher.json'))
+		# write self watchers as json to save path, the watcher does not change anymore
+		self.model_writer.submit(self.watcher.save_all_dicts_to_json, os.path.join(self.save_path, 'watcher.json'))
 
 		monitor = Monitor(self.config_market, self.config_rl, self.signature)
 		monitor.configurator.get_folder()
@@ -165,9 +228,12 @@ class RecommerceCallback(BaseCallback):
 		competitors = self.marketplace.competitors
 
 		save_progress_plots(self.watcher, monitor.configurator.folder_path, self.agent_class.__name__, competitors, self.signature)
+		# the analysis loads the saved models
+		self.model_writer.close()
 
 		if self.analyze_after_training:
-			# If there are RL-agents in the competitor_list, they will break the `deepcopy` in `run_marketplace`
+			# RL-agents in the competitor_list may still be in training mode, e.g. a QLearningAgent expects feedback after every action,
+			# so the monitoring falls back to the default competitors
 			if not all(isinstance(competitor, RuleBasedAgent) for competitor in competitors):
 				competitors = None
 			# The next line is a bit hacky. We have to provide if the marketplace is continuous or not.
@@ -186,7 +252,8 @@ class RecommerceCallback(BaseCallback):
 	def save_parameters(self, finished_episodes: int):
 		assert isinstance(finished_episodes, int)
 		path_to_parameters = os.path.join(self.save_path, f'{self.signature}_{finished_episodes:05d}.{self.file_ending}')
-		os.rename(self.tmp_parameters, path_to_parameters)
+		# the model is renamed after the writer wrote it
+		self.model_writer.submit(os.rename, self.tmp_parameters, path_to_parameters)
 		self.saved_parameter_paths.append(path_to_parameters)
 		tqdm.write(f'Writing the interim model after {finished_episodes} episodes to the disk.')
 		tqdm.write(f'You can find the parameters here: {path_to_parameters}.')
@@ -197,6 +264,7 @@ class RecommerceCallback(BaseCallback):
 		"""
 		Inform the user of the best_mean_overall_reward the agent achieved during training.
 		"""
+		self.model_writer.close()
 		if self.best_mean_overall_reward is None:
 			print('The `best_mean_overall_reward` has never been set. Is this expected?')
 		else:
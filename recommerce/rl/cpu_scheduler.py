@@ -0,0 +1,89 @@
+import os
+
+import torch
+
+
+def get_available_cpus() -> list:
+	"""
+	Get the cpus this process may run on. This can be fewer than `os.cpu_count`, e.g. in containers or on shared machines.
+
+	Returns:
+		list: The sorted indices of the cpus.
+	"""
+	if hasattr(os, 'sched_getaffinity'):
+		return sorted(os.sched_getaffinity(0))
+	return list(range(os.cpu_count() or 1))  # pragma: no cover the affinity is not available on every platform
+
+
+def assign_cpus(cpus: list) -> None:
+	"""
+	Restrict the current process to the cpus and let torch use one thread per cpu.
+	Otherwise, torch starts one thread per core of the machine in every process and parallel trainings oversubscribe the cpus.
+
+	Args:
+		cpus (list): The indices of the cpus.
+	"""
+	assert len(cpus) > 0, 'at least one cpu must be assigned'
+	if hasattr(os, 'sched_setaffinity'):
+		os.sched_setaffinity(0, cpus)
+	torch.set_num_threads(len(cpus))
+
+
+class CpuScheduler():
+	"""
+	Splits the available cpus into core sets for the jobs which run at the same time, e.g. the trainings of a sweep.
+	A job gets a core set with `acquire` and gives it back with `release`, if all core sets are taken, the job has to wait.
+	The core sets are disjoint unless more cpus than available are requested.
+	"""
+	def __init__(self, number_of_slots: int = None, cpus_per_job: int = None, cpus: list = None) -> None:
+		"""
+		Args:
+			number_of_slots (int, optional): The number of jobs which can run at the same time.
+				Defaults to None, which means as many as the cpus allow with cpus_per_job cpus each.
+			cpus_per_job (int, optional): The number of cpus of every job.
+				Defaults to None, which means that the cpus are shared equally by the slots, or one cpu per job if both are None.
+			cpus (list, optional): The cpus to share. Defaults to None, which means all cpus available to this process.
+		"""
+		if cpus is None:
+			cpus = get_available_cpus()
+		assert len(cpus) > 0, 'there must be at least one cpu'
+		assert number_of_slots is None or isinstance(number_of_slots, int) and number_of_slots > 0, \
+			f'number_of_slots must be a positive integer: {number_of_slots}'
+		assert cpus_per_job is None or isinstance(cpus_per_job, int) and cpus_per_job > 0, \
+			f'cpus_per_job must be a positive integer: {cpus_per_job}'
+		if number_of_slots is None and cpus_per_job is None:
+			cpus_per_job = 1
+		if cpus_per_job is None:
+			cpus_per_job = max(1, len(cpus) // number_of_slots)
+		if number_of_slots is None:
+			number_of_slots = max(1, len(cpus) // cpus_per_job)
+		# consecutive cpus are often cores of the same socket, so they share their caches
+		self.core_sets = [[cpus[(slot * cpus_per_job + cpu) % len(cpus)] for cpu in range(cpus_per_job)] for slot in range(number_of_slots)]
+		self.free_slots = list(range(number_of_slots))
+
+	@property
+	def number_of_slots(self) -> int:
+		return len(self.core_sets)
+
+	def has_free_slot(self) -> bool:
+		return len(self.free_slots) > 0
+
+	def acquire(self) -> int:
+		"""
+		Take a free slot.
+
+		Returns:
+			int: The slot, its cpus are `core_sets[slot]`.
+		"""
+		assert self.has_free_slot(), 'all slots are taken, a job must be released first'
+		return self.free_slots.pop(0)
+
+	def release(self, slot: int) -> None:
+		"""
+		Give back a slot taken by `acquire`.
+
+		Args:
+			slot (int): The slot.
+		"""
+		assert 0 <= slot < self.number_of_slots and slot not in self.free_slots, f'the slot is not taken: {slot}'
+		self.free_slots.append(slot)
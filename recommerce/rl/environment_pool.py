@@ -0,0 +1,377 @@
+import copy
+import ctypes
+import multiprocessing as mp
+from typing import Callable, List
+
+import gym
+import numpy as np
+from stable_baselines3.common.env_util import is_wrapped
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+from recommerce.configuration.utils import spawn_random_generators
+from recommerce.market.metrics import MetricsInfo
+from recommerce.market.sim_market import SimMarket
+from recommerce.rl.cpu_scheduler import get_available_cpus
+
+
+class MarketplaceCopier():
+	"""
+	A picklable environment factory, which creates an independent copy of a marketplace with its own random stream.
+	The copy keeps the configuration and the competitors of the original marketplace, but starts a fresh episode.
+	Every call creates the same copy, because the random generator of the factory is copied as well.
+	"""
+	def __init__(self, marketplace: SimMarket, random_generator) -> None:
+		"""
+		Args:
+			marketplace (SimMarket): The marketplace which is copied.
+			random_generator (np.random.Generator, np.random.SeedSequence, int or None): The source of all randomness of the copy,
+				see `SimMarket.seed`.
+		"""
+		assert isinstance(marketplace, SimMarket), f'the marketplace must be a SimMarket, but is {type(marketplace)}'
+		self.marketplace = marketplace
+		self.random_generator = random_generator
+
+	def __call__(self) -> SimMarket:
+		marketplace = copy.deepcopy(self.marketplace)
+		marketplace.seed(copy.deepcopy(self.random_generator))
+		marketplace.reset()
+		return marketplace
+
+
+def create_marketplace_factories(marketplace: SimMarket, number_of_envs: int, random_generator=None) -> list:
+	"""
+	Create the factories of `number_of_envs` independent copies of a marketplace, e.g. for an `EnvironmentPool`.
+	Every copy gets its own child stream of random_generator.
+
+	Args:
+		marketplace (SimMarket): The marketplace which is copied.
+		number_of_envs (int): The number of copies.
+		random_generator (np.random.Generator, np.random.SeedSequence, int or None, optional): The parent of the random streams of the copies,
+			see `configuration.utils.spawn_random_generators`. Defaults to None, which means fresh entropy.
+
+	Returns:
+		list: One `MarketplaceCopier` per copy.
+	"""
+	assert isinstance(number_of_envs, int) and number_of_envs > 0, 'number_of_envs must be a positive integer'
+	return [MarketplaceCopier(marketplace, copy_random_generator)
+		for copy_random_generator in spawn_random_generators(random_generator, number_of_envs)]
+
+
+class _SharedArray():
+	"""
+	A numpy array in shared memory. It can be passed to a worker process when the process is started.
+	"""
+	def __init__(self, context, shape: tuple, dtype) -> None:
+		self.shape = tuple(shape)
+		self.dtype = np.dtype(dtype)
+		self._buffer = context.RawArray(ctypes.c_byte, max(int(np.prod(self.shape)) * self.dtype.itemsize, 1))
+
+	def as_numpy(self) -> np.array:
+		return np.frombuffer(self._buffer, dtype=self.dtype, count=int(np.prod(self.shape))).reshape(self.shape)
+
+
+def _get_action_layout(action_space: gym.spaces.Space) -> tuple:
+	"""
+	Returns:
+		tuple: The shape and the dtype of one action in the shared array. An action of a tuple space of discrete prices is stored as a row.
+	"""
+	if isinstance(action_space, gym.spaces.Tuple):
+		return (len(action_space.spaces),), np.int64
+	if isinstance(action_space, (gym.spaces.Discrete, gym.spaces.MultiDiscrete)):
+		return action_space.shape, np.int64
+	return action_space.shape, action_space.dtype
+
+
+def _get_action(actions: np.array, env_index: int, action_space: gym.spaces.Space):
+	return tuple(actions[env_index].tolist()) if isinstance(action_space, gym.spaces.Tuple) else actions[env_index].copy()
+
+
+def _step(env: SimMarket, env_index: int, arrays: dict, _) -> dict:
+	"""
+	Step one environment with its action from the shared arrays and write the results back.
+	An environment whose episode is done is reset, so the shared observations always contain the observations for the next step.
+
+	Returns:
+		dict: The keys of the info which are not part of the metrics schema.
+	"""
+	observation, reward, done, info = env.step(_get_action(arrays['actions'], env_index, env.action_space))
+	assert isinstance(info, MetricsInfo), f'the environment must return a MetricsInfo, but returned {type(info)}'
+	arrays['next_observations'][env_index] = observation
+	arrays['observations'][env_index] = env.reset() if done else observation
+	arrays['rewards'][env_index] = reward
+	arrays['dones'][env_index] = done
+	arrays['metrics'][env_index] = info.row
+	return {key: info[key] for key in info if key not in info.schema}
+
+
+def _reset(env: SimMarket, env_index: int, arrays: dict, _) -> None:
+	arrays['observations'][env_index] = env.reset()
+
+
+def _observe(env: SimMarket, env_index: int, arrays: dict, _) -> None:
+	arrays['observations'][env_index] = env._observation()
+
+
+def _set_state(env: SimMarket, env_index: int, arrays: dict, state: dict) -> None:
+	env.set_state(state)
+	_observe(env, env_index, arrays, None)
+
+
+_worker_commands = {
+	'step': _step,
+	'reset': _reset,
+	'observe': _observe,
+	'set_state': _set_state,
+	'seed': lambda env, env_index, arrays, seed: env.seed(seed),
+	'get_attr': lambda env, env_index, arrays, attr_name: getattr(env, attr_name),
+	'set_attr': lambda env, env_index, arrays, data: setattr(env, data[0], data[1]),
+	'env_method': lambda env, env_index, arrays, data: getattr(env, data[0])(*data[1], **data[2]),
+	'is_wrapped': lambda env, env_index, arrays, wrapper_class: is_wrapped(env, wrapper_class)
+}
+
+
+def _worker(remote, parent_remote, env_fn_wrappers: dict, shared_arrays: dict) -> None:
+	"""
+	The loop of a worker process, which owns a shard of the environments of the pool.
+	A message contains a command, the indices of the environments and one data entry per environment.
+	The worker answers with the list of the results of the command for the environments.
+	"""
+	parent_remote.close()
+	envs = {env_index: env_fn_wrapper.var() for env_index, env_fn_wrapper in env_fn_wrappers.items()}
+	arrays = {name: shared_array.as_numpy() for name, shared_array in shared_arrays.items()}
+	while True:
+		try:
+			command, env_indices, data = remote.recv()
+		except EOFError:
+			break
+		if command == 'close':
+			for env in envs.values():
+				env.close()
+			remote.close()
+			break
+		remote.send([_worker_commands[command](envs[env_index], env_index, arrays, env_data)
+			for env_index, env_data in zip(env_indices, data)])
+
+
+class EnvironmentPool():
+	"""
+	A pool of environments, which are sharded across worker processes.
+	Any subset of the environments can be stepped at once, the workers step their selected environments in parallel.
+	Actions, observations, rewards, dones and metrics rows are exchanged through arrays in shared memory,
+	so a step only sends a short message per worker and the observations of all environments are available as one array.
+	"""
+	def __init__(self, env_fns: List[Callable[[], SimMarket]], number_of_workers: int = None, start_method: str = None) -> None:
+		"""
+		Start the worker processes and create the environments in them.
+
+		Args:
+			env_fns (list): The factories of the environments, e.g. created by `create_marketplace_factories`.
+			number_of_workers (int, optional): The number of worker processes. The environments are split into contiguous shards.
+				Defaults to None, which means one worker per available cpu, but not more workers than environments.
+			start_method (str, optional): The start method of the worker processes, see `multiprocessing.get_all_start_methods`.
+				Defaults to None, which means 'forkserver' if it is available and 'spawn' otherwise, like in stable baselines.
+		"""
+		assert len(env_fns) > 0, 'there must be at least one environment'
+		if number_of_workers is None:
+			number_of_workers = min(len(get_available_cpus()), len(env_fns))
+		assert isinstance(number_of_workers, int) and 0 < number_of_workers <= len(env_fns), \
+			f'number_of_workers must be a positive integer not greater than the number of environments: {number_of_workers}'
+		self.waiting = False
+		self.closed = False
+		if start_method is None:
+			start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+		context = mp.get_context(start_method)
+
+		# The spaces and the metrics schema are taken from a local instance, because the shared arrays must exist before the workers start
+		prototype = env_fns[0]()
+		assert isinstance(prototype, SimMarket), f'the environments must be SimMarkets, but are {type(prototype)}'
+		self.observation_space, self.action_space = prototype.observation_space, prototype.action_space
+		self.metrics_schema = prototype.get_metrics_schema()
+		self.number_of_envs = len(env_fns)
+		self._action_shape, action_dtype = _get_action_layout(self.action_space)
+		shared_arrays = {
+			'actions': _SharedArray(context, (self.number_of_envs, *self._action_shape), action_dtype),
+			'observations': _SharedArray(context, (self.number_of_envs, *self.observation_space.shape), self.observation_space.dtype),
+			'next_observations': _SharedArray(context, (self.number_of_envs, *self.observation_space.shape), self.observation_space.dtype),
+			'rewards': _SharedArray(context, (self.number_of_envs,), np.float64),
+			'dones': _SharedArray(context, (self.number_of_envs,), np.bool_),
+			'metrics': _SharedArray(context, (self.number_of_envs, self.metrics_schema.size), np.float64)
+		}
+		self._arrays = {name: shared_array.as_numpy() for name, shared_array in shared_arrays.items()}
+
+		shards = np.array_split(np.arange(self.number_of_envs), number_of_workers)
+		self._worker_of_env = np.repeat(np.arange(number_of_workers), [len(shard) for shard in shards])
+		self.remotes, work_remotes = zip(*[context.Pipe() for _ in range(number_of_workers)])
+		self.processes = []
+		for shard, work_remote, remote in zip(shards, work_remotes, self.remotes):
+			env_fn_wrappers = {int(env_index): CloudpickleWrapper(env_fns[env_index]) for env_index in shard}
+			# daemon=True: if the main process crashes, the workers must not keep it alive
+			process = context.Process(target=_worker, args=(work_remote, remote, env_fn_wrappers, shared_arrays), daemon=True)
+			process.start()
+			self.processes.append(process)
+			work_remote.close()
+		self._pending_env_indices = None
+		self._pending_remotes = []
+		self._pending_order = []
+		# The environments were reset when they were created, the workers write their first observations to the shared array
+		self._execute('observe')
+
+	def _get_env_indices(self, env_indices) -> np.array:
+		return np.arange(self.number_of_envs) if env_indices is None else np.atleast_1d(np.asarray(env_indices, dtype=np.int64))
+
+	def _send(self, command: str, env_indices: np.array, data: list = None) -> None:
+		"""
+		Send a command to every worker which owns at least one of the environments.
+
+		Args:
+			command (str): The command, see `_worker_commands`.
+			env_indices (np.array): The indices of the environments.
+			data (list, optional): One data entry per environment, which is pickled through the pipe. Defaults to None.
+		"""
+		assert not self.waiting, 'the pool is still waiting for the results of a step'
+		data = [None] * len(env_indices) if data is None else data
+		workers = self._worker_of_env[env_indices]
+		self._pending_remotes = []
+		self._pending_order = []
+		for worker in np.unique(workers):
+			is_in_shard = workers == worker
+			shard_env_indices = env_indices[is_in_shard]
+			self.remotes[worker].send((command, shard_env_indices.tolist(), [data[position] for position in np.flatnonzero(is_in_shard)]))
+			self._pending_remotes.append(self.remotes[worker])
+			self._pending_order.append(np.flatnonzero(is_in_shard))
+
+	def _receive(self) -> list:
+		"""
+		Returns:
+			list: The results of the last command, in the order of the environment indices it was sent with.
+		"""
+		results = [None] * sum(len(positions) for positions in self._pending_order)
+		for remote, positions in zip(self._pending_remotes, self._pending_order):
+			for position, result in zip(positions, remote.recv()):
+				results[position] = result
+		self._pending_remotes = []
+		self._pending_order = []
+		return results
+
+	def _execute(self, command: str, env_indices=None, data: list = None) -> list:
+		env_indices = self._get_env_indices(env_indices)
+		self._send(command, env_indices, data)
+		return self._receive()
+
+	def get_observations(self, env_indices=None) -> np.array:
+		"""
+		Args:
+			env_indices (int, list or None, optional): The environments. Defaults to None, which means all environments.
+
+		Returns:
+			np.array: The current observations of the environments, one per row.
+		"""
+		return self._arrays['observations'][self._get_env_indices(env_indices)]
+
+	def reset(self, env_indices=None) -> np.array:
+		"""
+		Reset environments.
+
+		Args:
+			env_indices (int, list or None, optional): The environments. Defaults to None, which means all environments.
+
+		Returns:
+			np.array: The initial observations of the environments, one per row.
+		"""
+		self._execute('reset', env_indices)
+		return self.get_observations(env_indices)
+
+	def step_async(self, env_indices, actions) -> None:
+		"""
+		Start to step the given environments, each environment with its action.
+
+		Args:
+			env_indices (int, list or None): The environments. None means all environments.
+			actions (list or np.array): The actions in the form accepted by the markets, one per environment.
+		"""
+		env_indices = self._get_env_indices(env_indices)
+		self._arrays['actions'][env_indices] = np.asarray(actions).reshape((len(env_indices), *self._action_shape))
+		self._send('step', env_indices)
+		self._pending_env_indices = env_indices
+		self.waiting = True
+
+	def step_wait(self) -> tuple:
+		"""
+		Wait for the step started by `step_async`.
+		An environment whose episode is done has already been reset, its next observation is the last observation of the episode.
+
+		Returns:
+			np.array, np.array, np.array, list: The next observations, the rewards, the dones and the infos of the stepped environments.
+		"""
+		assert self.waiting, 'step_async must be called before step_wait'
+		extras = self._receive()
+		self.waiting = False
+		env_indices = self._pending_env_indices
+		infos = []
+		for env_index, env_extras in zip(env_indices, extras):
+			info = MetricsInfo(self.metrics_schema, self._arrays['metrics'][env_index].copy())
+			info.update(env_extras)
+			infos.append(info)
+		return self._arrays['next_observations'][env_indices], self._arrays['rewards'][env_indices], \
+			self._arrays['dones'][env_indices], infos
+
+	def step(self, env_indices, actions) -> tuple:
+		"""
+		Step the given environments, see `step_async` and `step_wait`.
+		"""
+		self.step_async(env_indices, actions)
+		return self.step_wait()
+
+	def get_states(self, env_indices=None) -> list:
+		"""
+		Args:
+			env_indices (int, list or None, optional): The environments. Defaults to None, which means all environments.
+
+		Returns:
+			list: The snapshots of the environments, see `SimMarket.get_state`.
+		"""
+		return self.env_method('get_state', env_indices=env_indices)
+
+	def set_states(self, states: list, env_indices=None) -> None:
+		"""
+		Restore snapshots taken by `get_states`, each environment with its own snapshot.
+		The observations are updated, so the next step continues from the restored states.
+
+		Args:
+			states (list): The snapshots, one per environment.
+			env_indices (int, list or None, optional): The environments. Defaults to None, which means all environments.
+		"""
+		env_indices = self._get_env_indices(env_indices)
+		assert len(states) == len(env_indices), f'there must be one state per environment, but there are {len(states)}'
+		self._execute('set_state', env_indices, states)
+
+	def seed(self, seeds: list, env_indices=None) -> list:
+		return self._execute('seed', env_indices, seeds)
+
+	def get_attr(self, attr_name: str, env_indices=None) -> list:
+		env_indices = self._get_env_indices(env_indices)
+		return self._execute('get_attr', env_indices, [attr_name] * len(env_indices))
+
+	def set_attr(self, attr_name: str, value, env_indices=None) -> None:
+		env_indices = self._get_env_indices(env_indices)
+		self._execute('set_attr', env_indices, [(attr_name, value)] * len(env_indices))
+
+	def env_method(self, method_name: str, method_args: tuple = (), method_kwargs: dict = None, env_indices=None) -> list:
+		env_indices = self._get_env_indices(env_indices)
+		return self._execute('env_method', env_indices, [(method_name, method_args, method_kwargs or {})] * len(env_indices))
+
+	def env_is_wrapped(self, wrapper_class, env_indices=None) -> list:
+		env_indices = self._get_env_indices(env_indices)
+		return self._execute('is_wrapped', env_indices, [wrapper_class] * len(env_indices))
+
+	def close(self) -> None:
+		if self.closed:
+			return
+		if self.waiting:
+			self._receive()
+			self.waiting = False
+		for remote in self.remotes:
+			remote.send(('close', [], []))
+		for process in self.processes:
+			process.join()
+		self.closed = True
@@ -0,0 +1,229 @@
+import csv
+import math
+import multiprocessing as mp
+import os
+from multiprocessing.connection import wait
+
+from attrdict import AttrDict
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+import recommerce.configuration.utils as ut
+from recommerce.configuration.path_manager import PathManager
+from recommerce.market.sim_market import SimMarket
+from recommerce.rl.cpu_scheduler import CpuScheduler, assign_cpus, get_available_cpus
+from recommerce.rl.stable_baselines.stable_baselines_model import StableBaselinesAgent
+
+
+def train_stable_baselines_agent(
+		market_class: SimMarket,
+		config_market: AttrDict,
+		agent_class: StableBaselinesAgent,
+		config_rl: AttrDict,
+		training_steps: int,
+		name: str,
+		episode_hook):
+	"""
+	The default train function of a `HyperparameterSweep`, it trains a new agent on a marketplace with continuous actions.
+	Bind the first three arguments with `functools.partial`.
+
+	Returns:
+		Watcher: The watcher of the training.
+	"""
+	marketplace = market_class(config_market, support_continuous_action_space=True)
+	agent = agent_class(config_market, config_rl, marketplace, name=name)
+	return agent.train_agent(training_steps, episode_hook=episode_hook)
+
+
+def _run_trial(train_function_wrapper, config_rl: AttrDict, training_steps: int, name: str, connection) -> None:
+	"""
+	The loop of a trial process. The trial waits for the number of steps it may train, the budget, and the cpus it may use
+	before it starts training. When the budget is used up, it reports the mean return of the last episodes and waits for the next budget,
+	None means that the trial was pruned and the training is stopped.
+	When the training ended, the trial sends the number of steps it trained, the returns of the whole training
+	and whether it ended within its budget instead of being pruned.
+	"""
+	budget, cpus = connection.recv()
+	assign_cpus(cpus)
+	trained_steps = 0
+
+	def episode_hook(callback) -> bool:
+		nonlocal budget, trained_steps
+		trained_steps = callback.num_timesteps
+		# the budget of the last rung is the whole training, which ends by itself
+		if budget is not None and budget < training_steps and callback.num_timesteps >= budget:
+			connection.send(('rung', callback.num_timesteps, callback.watcher.get_average_dict()['profits/all']['vendor_0']))
+			budget, cpus = connection.recv()
+			# the trial can continue on other cpus than before
+			assign_cpus(cpus)
+		return budget is not None
+
+	watcher = train_function_wrapper.var(config_rl, training_steps, name, episode_hook)
+	returns = watcher.get_progress_values_of_property('profits/all', 0)
+	if budget is not None:
+		trained_steps = training_steps
+	connection.send(('done', trained_steps, returns, budget is not None))
+	connection.close()
+
+
+class HyperparameterSweep():
+	"""
+	Trains one agent per configuration in a bounded pool of processes and prunes poor configurations by successive halving.
+	The training of every configuration is split into rungs whose lengths grow by the reduction_factor,
+	e.g. 1/9, 1/3 and all of the training_steps for three rungs and a reduction factor of 3.
+	After every rung but the last, only the best 1/reduction_factor of the configurations which finished the rung continue,
+	measured by the mean return of their last episodes. The others are stopped, so most of the compute goes to the promising ones.
+
+	Every configuration trains in its own process, which waits between the rungs, so the model does not have to be saved and reloaded.
+	The processes only report the mean return at the end of every rung and all returns at the end of the training,
+	there is no progress in between. The saved models of a pruned configuration are not analyzed by the `RecommerceCallback`.
+	At most number_of_workers of them train at the same time, each on its own set of cpus assigned by a `CpuScheduler`,
+	the others wait until a set is free.
+	"""
+	def __init__(
+			self,
+			train_function,
+			configs: list,
+			descriptions: list,
+			training_steps: int,
+			number_of_rungs: int = 3,
+			reduction_factor: int = 3,
+			number_of_workers: int = None,
+			cpus_per_worker: int = None,
+			start_method: str = None) -> None:
+		"""
+		Args:
+			train_function (callable): Trains one configuration, it is called with the config_rl, the training_steps, the description as name
+				and an episode_hook which must be passed to the `RecommerceCallback`, and returns the `Watcher` of the training,
+				see `train_stable_baselines_agent`. Only trainings which stop when the episode_hook returns False can be pruned.
+			configs (list): The config_rl of every configuration.
+			descriptions (list): The unique name of every configuration.
+			training_steps (int): The number of training steps of the configurations which are never pruned.
+			number_of_rungs (int, optional): The number of rungs, 1 means that all configurations are trained completely. Defaults to 3.
+			reduction_factor (int, optional): The factor by which the rungs grow and the configurations are reduced. Defaults to 3.
+			number_of_workers (int, optional): The number of configurations which train at the same time.
+				Defaults to None, which means one per configuration, but at most one per available cpu.
+			cpus_per_worker (int, optional): The number of cpus of every configuration which trains, torch uses one thread per cpu.
+				Defaults to None, which means that the available cpus are shared equally.
+			start_method (str, optional): The start method of the processes, see `multiprocessing.get_all_start_methods`.
+				Defaults to None, which means 'forkserver' if it is available and 'spawn' otherwise.
+		"""
+		assert len(configs) == len(descriptions) > 0, 'there must be one description per config and at least one config'
+		assert len(set(descriptions)) == len(descriptions), f'the descriptions must be unique: {descriptions}'
+		assert isinstance(training_steps, int) and training_steps > 0, f'training_steps must be a positive integer: {training_steps}'
+		assert isinstance(number_of_rungs, int) and number_of_rungs > 0, f'number_of_rungs must be a positive integer: {number_of_rungs}'
+		assert isinstance(reduction_factor, int) and reduction_factor > 1, f'reduction_factor must be an integer greater 1: {reduction_factor}'
+		if number_of_workers is None:
+			number_of_workers = min(len(configs), len(get_available_cpus()))
+		assert isinstance(number_of_workers, int) and number_of_workers > 0, f'number_of_workers must be a positive integer: {number_of_workers}'
+		if start_method is None:
+			start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+		self.train_function = train_function
+		self.configs = configs
+		self.descriptions = descriptions
+		self.training_steps = training_steps
+		self.reduction_factor = reduction_factor
+		self.scheduler = CpuScheduler(number_of_workers, cpus_per_worker)
+		self.context = mp.get_context(start_method)
+		self.budgets = [training_steps // reduction_factor ** rung for rung in range(number_of_rungs - 1, 0, -1)] + [training_steps]
+		assert self.budgets[0] > 0, f'the first rung would be empty, reduce number_of_rungs: {number_of_rungs}'
+
+	def _start_trial(self, trial_index: int):
+		parent_connection, child_connection = self.context.Pipe()
+		process = self.context.Process(target=_run_trial, daemon=True, args=(CloudpickleWrapper(self.train_function),
+			self.configs[trial_index], self.training_steps, self.descriptions[trial_index], child_connection))
+		process.start()
+		child_connection.close()
+		return process, parent_connection
+
+	def run(self) -> list:
+		"""
+		Run the sweep.
+
+		Returns:
+			list: One row per configuration with its description, the number of training steps it reached,
+				the mean return at the end of every rung it finished and the returns of all its episodes.
+		"""
+		results = [{'description': description, 'training_steps': 0, 'rung_returns': [], 'returns': None}
+			for description in self.descriptions]
+		processes = {}
+		connections = {}
+		# every job is a trial and its next budget, the pruned trials get None and need cpus to end their training as well
+		jobs = [(trial_index, self.budgets[0]) for trial_index in range(len(self.configs))]
+		try:
+			for rung in range(len(self.budgets)):
+				self._run_jobs(jobs, results, processes, connections)
+				finished_rung = [trial_index for trial_index, budget in jobs
+					if budget is not None and len(results[trial_index]['rung_returns']) > rung]
+				if rung == len(self.budgets) - 1:
+					break
+				finished_rung.sort(key=lambda trial_index: results[trial_index]['rung_returns'][rung], reverse=True)
+				# trials whose training already ended cannot continue, even if they are among the best
+				candidates = [trial_index for trial_index in finished_rung[:math.ceil(len(finished_rung) / self.reduction_factor)]
+					if trial_index in processes]
+				print(f'Rung {rung + 1} finished, continuing with {[self.descriptions[trial_index] for trial_index in candidates]}')
+				jobs = [(trial_index, None) for trial_index in finished_rung if trial_index not in candidates and trial_index in processes] + \
+					[(trial_index, self.budgets[rung + 1]) for trial_index in candidates]
+		finally:
+			# only left if the sweep failed
+			for process in processes.values():
+				process.terminate()
+		return results
+
+	@staticmethod
+	def _receive(trial_index: int, results: list, processes: dict, connections: dict) -> None:
+		"""
+		Take the next message of a trial, which either finished a rung or its training.
+		"""
+		message = connections[trial_index].recv()
+		if message[0] == 'rung':
+			_, results[trial_index]['training_steps'], rung_return = message
+			results[trial_index]['rung_returns'].append(rung_return)
+		else:
+			_, results[trial_index]['training_steps'], results[trial_index]['returns'], ended_within_budget = message
+			if ended_within_budget and len(message[2]) > 0:
+				# the training ended before the next report, e.g. at the end of the last rung
+				results[trial_index]['rung_returns'].append(message[2][-1])
+			connections.pop(trial_index).close()
+			processes.pop(trial_index).join()
+
+	def _run_jobs(self, jobs: list, results: list, processes: dict, connections: dict) -> None:
+		"""
+		Send every trial its budget and cpus as soon as a slot of the scheduler is free and wait until all of them reported back.
+		The processes of the trials are started when they get their first budget.
+		"""
+		waiting = list(jobs)
+		slots = {}
+		while waiting or slots:
+			while waiting and self.scheduler.has_free_slot():
+				trial_index, budget = waiting.pop(0)
+				if trial_index not in processes:
+					processes[trial_index], connections[trial_index] = self._start_trial(trial_index)
+				slots[trial_index] = self.scheduler.acquire()
+				connections[trial_index].send((budget, self.scheduler.core_sets[slots[trial_index]]))
+			for connection in wait([connections[trial_index] for trial_index in slots]):
+				trial_index = next(index for index in slots if connections[index] is connection)
+				self.scheduler.release(slots.pop(trial_index))
+				self._receive(trial_index, results, processes, connections)
+
+	def save_results(self, results: list, name: str = 'sweep') -> str:
+		"""
+		Write the results of `run` into one csv table, the configurations are sorted by the training steps they reached
+		and their last mean return.
+
+		Args:
+			results (list): The results of `run`.
+			name (str, optional): The name of the table. Defaults to 'sweep'.
+
+		Returns:
+			str: The path of the table.
+		"""
+		ut.ensure_results_folders_exist()
+		path = os.path.join(PathManager.results_path, 'monitoring', f'{name}.csv')
+		rows = sorted(results, key=lambda result: (result['training_steps'], result['rung_returns'][-1] if result['rung_returns'] else 0),
+			reverse=True)
+		with open(path, 'w', newline='') as table:
+			writer = csv.writer(table)
+			writer.writerow(['description', 'training_steps'] + [f'mean_return_rung_{rung + 1}' for rung in range(len(self.budgets))])
+			for result in rows:
+				writer.writerow([result['description'], result['training_steps']] + result['rung_returns'])
+		return path
@@ -0,0 +1,95 @@
+import io
+import queue
+import threading
+
+
+def _write_bytes(content: bytes, path: str) -> None:
+	with open(path, 'wb') as file:
+		file.write(content)
+
+
+class BackgroundModelWriter():
+	"""
+	Writes the models and other artifacts of a training in a background thread, so the training loop does not wait for the disk.
+	The jobs are executed one after another in the order they were submitted, e.g. a model is renamed only after it was written.
+	At most max_pending_jobs jobs wait at the same time, further submissions block until the writer caught up,
+	which bounds the memory held by the snapshots of the models.
+	If a job fails, the following jobs are skipped and the error is raised by the next call of `submit`, `flush` or `close`.
+	"""
+	def __init__(self, max_pending_jobs: int = 4) -> None:
+		"""
+		Args:
+			max_pending_jobs (int, optional): The number of jobs which may wait for the writer. Defaults to 4.
+		"""
+		assert isinstance(max_pending_jobs, int) and max_pending_jobs > 0, f'max_pending_jobs must be a positive integer: {max_pending_jobs}'
+		self._jobs = queue.Queue(max_pending_jobs)
+		self._error = None
+		# the thread is started with the first job, because many trainings never save a model
+		self._thread = None
+
+	def _run(self) -> None:
+		while True:
+			job = self._jobs.get()
+			try:
+				if job is None:
+					return
+				if self._error is None:
+					function, args = job
+					function(*args)
+			except Exception as error:
+				self._error = error
+			finally:
+				self._jobs.task_done()
+
+	def _raise_error(self) -> None:
+		if self._error is not None:
+			error, self._error = self._error, None
+			raise RuntimeError('writing in the background failed') from error
+
+	def submit(self, function, *args) -> None:
+		"""
+		Let the writer call the function with the arguments. The arguments must not be changed afterwards.
+
+		Args:
+			function (callable): The job, e.g. `os.rename`.
+			args: The arguments of the function.
+		"""
+		self._raise_error()
+		if self._thread is None:
+			self._thread = threading.Thread(target=self._run, name='BackgroundModelWriter', daemon=True)
+			self._thread.start()
+		self._jobs.put((function, args))
+
+	def save_model(self, model, model_path: str) -> None:
+		"""
+		Take a snapshot of the model in memory and write it to the path in the background, like `model.save(model_path)`.
+		The agents of this package copy their parameters, stable baselines models are serialized into memory.
+
+		Args:
+			model (ReinforcementLearningAgent or stable_baselines3.common.base_class.BaseAlgorithm): The model to save.
+			model_path (str): The path of the file.
+		"""
+		if hasattr(model, 'get_model_snapshot'):
+			self.submit(model.write_model_snapshot, model.get_model_snapshot(), model_path)
+		else:
+			content = io.BytesIO()
+			model.save(content)
+			self.submit(_write_bytes, content.getvalue(), model_path)
+
+	def flush(self) -> None:
+		"""
+		Wait until all submitted jobs are done.
+		"""
+		if self._thread is not None:
+			self._jobs.join()
+		self._raise_error()
+
+	def close(self) -> None:
+		"""
+		Wait until all submitted jobs are done and stop the thread. The writer can be used again afterwards.
+		"""
+		if self._thread is not None:
+			self._jobs.put(None)
+			self._thread.join()
+			self._thread = None
+		self._raise_error()
@@ -3,8 +3,7 @@
 
 import os
 import shutil
-import time
-from multiprocessing import Pipe, Process
+from functools import partial
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -13,6 +12,7 @@ from recommerce.configuration.hyperparameter_config import HyperparameterConfigL
 from recommerce.configuration.path_manager import PathManager
 from recommerce.market.circular.circular_sim_market import (CircularEconomyRebuyPriceDuopoly, CircularEconomyRebuyPriceMonopoly,
                                                             CircularEconomyRebuyPriceOligopoly)
+from recommerce.rl.hyperparameter_sweep import HyperparameterSweep, train_stable_baselines_agent
 from recommerce.rl.self_play import train_self_play
 from recommerce.rl.stable_baselines.sb_a2c import StableBaselinesA2C
 from recommerce.rl.stable_baselines.sb_ddpg import StableBaselinesDDPG
@@ -21,18 +21,15 @@ from recommerce.rl.stable_baselines.sb_sac import StableBaselinesSAC
 from recommerce.rl.stable_baselines.sb_td3 import StableBaselinesTD3
 
 
-def run_training_session(market_class, config_market_path, agent_class, config_rl, training_steps, number, pipe_to_parent):
+def run_training_session(market_class, config_market_path, agent_class, config_rl, training_steps, name, episode_hook):
     config_market = HyperparameterConfigLoader.load(config_market_path, market_class)
-    agent = agent_class(config_market, config_rl, market_class(config_market, support_continuous_action_space=True), name=f'Train{number}')
-    watcher = agent.train_agent(training_steps)
-    pipe_to_parent.send(watcher)
+    return train_stable_baselines_agent(market_class, config_market, agent_class, config_rl, training_steps, name, episode_hook)
 
 
-def run_self_play_session(market_class, config_market_path, agent_class, config_rl, training_steps, number, pipe_to_parent):
+def run_self_play_session(market_class, config_market_path, agent_class, config_rl, training_steps, name, episode_hook):
     assert issubclass(market_class, CircularEconomyRebuyPriceDuopoly)
     config_market = HyperparameterConfigLoader.load(config_market_path, market_class)
-    watcher = train_self_play(config_market, config_rl, agent_class, training_steps, name=f'SelfPlay_{number}')
-    pipe_to_parent.send(watcher)
+    return train_self_play(config_market, config_rl, agent_class, training_steps, name=f'SelfPlay_{name}', episode_hook=episode_hook)
 
 
 def configuration_best_learning_rate_ppo():
@@ -187,22 +184,25 @@ def configuration_sac_all_same():
 def run_group(market_class, config_market, agent, configuration, training_steps, target_function=run_training_session):
     configs, descriptions = configuration()
     print(configs)
-    pipes = []
-    for _ in configs:
-        pipes.append(Pipe(False))
-    processes = [Process(target=target_function, args=(market_class, config_market, agent, config, training_steps, description, pipe_entry))
-        for config, description, (_, pipe_entry) in zip(configs, descriptions, pipes)]
-    print('Now I start the processes')
-    for p in processes:
-        time.sleep(10)
-        p.start()
-    print('Now I wait for the results')
-    watchers = [output.recv() for output, _ in pipes]
+    # a sweep with a single rung trains every configuration completely
+    sweep = HyperparameterSweep(partial(target_function, market_class, config_market, agent), configs, descriptions, training_steps,
+        number_of_rungs=1)
+    results = sweep.run()
     print('Now I have the results')
-    for p in processes:
-        p.join()
-    print('All threads joined')
-    return descriptions, [watcher.get_progress_values_of_property('profits/all', 0) for watcher in watchers]
+    return descriptions, [result['returns'] for result in results]
+
+
+def run_pruned_group(market_class, config_market, agent, configuration, training_steps, target_function=run_training_session, name='sweep'):
+    """
+    Like `run_group`, but the configurations which are poor after a ninth and a third of the training are stopped early.
+    The mean returns of all configurations at the end of their rungs are written into one table.
+    The learning curves of the stopped configurations are shorter than the others.
+    """
+    configs, descriptions = configuration()
+    sweep = HyperparameterSweep(partial(target_function, market_class, config_market, agent), configs, descriptions, training_steps)
+    results = sweep.run()
+    print(f'The results were written to {sweep.save_results(results, name)}')
+    return descriptions, [result['returns'] for result in results]
 
 
 def print_diagrams(groups, name, individual_lines=False):
@@ -0,0 +1,156 @@
+import numpy as np
+from attrdict import AttrDict
+
+from recommerce.market.circular.circular_vendors import CircularAgent
+from recommerce.market.linear.linear_vendors import LinearAgent
+from recommerce.market.sim_market import SimMarket
+from recommerce.market.vendors import Agent, RuleBasedAgent
+
+
+class LookupTableAgent(RuleBasedAgent, LinearAgent, CircularAgent):
+	"""
+	A frozen copy of the policy of another agent, which answers with the action that agent chose for the centre of the grid cell
+	the observation falls into. Every feature of the observation is discretized into equally sized bins between the bounds
+	of the observation_space, features without a range get a single bin.
+	It is created by `distill_policy` and can be used as a cheap competitor, e.g. for self-play or rl-vs-rl training,
+	since its policy is an array lookup instead of a forward pass of a network.
+	"""
+	# The table is allocated at once, so larger tables are rejected instead of exhausting the memory
+	max_table_size = 10 ** 8
+	# The arrays which make up a policy table, they are stored under these names in the model file
+	table_fields = ('observation_low', 'observation_high', 'table_shape', 'actions')
+
+	def __init__(self, config_market: AttrDict = None, load_path: str = None, name='', policy_table: dict = None):
+		"""
+		Args:
+			config_market (AttrDict, optional): The config of the market the vendor acts in. Defaults to None.
+			load_path (str, optional): The path of a model file written by `save`. Defaults to None.
+			name (str, optional): The name of the vendor. Defaults to the class name.
+			policy_table (dict, optional): The arrays of `table_fields`, if the agent is not loaded from a file. Defaults to None.
+		"""
+		assert (load_path is None) != (policy_table is None), 'exactly one of load_path and policy_table must be provided'
+		if load_path is not None:
+			assert load_path.endswith('.npz'), f'the modelname must end in ".npz": {load_path}'
+			with np.load(load_path) as model_file:
+				policy_table = {field: model_file[field] for field in self.table_fields}
+		assert set(policy_table) == set(self.table_fields), f'the policy table must contain exactly these arrays: {self.table_fields}'
+		self.config_market = config_market
+		self.name = name if name != '' else type(self).__name__
+
+		self.observation_low = np.asarray(policy_table['observation_low'], dtype=np.float64)
+		self.observation_high = np.asarray(policy_table['observation_high'], dtype=np.float64)
+		self.table_shape = tuple(int(bins) for bins in policy_table['table_shape'])
+		self.actions = np.asarray(policy_table['actions'])
+		assert len(self.observation_low) == len(self.observation_high) == len(self.table_shape), \
+			'the bounds and the table_shape must have one entry per feature'
+		assert len(self.actions) == np.prod(self.table_shape, dtype=np.float64), \
+			f'the table must contain one action per grid cell: {len(self.actions)} for {self.table_shape}'
+		self.continuous_action_space = np.issubdtype(self.actions.dtype, np.floating)
+		observation_range = self.observation_high - self.observation_low
+		self.bins_per_unit = np.divide(self.table_shape, observation_range, out=np.zeros_like(self.observation_low),
+			where=observation_range > 0)
+
+	@staticmethod
+	def get_grid(observation_space, number_of_bins: int) -> dict:
+		"""
+		Create the grid of a policy table for the observation_space, without the actions.
+
+		Args:
+			observation_space (gym.spaces.Box): The observation space of the market the table is made for.
+			number_of_bins (int): The number of bins of every feature which has a range.
+
+		Returns:
+			dict: The bounds of the observations and the table_shape.
+		"""
+		assert isinstance(number_of_bins, int) and number_of_bins > 0, f'number_of_bins must be a positive integer: {number_of_bins}'
+		observation_low = observation_space.low.astype(np.float64)
+		observation_high = observation_space.high.astype(np.float64)
+		assert np.all(np.isfinite(observation_low)) and np.all(np.isfinite(observation_high)), 'the observation_space must be bounded'
+		table_shape = np.where(observation_high > observation_low, number_of_bins, 1).astype(np.int64)
+		return {'observation_low': observation_low, 'observation_high': observation_high, 'table_shape': table_shape}
+
+	def discretize(self, observations: np.array) -> np.array:
+		"""
+		Map observations to the cells of the grid.
+
+		Args:
+			observations (np.array): The observations, one per row.
+
+		Returns:
+			np.array: The indices of the cells, shape (n,).
+		"""
+		bins = np.floor((np.asarray(observations, dtype=np.float64) - self.observation_low) * self.bins_per_unit).astype(np.int64)
+		bins = np.clip(bins, 0, np.array(self.table_shape) - 1)
+		return np.ravel_multi_index(tuple(bins.T), self.table_shape)
+
+	def get_cell_centres(self, cells: np.array) -> np.array:
+		"""
+		The inverse of `discretize`, features without a range are at their lower bound.
+
+		Args:
+			cells (np.array): The indices of the cells, shape (n,).
+
+		Returns:
+			np.array: The observations in the centres of the cells, one per row.
+		"""
+		bins = np.stack(np.unravel_index(cells, self.table_shape), axis=1)
+		offsets = np.divide(bins + 0.5, self.bins_per_unit, out=np.zeros(bins.shape), where=self.bins_per_unit > 0)
+		return self.observation_low + offsets
+
+	def policy(self, observation, *_):
+		action = self.actions[self.discretize(np.asarray(observation)[np.newaxis])[0]]
+		if self.continuous_action_space:
+			return action.copy()
+		return tuple(int(price) for price in action) if action.ndim else int(action)
+
+	def policy_batch(self, observations: np.array) -> np.array:
+		return self.actions[self.discretize(observations)]
+
+	def save(self, model_path: str) -> None:
+		"""
+		Save the policy table to the specified path.
+
+		Args:
+			model_path (str): The path including the name where the model should be saved.
+		"""
+		assert model_path.endswith('.npz'), f'the modelname must end in ".npz": {model_path}'
+		with open(model_path, 'wb') as model_file:
+			np.savez(model_file, **{field: getattr(self, field) for field in self.table_fields})
+
+
+def distill_policy(agent: Agent, marketplace: SimMarket, number_of_bins: int, name='', chunk_size: int = 4096) -> LookupTableAgent:
+	"""
+	Tabulate the actions of an agent over the discretized observation_space of a marketplace.
+	The agent is asked for the centres of all grid cells with `policy_batch`, a chunk of cells at a time.
+	Stochastic policies are asked once per cell, so the table keeps one sampled action per cell.
+
+	Args:
+		agent (Agent): The agent whose policy should be distilled, e.g. a trained `StableBaselinesAgent`.
+		marketplace (SimMarket): The marketplace whose observation_space defines the grid.
+			It must have the observations the agent gets as a competitor.
+		number_of_bins (int): The number of bins of every feature which has a range.
+		name (str, optional): The name of the lookup-table agent. Defaults to the name of the agent with the suffix '_distilled'.
+		chunk_size (int, optional): The number of cells which are passed to `policy_batch` at once. Defaults to 4096.
+
+	Returns:
+		LookupTableAgent: The frozen policy of the agent.
+	"""
+	assert isinstance(marketplace, SimMarket), f'marketplace must be a SimMarket, but is {type(marketplace)}'
+	assert isinstance(chunk_size, int) and chunk_size > 0, f'chunk_size must be a positive integer: {chunk_size}'
+	grid = LookupTableAgent.get_grid(marketplace.observation_space, number_of_bins)
+	number_of_cells = int(np.prod(grid['table_shape'], dtype=np.float64))
+	action_space = marketplace.action_space
+	# `get_actions_dimension` counts a continuous action space as one dimension, but the table stores every price
+	prices_per_action = len(action_space) if action_space.shape is None else int(np.prod(action_space.shape))
+	assert number_of_cells * prices_per_action <= LookupTableAgent.max_table_size, \
+		f'the table would have {number_of_cells * prices_per_action} entries, reduce number_of_bins: {number_of_bins}'
+
+	# the grid without actions is only used to compute the centres of the cells
+	empty_table = LookupTableAgent(policy_table={**grid, 'actions': np.zeros(number_of_cells)})
+	print(f'Distilling the policy of {agent.name} into a table of {number_of_cells} cells')
+	actions = np.concatenate([
+		np.asarray(agent.policy_batch(empty_table.get_cell_centres(np.arange(start, min(start + chunk_size, number_of_cells)))
+			.astype(marketplace.observation_space.dtype)))
+		for start in range(0, number_of_cells, chunk_size)])
+	return LookupTableAgent(agent.config_market, name=name if name != '' else f'{agent.name}_distilled',
+		policy_table={**grid, 'actions': actions})
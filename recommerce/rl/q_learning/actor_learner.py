@@ -0,0 +1,198 @@
+import copy
+import multiprocessing as mp
+import queue
+
+import numpy as np
+import torch
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+from recommerce.configuration.utils import spawn_random_generators
+from recommerce.market.metrics import MetricsInfo
+from recommerce.monitoring.watcher import Watcher
+from recommerce.rl.cpu_scheduler import get_available_cpus
+from recommerce.rl.environment_pool import _SharedArray, create_marketplace_factories
+from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
+
+# The number of transitions an actor collects before it sends them to the learner, unless an episode ends before
+TRANSITIONS_PER_MESSAGE = 16
+
+
+def _get_epsilon(config_rl, frame_idx: int) -> float:
+	return max(config_rl.epsilon_final, config_rl.epsilon_start - frame_idx / config_rl.epsilon_decay_last_frame)
+
+
+def _actor(actor_index: int, env_fn_wrapper, agent: QLearningAgent, shared_weights: _SharedArray, weights_lock, weights_version,
+		frame_counter, transitions_queue, stop_event) -> None:
+	"""
+	The loop of an actor process, which plays episodes of its own marketplace with an epsilon-greedy copy of the network of the learner.
+	Before every step, the actor loads the weights of the learner if they were updated since the last step.
+	The transitions are sent to the learner in chunks, which contain the arrays of the fields of the experiences and the metrics rows.
+	"""
+	# the actors share the cpus with the learner, so they must not spawn threads of their own
+	torch.set_num_threads(1)
+	env = env_fn_wrapper.var()
+	weights = shared_weights.as_numpy()
+	loaded_version = -1
+	state = env.reset()
+	chunk = []
+	while not stop_event.is_set():
+		if weights_version.value != loaded_version:
+			with weights_lock:
+				loaded_version = weights_version.value
+				torch.nn.utils.vector_to_parameters(torch.from_numpy(weights.copy()), agent.net.parameters())
+		with frame_counter.get_lock():
+			frame_idx = frame_counter.value
+			frame_counter.value += 1
+
+		action = int(agent.policy_batch(state[np.newaxis], _get_epsilon(agent.config_rl, frame_idx), raw_action=True)[0])
+		next_state, reward, is_done, info = env.step(agent.agent_output_to_market_form(action))
+		chunk.append((state, action, reward, is_done, next_state, info.row))
+		state = env.reset() if is_done else next_state
+
+		if is_done or len(chunk) == TRANSITIONS_PER_MESSAGE:
+			transitions_queue.put((actor_index, tuple(np.array(field) for field in zip(*chunk))))
+			chunk = []
+	env.close()
+
+
+class ActorLearner():
+	"""
+	Trains a `QLearningAgent` with asynchronous experience generation.
+	Actor processes play episodes on copies of the marketplace with periodically refreshed copies of the network,
+	while the learner, which runs in the calling process, appends their transitions to the replay buffer,
+	calls `train_batch` and `synchronize_tgt_net` and broadcasts its weights.
+	The weights are exchanged as one flat vector in shared memory, the transitions are sent through a bounded queue,
+	so the actors cannot run ahead of the learner by more than a few messages.
+	"""
+	def __init__(self, trainer, number_of_actors: int = None, replay_ratio: float = 1.0, start_method: str = None) -> None:
+		"""
+		Args:
+			trainer (QLearningTrainer): The trainer which provides the configuration, the callback and the random stream.
+			number_of_actors (int, optional): The number of actor processes.
+				Defaults to None, which means one per available cpu except for the learner, but at least one.
+			replay_ratio (float, optional): The number of gradient steps per received transition. Defaults to 1.0.
+			start_method (str, optional): The start method of the actor processes, see `multiprocessing.get_all_start_methods`.
+				Defaults to None, which means 'forkserver' if it is available and 'spawn' otherwise.
+		"""
+		if number_of_actors is None:
+			number_of_actors = max(1, len(get_available_cpus()) - 1)
+		assert isinstance(number_of_actors, int) and number_of_actors > 0, f'number_of_actors must be a positive integer: {number_of_actors}'
+		assert replay_ratio > 0, f'replay_ratio must be positive: {replay_ratio}'
+		if start_method is None:
+			start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+		self.trainer = trainer
+		self.number_of_actors = number_of_actors
+		self.replay_ratio = replay_ratio
+		self.context = mp.get_context(start_method)
+
+	def _create_actor_agent(self, agent: QLearningAgent, random_generator) -> QLearningAgent:
+		"""
+		Copy the parts of the agent an actor needs to choose actions, without the replay buffer and the optimizer.
+		"""
+		actor_agent = copy.copy(agent)
+		actor_agent.buffer = actor_agent.optimizer = actor_agent.tgt_net = None
+		actor_agent.net = copy.deepcopy(agent.net).to('cpu')
+		actor_agent.device = 'cpu'
+		actor_agent.random_generator = random_generator
+		return actor_agent
+
+	def _broadcast_weights(self, agent: QLearningAgent) -> None:
+		with self.weights_lock:
+			self.weights[:] = torch.nn.utils.parameters_to_vector(agent.net.parameters()).detach().to('cpu').numpy()
+			self.weights_version.value += 1
+
+	@staticmethod
+	def _receive(transitions_queue, processes: list) -> tuple:
+		"""
+		Wait for the next message of the actors, but fail instead of waiting forever if an actor crashed.
+		"""
+		while True:
+			try:
+				return transitions_queue.get(timeout=1)
+			except queue.Empty:
+				assert all(process.is_alive() for process in processes), 'an actor process exited unexpectedly'
+
+	def train(self, number_of_training_steps: int) -> None:
+		"""
+		Train the agent of the callback of the trainer until the learner received number_of_training_steps transitions.
+
+		Args:
+			number_of_training_steps (int): The number of transitions, the transitions of the actors beyond this number are dropped.
+		"""
+		trainer = self.trainer
+		marketplace = trainer.initialize_callback(number_of_training_steps)
+		agent = trainer.callback.model
+		assert isinstance(getattr(agent, 'net', None), torch.nn.Module), f'the actor/learner split needs an agent with a network: {type(agent)}'
+		metrics_schema = marketplace.get_metrics_schema()
+		if self.number_of_actors > 1:
+			trainer.callback.watcher = Watcher(config_market=trainer.config_market, number_envs=self.number_of_actors)
+
+		number_of_weights = sum(parameter.numel() for parameter in agent.net.parameters())
+		shared_weights = _SharedArray(self.context, (number_of_weights,), np.float32)
+		self.weights = shared_weights.as_numpy()
+		self.weights_lock = self.context.Lock()
+		self.weights_version = self.context.Value('q', -1, lock=False)
+		self._broadcast_weights(agent)
+		frame_counter = self.context.Value('q', 0)
+		transitions_queue = self.context.Queue(maxsize=4 * self.number_of_actors)
+		stop_event = self.context.Event()
+
+		env_fns = create_marketplace_factories(marketplace, self.number_of_actors, trainer._random_generator)
+		actor_random_generators = spawn_random_generators(trainer._random_generator, self.number_of_actors)
+		processes = []
+		for actor_index, (env_fn, actor_random_generator) in enumerate(zip(env_fns, actor_random_generators)):
+			# daemon=True: if the learner crashes, the actors must not keep it alive
+			process = self.context.Process(target=_actor, daemon=True, args=(actor_index, CloudpickleWrapper(env_fn),
+				self._create_actor_agent(agent, actor_random_generator), shared_weights, self.weights_lock, self.weights_version,
+				frame_counter, transitions_queue, stop_event))
+			process.start()
+			processes.append(process)
+
+		last_loss = 0
+		last_q_val_selected_action = 0
+		finished_episodes = 0
+		received_transitions = 0
+		# the number of gradient steps which are due according to the replay ratio
+		pending_gradient_steps = 0
+		try:
+			while received_transitions < number_of_training_steps:
+				actor_index, (states, actions, rewards, are_done, next_states, metrics_rows) = self._receive(transitions_queue, processes)
+				number_of_transitions = min(len(actions), number_of_training_steps - received_transitions)
+				for transition in range(number_of_transitions):
+					info = MetricsInfo(metrics_schema, metrics_rows[transition])
+					# The following numbers are divided by the episode length because they will be summed up later in the watcher
+					info['Loss/MSE'] = last_loss / trainer.config_market.episode_length
+					info['Loss/RMSE'] = np.sqrt(last_loss) / trainer.config_market.episode_length
+					info['Loss/selected_q_vals'] = last_q_val_selected_action / trainer.config_market.episode_length
+					info['epsilon'] = _get_epsilon(trainer.config_rl, received_transitions + transition) / trainer.config_market.episode_length
+
+					agent.buffer.append(QLearningAgent.Experience(
+						states[transition], actions[transition], rewards[transition], are_done[transition], next_states[transition]))
+					if are_done[transition]:
+						finished_episodes += 1
+					trainer.callback.num_timesteps = received_transitions + transition
+					trainer.callback._on_step(finished_episodes, info, actor_index)
+
+				frame_idx = received_transitions
+				received_transitions += number_of_transitions
+				if len(agent.buffer) < trainer.config_rl.replay_start_size:
+					continue
+
+				pending_gradient_steps += number_of_transitions * self.replay_ratio
+				while pending_gradient_steps >= 1:
+					last_loss, last_q_val_selected_action = agent.train_batch()
+					pending_gradient_steps -= 1
+				trainer.consider_sync_tgt_net(frame_idx, number_of_transitions)
+				self._broadcast_weights(agent)
+		finally:
+			stop_event.set()
+			# the actors can only exit after the learner took their last messages from the queue
+			while any(process.is_alive() for process in processes):
+				try:
+					transitions_queue.get(timeout=0.1)
+				except queue.Empty:
+					pass
+			for process in processes:
+				process.join()
+
+		trainer.callback._on_training_end()
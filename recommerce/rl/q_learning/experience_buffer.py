@@ -1,27 +1,381 @@
-import collections
+import json
+import os
 
 import numpy as np
 
+import recommerce.configuration.utils as ut
+
 
 class ExperienceBuffer:
-	def __init__(self, capacity):
-		self.buffer = collections.deque(maxlen=capacity)
+	"""
+	A ring buffer for the experiences of a `QLearningAgent`.
+	The fields of the experiences are stored in preallocated arrays, so appending is O(1)
+	and a batch is sampled by indexing all arrays at once.
+	The arrays are allocated on the first append, when the shapes of the observations and actions are known.
+	"""
+	_fields = ('states', 'actions', 'rewards', 'dones', 'next_states')
+
+	def __init__(self, capacity, random_generator=None):
+		assert isinstance(capacity, int) and capacity > 0, f'capacity must be a positive integer: {capacity}'
+		self.capacity = capacity
+		self.random_generator = ut.get_random_generator(random_generator)
+		self.states = None
+		self.actions = None
+		self.rewards = None
+		self.dones = None
+		self.next_states = None
+		# the index which is overwritten by the next append
+		self.position = 0
+		self.size = 0
 
 	def __len__(self):
-		return len(self.buffer)
+		return self.size
+
+	@staticmethod
+	def _get_layouts(experience) -> dict:
+		"""
+		Args:
+			experience (QLearningAgent.Experience): An experience.
+
+		Returns:
+			dict: The shape of the arrays and the dtype for every field.
+		"""
+		observation, action, _, _, new_observation = experience
+		return {
+			'states': (np.shape(observation), np.float32),
+			'actions': (np.shape(action), np.int64),
+			'rewards': ((), np.float32),
+			'dones': ((), np.uint8),
+			'next_states': (np.shape(new_observation), np.float32),
+		}
+
+	def _allocate(self, experience) -> None:
+		"""
+		Allocate the arrays for the fields of the experiences.
+
+		Args:
+			experience (QLearningAgent.Experience): The first experience, which determines the shapes of the arrays.
+		"""
+		for field, (shape, dtype) in self._get_layouts(experience).items():
+			setattr(self, field, np.zeros((self.capacity, *shape), dtype=dtype))
 
 	def append(self, experience):
-		self.buffer.append(experience)
+		"""
+		Store an experience. If the buffer is full, the oldest experience is overwritten.
+
+		Args:
+			experience (QLearningAgent.Experience): The observation, action, reward, done and new_observation of one step.
+		"""
+		if self.states is None:
+			self._allocate(experience)
+		observation, action, reward, done, new_observation = experience
+		self.states[self.position] = observation
+		self.actions[self.position] = action
+		self.rewards[self.position] = reward
+		self.dones[self.position] = done
+		self.next_states[self.position] = new_observation
+		self.position = (self.position + 1) % self.capacity
+		self.size = min(self.size + 1, self.capacity)
 
 	def sample(self, batch_size):
-		indices = np.random.choice(len(self.buffer), batch_size, replace=False)
-		states, actions, rewards, dones, next_states = zip(
-			*[self.buffer[idx] for idx in indices]
-		)
+		"""
+		Sample distinct experiences uniformly.
+
+		Args:
+			batch_size (int): The number of experiences.
+
+		Returns:
+			tuple: The states, actions, rewards, dones and next_states of the experiences as np.arrays.
+		"""
+		indices = self.random_generator.choice(self.size, batch_size, replace=False)
+		return self._get_batch(indices)
+
+	def _get_batch(self, indices: np.array) -> tuple:
 		return (
-			np.array(states),
-			np.array(actions, dtype=np.int64),
-			np.array(rewards, dtype=np.float32),
-			np.array(dones, dtype=np.uint8),
-			np.array(next_states),
+			self.states[indices],
+			self.actions[indices],
+			self.rewards[indices],
+			self.dones[indices],
+			self.next_states[indices],
 		)
+
+	def get_state(self) -> dict:
+		"""
+		Take a snapshot of the stored experiences, e.g. for a checkpoint of the training.
+		The random generator is not part of the snapshot, because it is shared with the agent, which saves it.
+
+		Returns:
+			dict: The position, the size and the filled part of the arrays, which can be passed to `set_state`.
+		"""
+		return {
+			'position': self.position,
+			'size': self.size,
+			'arrays': None if self.states is None else {field: getattr(self, field)[:self.size].copy() for field in self._fields}
+		}
+
+	def set_state(self, state: dict) -> None:
+		"""
+		Restore a snapshot taken by `get_state` of a buffer with the same capacity.
+
+		Args:
+			state (dict): The snapshot to restore.
+		"""
+		assert state['size'] <= self.capacity, f'the state holds {state["size"]} experiences, but the capacity is {self.capacity}'
+		self.position = state['position']
+		self.size = state['size']
+		for field in self._fields:
+			array = None
+			if state['arrays'] is not None:
+				array = np.zeros((self.capacity, *state['arrays'][field].shape[1:]), dtype=state['arrays'][field].dtype)
+				array[:self.size] = state['arrays'][field]
+			setattr(self, field, array)
+
+
+class PrioritizedExperienceBuffer(ExperienceBuffer):
+	"""
+	An `ExperienceBuffer` which samples experiences proportionally to their priority, see Schaul et al., Prioritized Experience Replay.
+	The priorities are kept in a sum-tree, so sampling and updating priorities are O(log n) per experience.
+	The tree is stored in one array, the node i has the children 2i and 2i + 1 and the leaves start at `tree_capacity`.
+	New experiences get the highest priority seen so far, so every experience is sampled at least once with a high probability.
+	"""
+	def __init__(self, capacity, random_generator=None, alpha=0.6, beta_start=0.4, beta_annealing_frames=100000, priority_offset=1e-5):
+		"""
+		Args:
+			capacity (int): The maximum number of experiences.
+			random_generator (np.random.Generator, int or None, optional): The source of randomness for sampling. Defaults to None.
+			alpha (float, optional): How strongly the priorities are used, 0 means uniform sampling. Defaults to 0.6.
+			beta_start (float, optional): The initial exponent of the importance-sampling weights. Defaults to 0.4.
+			beta_annealing_frames (int, optional): The number of appended experiences after which beta reaches 1. Defaults to 100000.
+			priority_offset (float, optional): Added to the absolute TD errors, so no experience gets the priority 0. Defaults to 1e-5.
+		"""
+		super().__init__(capacity, random_generator)
+		assert 0 <= alpha <= 1, f'alpha must be between 0 and 1: {alpha}'
+		assert 0 <= beta_start <= 1, f'beta_start must be between 0 and 1: {beta_start}'
+		assert beta_annealing_frames > 0, f'beta_annealing_frames must be positive: {beta_annealing_frames}'
+		self.alpha = alpha
+		self.beta_start = beta_start
+		self.beta_annealing_frames = beta_annealing_frames
+		self.priority_offset = priority_offset
+		self.max_priority = 1.0
+		self.appended_frames = 0
+		self.tree_capacity = 1 << (capacity - 1).bit_length()
+		self.tree_depth = self.tree_capacity.bit_length() - 1
+		self.sum_tree = np.zeros(2 * self.tree_capacity, dtype=np.float64)
+
+	@property
+	def beta(self) -> float:
+		return min(1.0, self.beta_start + self.appended_frames * (1 - self.beta_start) / self.beta_annealing_frames)
+
+	def append(self, experience):
+		position = self.position
+		super().append(experience)
+		self.appended_frames += 1
+		self._set_priorities(np.array([position]), np.array([self.max_priority ** self.alpha]))
+
+	def _set_priorities(self, indices: np.array, priorities: np.array) -> None:
+		"""
+		Write the priorities into the leaves and update the sums of all their ancestors level by level.
+
+		Args:
+			indices (np.array): The indices of the experiences.
+			priorities (np.array): The new priorities, already raised to the power of alpha.
+		"""
+		nodes = indices + self.tree_capacity
+		self.sum_tree[nodes] = priorities
+		for _ in range(self.tree_depth):
+			nodes = np.unique(nodes // 2)
+			self.sum_tree[nodes] = self.sum_tree[2 * nodes] + self.sum_tree[2 * nodes + 1]
+
+	def _find_leaves(self, values: np.array) -> np.array:
+		"""
+		Descend the sum-tree for all values at once.
+
+		Args:
+			values (np.array): Values between 0 and the total priority.
+
+		Returns:
+			np.array: The indices of the experiences whose priority interval contains the values.
+		"""
+		nodes = np.ones(len(values), dtype=np.int64)
+		for _ in range(self.tree_depth):
+			left_children = 2 * nodes
+			left_sums = self.sum_tree[left_children]
+			go_right = values > left_sums
+			values = np.where(go_right, values - left_sums, values)
+			nodes = left_children + go_right
+		# rounding errors may lead to an empty leaf behind the stored experiences
+		return np.minimum(nodes - self.tree_capacity, self.size - 1)
+
+	def sample_with_weights(self, batch_size):
+		"""
+		Sample experiences proportionally to their priorities, one from each of batch_size equally sized segments of the total priority.
+
+		Args:
+			batch_size (int): The number of experiences.
+
+		Returns:
+			tuple: The batch like returned by `sample`, the indices of the experiences needed for `update_priorities`
+				and the importance-sampling weights, normalized by their maximum within the batch.
+		"""
+		assert self.size > 0, 'cannot sample from an empty buffer'
+		total_priority = self.sum_tree[1]
+		values = (np.arange(batch_size) + self.random_generator.random(batch_size)) * total_priority / batch_size
+		indices = self._find_leaves(values)
+		probabilities = self.sum_tree[indices + self.tree_capacity] / total_priority
+		weights = (self.size * probabilities) ** -self.beta
+		return self._get_batch(indices), indices, (weights / weights.max()).astype(np.float32)
+
+	def sample(self, batch_size):
+		return self.sample_with_weights(batch_size)[0]
+
+	def update_priorities(self, indices: np.array, td_errors: np.array) -> None:
+		"""
+		Set the priorities of sampled experiences to their absolute TD errors.
+
+		Args:
+			indices (np.array): The indices returned by `sample_with_weights`.
+			td_errors (np.array): The TD errors of the experiences in the last training step.
+		"""
+		priorities = np.abs(td_errors) + self.priority_offset
+		self.max_priority = max(self.max_priority, float(priorities.max()))
+		# if an experience was sampled several times, the priority of its last occurrence wins
+		self._set_priorities(indices, priorities ** self.alpha)
+
+	def get_state(self) -> dict:
+		return {
+			**super().get_state(),
+			'sum_tree': self.sum_tree.copy(),
+			'max_priority': self.max_priority,
+			'appended_frames': self.appended_frames
+		}
+
+	def set_state(self, state: dict) -> None:
+		super().set_state(state)
+		assert len(state['sum_tree']) == len(self.sum_tree), 'the state must be taken from a buffer with the same capacity'
+		self.sum_tree[:] = state['sum_tree']
+		self.max_priority = state['max_priority']
+		self.appended_frames = state['appended_frames']
+
+
+class MemmapExperienceBuffer(ExperienceBuffer):
+	"""
+	An `ExperienceBuffer` whose arrays are memory-mapped `.npy` files in a directory, for replay sizes which do not fit into memory.
+	Appended experiences are collected in a small in-memory hot segment, which is written to the files in one block when it is full,
+	and sampled experiences which are still in the hot segment are read from there.
+	`flush` writes the hot segment and the position of the ring buffer to the directory.
+	A buffer created on a directory which contains a flushed buffer reopens it, so the training can be resumed.
+	The snapshots of `get_state` only contain the position of the ring buffer, the experiences stay in the files.
+	"""
+	_metadata_file = 'experience_buffer.json'
+
+	def __init__(self, capacity, directory: str, random_generator=None, hot_segment_size=1024):
+		"""
+		Args:
+			capacity (int): The maximum number of experiences.
+			directory (str): The directory of the memory-mapped files. It is created if it does not exist.
+			random_generator (np.random.Generator, int or None, optional): The source of randomness for sampling. Defaults to None.
+			hot_segment_size (int, optional): The number of experiences which are kept in memory before they are written. Defaults to 1024.
+		"""
+		super().__init__(capacity, random_generator)
+		assert isinstance(hot_segment_size, int) and hot_segment_size > 0, f'hot_segment_size must be a positive integer: {hot_segment_size}'
+		self.directory = directory
+		self.hot_segment_size = min(hot_segment_size, capacity)
+		self.hot_segment = None
+		# the ring position of the first experience in the hot segment and the number of experiences in it
+		self.hot_segment_start = 0
+		self.hot_segment_length = 0
+		os.makedirs(directory, exist_ok=True)
+		metadata_path = os.path.join(directory, self._metadata_file)
+		if os.path.exists(metadata_path):
+			with open(metadata_path) as metadata_file:
+				metadata = json.load(metadata_file)
+			assert metadata['capacity'] == capacity, \
+				f'the buffer in {directory} has the capacity {metadata["capacity"]}, which differs from {capacity}'
+			self.position = self.hot_segment_start = metadata['position']
+			self.size = metadata['size']
+			if self.size > 0:
+				self._open_files()
+
+	def _get_path(self, field: str) -> str:
+		return os.path.join(self.directory, f'{field}.npy')
+
+	def _open_files(self, layouts: dict = None) -> None:
+		"""
+		Open the memory-mapped files and allocate the hot segment with the same layouts.
+
+		Args:
+			layouts (dict, optional): The layouts returned by `_get_layouts`, to create new files.
+				Defaults to None, which opens the existing files.
+		"""
+		for field in self._fields:
+			if layouts is None:
+				array = np.lib.format.open_memmap(self._get_path(field), 'r+')
+			else:
+				shape, dtype = layouts[field]
+				array = np.lib.format.open_memmap(self._get_path(field), 'w+', dtype, (self.capacity, *shape))
+			setattr(self, field, array)
+		self.hot_segment = {field: np.zeros((self.hot_segment_size, *getattr(self, field).shape[1:]), getattr(self, field).dtype)
+			for field in self._fields}
+
+	def _allocate(self, experience) -> None:
+		self._open_files(self._get_layouts(experience))
+
+	def append(self, experience):
+		if self.states is None:
+			self._allocate(experience)
+		for field, value in zip(self._fields, experience):
+			self.hot_segment[field][self.hot_segment_length] = value
+		self.hot_segment_length += 1
+		self.position = (self.position + 1) % self.capacity
+		self.size = min(self.size + 1, self.capacity)
+		if self.hot_segment_length == self.hot_segment_size:
+			self._write_hot_segment()
+
+	def _write_hot_segment(self) -> None:
+		positions = (self.hot_segment_start + np.arange(self.hot_segment_length)) % self.capacity
+		for field in self._fields:
+			getattr(self, field)[positions] = self.hot_segment[field][:self.hot_segment_length]
+		self.hot_segment_start = self.position
+		self.hot_segment_length = 0
+
+	def _get_batch(self, indices: np.array) -> tuple:
+		offsets = (indices - self.hot_segment_start) % self.capacity
+		is_hot = offsets < self.hot_segment_length
+		batch = []
+		for field in self._fields:
+			values = np.asarray(getattr(self, field)[indices])
+			values[is_hot] = self.hot_segment[field][offsets[is_hot]]
+			batch.append(values)
+		return tuple(batch)
+
+	def flush(self) -> None:
+		"""
+		Write the hot segment, the files and the position of the ring buffer to the directory, so the buffer can be reopened.
+		"""
+		if self.states is not None:
+			self._write_hot_segment()
+			for field in self._fields:
+				getattr(self, field).flush()
+		with open(os.path.join(self.directory, self._metadata_file), 'w') as metadata_file:
+			json.dump({'capacity': self.capacity, 'position': self.position, 'size': self.size}, metadata_file)
+
+	def get_state(self) -> dict:
+		"""
+		Flush the buffer and take a snapshot of its position.
+		Copying the files would defeat the purpose of this buffer, so experiences which overwrite older ones after the snapshot
+		are kept when it is restored.
+
+		Returns:
+			dict: The position and the size, which can be passed to `set_state` of a buffer on the same directory.
+		"""
+		self.flush()
+		return {'position': self.position, 'size': self.size}
+
+	def set_state(self, state: dict) -> None:
+		assert state['size'] <= self.capacity, f'the state holds {state["size"]} experiences, but the capacity is {self.capacity}'
+		# the experiences in the hot segment were appended after the snapshot
+		self.position = self.hot_segment_start = state['position']
+		self.hot_segment_length = 0
+		self.size = state['size']
+		if self.states is None and self.size > 0:
+			self._open_files()
@@ -1,16 +1,17 @@
 import collections
-import random
+import copy
 
 import numpy as np
 import torch
 from attrdict import AttrDict
 
+import recommerce.configuration.utils as ut
 import recommerce.rl.model as model
 from recommerce.configuration.common_rules import between_zero_one_rule, greater_zero_rule
 from recommerce.market.circular.circular_vendors import CircularAgent
 from recommerce.market.linear.linear_vendors import LinearAgent
 from recommerce.market.sim_market import SimMarket
-from recommerce.rl.q_learning.experience_buffer import ExperienceBuffer
+from recommerce.rl.q_learning.experience_buffer import ExperienceBuffer, PrioritizedExperienceBuffer
 from recommerce.rl.reinforcement_learning_agent import ReinforcementLearningAgent
 
 
@@ -28,7 +29,8 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 			device='cuda' if torch.cuda.is_available() else 'cpu',
 			load_path=None,
 			name='',
-			network_architecture=model.simple_network):
+			network_architecture=model.simple_network,
+			random_generator=None):
 		assert isinstance(marketplace, SimMarket), f'marketplace must be a SimMarket, but is {type(marketplace)}'
 
 		n_observations = marketplace.get_observations_dimension()
@@ -39,6 +41,7 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 		self.device = device
 		self.buffer_for_feedback = None
 		self.name = name if name != '' else type(self).__name__
+		self.random_generator = ut.get_random_generator(random_generator)
 		print(f'Initializing a {type(self).__name__} using {self.device} device')
 		self.net = network_architecture(n_observations, self.n_actions).to(self.device)
 		if load_path:
@@ -49,19 +52,51 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 		if load_path is None:
 			self.optimizer = torch.optim.Adam(self.net.parameters(), lr=self.config_rl.learning_rate)
 			self.tgt_net = network_architecture(n_observations, self.n_actions).to(self.device)
-			self.buffer = ExperienceBuffer(self.config_rl.replay_size)
+			self.buffer = self._create_buffer()
+
+	def _create_buffer(self) -> ExperienceBuffer:
+		"""
+		Returns:
+			ExperienceBuffer: The replay buffer selected by the config, a `PrioritizedExperienceBuffer` if prioritized_replay is set.
+		"""
+		if self.config_rl.get('prioritized_replay', False):
+			# beta reaches 1 at the end of the default training length of the QLearningTrainer
+			return PrioritizedExperienceBuffer(self.config_rl.replay_size, self.random_generator,
+				beta_annealing_frames=2 * self.config_rl.epsilon_decay_last_frame)
+		return ExperienceBuffer(self.config_rl.replay_size, self.random_generator)
 
 	@torch.no_grad()
 	def policy(self, observation, epsilon=0):
 		assert self.buffer_for_feedback is None or self.optimizer is None, 'one of buffer_for_feedback or optimizer must be None'
-		if np.random.random() < epsilon:
-			action = random.randint(0, self.n_actions - 1)
+		if self.random_generator.random() < epsilon:
+			action = int(self.random_generator.integers(self.n_actions))
 		else:
 			action = int(torch.argmax(self.net(torch.Tensor(observation).to(self.device))))
 		if self.optimizer is not None:
 			self.buffer_for_feedback = (observation, action)
 		return self.agent_output_to_market_form(action)
 
+	@torch.no_grad()
+	def policy_batch(self, observations, epsilon=0, raw_action=False):
+		"""
+		Like `policy`, but for a batch of observations, which are passed through the network at once.
+		No feedback is expected afterwards, the experiences must be appended to the buffer directly when training.
+
+		Args:
+			observations (np.array): The observations, one per row.
+			epsilon (float, optional): The probability of a random action for each observation. Defaults to 0.
+			raw_action (bool, optional): Flag to return the indices of the actions without calling agent_output_to_market_form_batch.
+				Defaults to False.
+
+		Returns:
+			np.array: The actions in market form, one per row.
+		"""
+		actions = torch.argmax(self.net(torch.Tensor(np.array(observations)).to(self.device)), dim=1).to('cpu').numpy()
+		if epsilon > 0:
+			is_random = self.random_generator.random(len(actions)) < epsilon
+			actions[is_random] = self.random_generator.integers(self.n_actions, size=int(is_random.sum()))
+		return actions if raw_action else self.agent_output_to_market_form_batch(actions)
+
 	def agent_output_to_market_form(self, action):
 		"""
 		Takes a raw action and transforms it to a form that is accepted by the market.
@@ -82,6 +117,18 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 		action_list.reverse()
 		return tuple(action_list)
 
+	def agent_output_to_market_form_batch(self, actions: np.array) -> np.array:
+		"""
+		The vectorized form of `agent_output_to_market_form`.
+
+		Args:
+			actions (np.array): The raw actions, shape (n,).
+
+		Returns:
+			np.array: The actions accepted by the market, one per row.
+		"""
+		return ut.decode_discrete_actions(actions, self.config_market.max_price, self.actions_dimension)
+
 	def set_feedback(self, reward, is_done, new_observation):
 		exp = self.Experience(*self.buffer_for_feedback, reward, is_done, new_observation)
 		self.buffer.append(exp)
@@ -89,23 +136,40 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 
 	def train_batch(self):
 		self.optimizer.zero_grad()
-		batch = self.buffer.sample(self.config_rl.batch_size)
-		loss_t, selected_q_val_mean = self.calc_loss(batch, self.device)
+		if isinstance(self.buffer, PrioritizedExperienceBuffer):
+			batch, indices, weights = self.buffer.sample_with_weights(self.config_rl.batch_size)
+		else:
+			batch, weights = self.buffer.sample(self.config_rl.batch_size), None
+		loss_t, selected_q_val_mean, td_errors = self.calc_loss(batch, self.device, weights)
 		loss_t.backward()
 		self.optimizer.step()
+		if weights is not None:
+			self.buffer.update_priorities(indices, td_errors)
 		return loss_t.item(), selected_q_val_mean.item()
 
 	def synchronize_tgt_net(self):
 		self.tgt_net.load_state_dict(self.net.state_dict())
 
-	def calc_loss(self, batch, device='cpu'):
+	def calc_loss(self, batch, device='cpu', weights=None):
+		"""
+		Calculate the mean squared TD error of a batch.
+
+		Args:
+			batch (tuple): The states, actions, rewards, dones and next_states of the experiences.
+			device (str, optional): The device on which the loss is calculated. Defaults to 'cpu'.
+			weights (np.array, optional): The importance-sampling weights of a prioritized replay buffer.
+				Defaults to None, which weights all experiences equally.
+
+		Returns:
+			tuple: The loss, the mean of the Q-values of the selected actions and the TD errors of the experiences as np.array.
+		"""
 		states, actions, rewards, dones, next_states = batch
 
-		states_v = torch.tensor(np.single(states)).to(device)
-		next_states_v = torch.tensor(np.single(next_states)).to(device)
-		actions_v = torch.tensor(actions).to(device)
-		rewards_v = torch.tensor(rewards).to(device)
-		done_mask = torch.BoolTensor(dones).to(device)
+		states_v = torch.as_tensor(states, dtype=torch.float32).to(device)
+		next_states_v = torch.as_tensor(next_states, dtype=torch.float32).to(device)
+		actions_v = torch.as_tensor(actions).to(device)
+		rewards_v = torch.as_tensor(rewards).to(device)
+		done_mask = torch.as_tensor(dones, dtype=torch.bool).to(device)
 
 		state_action_values = self.net(states_v).gather(1, actions_v.unsqueeze(-1)).squeeze(-1)
 
@@ -115,7 +179,12 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 			next_state_values = next_state_values.detach()
 
 		expected_state_action_values = next_state_values * self.config_rl.gamma + rewards_v
-		return torch.nn.MSELoss()(state_action_values, expected_state_action_values), state_action_values.mean()
+		td_errors = expected_state_action_values - state_action_values
+		if weights is None:
+			loss = torch.nn.MSELoss()(state_action_values, expected_state_action_values)
+		else:
+			loss = (torch.as_tensor(weights).to(device) * td_errors ** 2).mean()
+		return loss, state_action_values.mean(), td_errors.detach().to('cpu').numpy()
 
 	def save(self, model_path: str) -> None:
 		"""
@@ -125,7 +194,48 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 			model_path (str): The path including the name where the model should be saved.
 		"""
 		assert model_path.endswith('.dat'), f'the modelname must end in ".dat": {model_path}'
-		torch.save(self.net.state_dict(), model_path)
+		self.write_model_snapshot(self.get_model_snapshot(), model_path)
+
+	def get_model_snapshot(self):
+		"""
+		Returns:
+			dict: A copy of the parameters of the net, which `write_model_snapshot` writes like `save`, e.g. in a background thread.
+		"""
+		return copy.deepcopy(self.net.state_dict())
+
+	@staticmethod
+	def write_model_snapshot(snapshot, model_path: str) -> None:
+		torch.save(snapshot, model_path)
+
+	def get_state(self) -> dict:
+		"""
+		Take a snapshot of everything the training changes, so it can be resumed from a checkpoint.
+
+		Returns:
+			dict: The parameters of the net and the target net, the state of the optimizer, the replay buffer and the random state.
+		"""
+		assert self.optimizer is not None, 'only an agent in training has a state to resume'
+		return {
+			'net': self.net.state_dict(),
+			'tgt_net': self.tgt_net.state_dict(),
+			'optimizer': self.optimizer.state_dict(),
+			'buffer': self.buffer.get_state(),
+			'random_state': self.random_generator.bit_generator.state
+		}
+
+	def set_state(self, state: dict) -> None:
+		"""
+		Restore a snapshot taken by `get_state` of an agent with the same architecture and config.
+
+		Args:
+			state (dict): The snapshot to restore.
+		"""
+		assert self.optimizer is not None, 'only an agent in training can resume a training'
+		self.net.load_state_dict(state['net'])
+		self.tgt_net.load_state_dict(state['tgt_net'])
+		self.optimizer.load_state_dict(state['optimizer'])
+		self.buffer.set_state(state['buffer'])
+		self.random_generator.bit_generator.state = state['random_state']
 
 	@staticmethod
 	def get_configurable_fields() -> list:
@@ -139,4 +249,5 @@ class QLearningAgent(ReinforcementLearningAgent, CircularAgent, LinearAgent):
 			('epsilon_decay_last_frame', int, greater_zero_rule),
 			('epsilon_start', float, between_zero_one_rule),
 			('epsilon_final', float, between_zero_one_rule),
+			('prioritized_replay', bool, None),
 		]
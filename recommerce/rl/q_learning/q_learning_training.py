@@ -1,5 +1,11 @@
+import os
+
 import numpy as np
 
+from recommerce.monitoring.watcher import Watcher
+from recommerce.rl.environment_pool import EnvironmentPool, create_marketplace_factories
+from recommerce.rl.q_learning.actor_learner import ActorLearner
+from recommerce.rl.q_learning.experience_buffer import MemmapExperienceBuffer, PrioritizedExperienceBuffer
 from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
 from recommerce.rl.training import RLTrainer
 
@@ -9,50 +15,147 @@ class QLearningTrainer(RLTrainer):
 	def trainer_agent_fit(self) -> bool:
 		return issubclass(self.agent_class, QLearningAgent), f'the passed agent must be a QLearningAgent: {self.agent_class}'
 
-	def train_agent(self, number_of_training_steps=None) -> None:
+	def train_agent(self, number_of_training_steps=None, replay_buffer_on_disk=False, number_of_envs=1, replay_ratio=1.0,
+			number_of_workers=None, checkpoint_interval=None, resume_from=None) -> None:
 		"""
 		Train a QLearningAgent on a marketplace.
+		With several environments, all of them are stepped in every frame, in the worker processes of an `EnvironmentPool`,
+		and their actions are chosen with one forward pass.
 
 		Args:
-			number_of_training_steps (int, optional): The maximum number of steps the training will run for.
+			number_of_training_steps (int, optional): The number of transitions the training will collect.
 			Defaults to 2*self.config.epsilon_decay_last_frame.
+			replay_buffer_on_disk (bool, optional): If True, the experiences are stored in a `MemmapExperienceBuffer`
+			in the folder of the trained models of this run, which allows replay sizes that do not fit into memory. Defaults to False.
+			number_of_envs (int, optional): The number of environments which are stepped in every frame. Defaults to 1.
+			replay_ratio (float, optional): The number of gradient steps per collected transition. Defaults to 1.0.
+			number_of_workers (int, optional): The number of worker processes if there are several environments.
+			Defaults to None, which means one per cpu.
+			checkpoint_interval (int, optional): The number of transitions after which a checkpoint is written with `save_checkpoint`.
+			Defaults to None, which means that no checkpoints are written.
+			resume_from (str, optional): The path of a checkpoint of an interrupted training with the same parameters, which is continued.
+			Defaults to None.
 		"""
+		assert isinstance(number_of_envs, int) and number_of_envs > 0, f'number_of_envs must be a positive integer: {number_of_envs}'
+		assert replay_ratio > 0, f'replay_ratio must be positive: {replay_ratio}'
+		assert checkpoint_interval is None or isinstance(checkpoint_interval, int) and checkpoint_interval > 0, \
+			f'checkpoint_interval must be a positive integer: {checkpoint_interval}'
 		if number_of_training_steps is None:
 			number_of_training_steps = 2 * self.config_rl.epsilon_decay_last_frame
-		marketplace = self.initialize_callback(number_of_training_steps)
-		state = marketplace.reset()
-
+		training_parameters = {'number_of_training_steps': number_of_training_steps, 'replay_buffer_on_disk': replay_buffer_on_disk,
+			'number_of_envs': number_of_envs, 'replay_ratio': replay_ratio}
+		marketplace = self.initialize_callback(number_of_training_steps, resume_from)
+		agent = self.callback.model
+		if replay_buffer_on_disk:
+			assert not isinstance(agent.buffer, PrioritizedExperienceBuffer), 'the replay buffer on disk does not support prioritized replay'
+			agent.buffer = MemmapExperienceBuffer(
+				self.config_rl.replay_size, os.path.join(self.callback.save_path, 'replay_buffer'), agent.random_generator)
+
+		environments = None
+		if number_of_envs == 1:
+			states = marketplace.reset()[np.newaxis]
+		else:
+			self.callback.watcher = Watcher(config_market=self.config_market, number_envs=number_of_envs)
+			environments = EnvironmentPool(create_marketplace_factories(marketplace, number_of_envs, self._random_generator), number_of_workers)
+
+		first_frame = 0
 		last_loss = 0
 		last_q_val_selected_action = 0
 		finished_episodes = 0
+		# the number of gradient steps which are due according to the replay ratio
+		pending_gradient_steps = 0
+
+		try:
+			if environments is not None:
+				states = environments.get_observations()
+			if resume_from is not None:
+				loop_state = self.load_checkpoint(resume_from)
+				assert loop_state['training_parameters'] == training_parameters, \
+					f'the checkpoint was written by a training with other parameters: {loop_state["training_parameters"]}'
+				first_frame, finished_episodes = loop_state['frame_idx'], loop_state['finished_episodes']
+				last_loss, last_q_val_selected_action = loop_state['last_loss'], loop_state['last_q_val_selected_action']
+				pending_gradient_steps = loop_state['pending_gradient_steps']
+				if environments is None:
+					marketplace.set_state(loop_state['market_states'][0])
+					states = loop_state['states']
+				else:
+					environments.set_states(loop_state['market_states'])
+					states = environments.get_observations()
+
+			for frame_idx in range(first_frame, number_of_training_steps, number_of_envs):
+				epsilon = max(self.config_rl.epsilon_final, self.config_rl.epsilon_start - frame_idx / self.config_rl.epsilon_decay_last_frame)
+
+				# the last frame only steps as many environments as transitions are left
+				number_of_stepped_envs = min(number_of_envs, number_of_training_steps - frame_idx)
+				actions = agent.policy_batch(states[:number_of_stepped_envs], epsilon, raw_action=True)
+				if environments is None:
+					next_state, reward, is_done, info = marketplace.step(agent.agent_output_to_market_form(int(actions[0])))
+					next_states, rewards, are_done, infos = next_state[np.newaxis], [reward], [is_done], [info]
+				else:
+					next_states, rewards, are_done, infos = environments.step(
+						np.arange(number_of_stepped_envs), agent.agent_output_to_market_form_batch(actions))
+
+				transitions = zip(states, actions, rewards, are_done, next_states, infos)
+				for env_index, (state, action, reward, is_done, next_state, info) in enumerate(transitions):
+					# The following numbers are divided by the episode length because they will be summed up later in the watcher
+					info['Loss/MSE'] = last_loss / self.config_market.episode_length
+					info['Loss/RMSE'] = np.sqrt(last_loss) / self.config_market.episode_length
+					info['Loss/selected_q_vals'] = last_q_val_selected_action / self.config_market.episode_length
+					info['epsilon'] = epsilon / self.config_market.episode_length
+
+					agent.buffer.append(QLearningAgent.Experience(state, int(action), reward, bool(is_done), next_state))
+
+					if is_done:
+						finished_episodes += 1
+
+					self.callback.num_timesteps = frame_idx + env_index
+					self.callback._on_step(finished_episodes, info, env_index)
+
+				if environments is None:
+					states = marketplace.reset()[np.newaxis] if are_done[0] else next_states
+				else:
+					states = environments.get_observations()
+
+				if len(agent.buffer) >= self.config_rl.replay_start_size:
+					pending_gradient_steps += len(actions) * replay_ratio
+					while pending_gradient_steps >= 1:
+						last_loss, last_q_val_selected_action = agent.train_batch()
+						pending_gradient_steps -= 1
+
+					self.consider_sync_tgt_net(frame_idx, len(actions))
+
+				if self.is_checkpoint_due(checkpoint_interval, frame_idx, len(actions)):
+					self.save_checkpoint({
+						'training_parameters': training_parameters,
+						'frame_idx': frame_idx + len(actions),
+						'finished_episodes': finished_episodes,
+						'last_loss': last_loss,
+						'last_q_val_selected_action': last_q_val_selected_action,
+						'pending_gradient_steps': pending_gradient_steps,
+						'states': states,
+						'market_states': [marketplace.get_state()] if environments is None else environments.get_states()
+					})
+		finally:
+			if environments is not None:
+				environments.close()
+
+		if replay_buffer_on_disk:
+			agent.buffer.flush()
+		self.callback._on_training_end()
 
-		for frame_idx in range(number_of_training_steps):
-			epsilon = max(self.config_rl.epsilon_final, self.config_rl.epsilon_start - frame_idx / self.config_rl.epsilon_decay_last_frame)
-
-			action = self.callback.model.policy(state, epsilon)
-			state, reward, is_done, info = marketplace.step(action)
-
-			# The following numbers are divided by the episode length because they will be summed up later in the watcher
-			info['Loss/MSE'] = last_loss / self.config_market.episode_length
-			info['Loss/RMSE'] = np.sqrt(last_loss) / self.config_market.episode_length
-			info['Loss/selected_q_vals'] = last_q_val_selected_action / self.config_market.episode_length
-			info['epsilon'] = epsilon / self.config_market.episode_length
-
-			self.callback.model.set_feedback(reward, is_done, state)
-
-			if is_done:
-				finished_episodes += 1
-
-			self.callback.num_timesteps = frame_idx
-			self.callback._on_step(finished_episodes, info)
-			if is_done:
-				marketplace.reset()
-
-			if len(self.callback.model.buffer) < self.config_rl.replay_start_size:
-				continue
-
-			last_loss, last_q_val_selected_action = self.callback.model.train_batch()
-
-			self.consider_sync_tgt_net(frame_idx)
+	def train_agent_asynchronously(self, number_of_training_steps=None, number_of_actors=None, replay_ratio=1.0, start_method=None) -> None:
+		"""
+		Train a QLearningAgent with an actor/learner split, see `ActorLearner`.
+		The actor processes simulate the markets while this process learns, so both overlap on several cpus.
 
-		self.callback._on_training_end()
+		Args:
+			number_of_training_steps (int, optional): The number of transitions the training will collect.
+			Defaults to 2*self.config.epsilon_decay_last_frame.
+			number_of_actors (int, optional): The number of actor processes. Defaults to None, which means one per cpu except for the learner.
+			replay_ratio (float, optional): The number of gradient steps per collected transition. Defaults to 1.0.
+			start_method (str, optional): The start method of the actor processes, see `multiprocessing.get_all_start_methods`.
+			Defaults to None, which means 'forkserver' if it is available and 'spawn' otherwise.
+		"""
+		if number_of_training_steps is None:
+			number_of_training_steps = 2 * self.config_rl.epsilon_decay_last_frame
+		ActorLearner(self, number_of_actors, replay_ratio, start_method).train(number_of_training_steps)
@@ -0,0 +1,164 @@
+import numpy as np
+from attrdict import AttrDict
+
+import recommerce.configuration.utils as ut
+from recommerce.configuration.common_rules import greater_zero_rule
+from recommerce.market.sim_market import SimMarket
+from recommerce.rl.q_learning.experience_buffer import PrioritizedExperienceBuffer
+from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
+
+
+class TabularQLearningAgent(QLearningAgent):
+	"""
+	A Q-learning agent which keeps its Q-values in a table instead of a network, for markets with small observation spaces.
+	Every feature of the observation is discretized into `number_of_bins` equally sized bins between the bounds of the observation_space,
+	the table has one row per combination of bins and one column per action.
+	It is trained by the `QLearningTrainer` like a `QLearningAgent`, `learning_rate` is the step size of the tabular update.
+	"""
+	# The table is allocated at once, so larger tables are rejected instead of exhausting the memory
+	max_table_size = 10 ** 8
+
+	def __init__(
+			self,
+			config_market: AttrDict,
+			config_rl: AttrDict,
+			marketplace: SimMarket,
+			device='cpu',
+			load_path=None,
+			name='',
+			random_generator=None):
+		assert isinstance(marketplace, SimMarket), f'marketplace must be a SimMarket, but is {type(marketplace)}'
+		self.n_actions = marketplace.get_n_actions()
+		self.actions_dimension = marketplace.get_actions_dimension()
+		self.config_market = config_market
+		self.config_rl = config_rl
+		# the table lives in memory, the argument is only accepted for compatibility with the other agents
+		self.device = 'cpu'
+		self.buffer_for_feedback = None
+		self.name = name if name != '' else type(self).__name__
+		self.random_generator = ut.get_random_generator(random_generator)
+
+		self.observation_low = marketplace.observation_space.low.astype(np.float64)
+		observation_range = marketplace.observation_space.high - self.observation_low
+		# features without a range are always in the first bin
+		self.bins_per_unit = np.divide(self.config_rl.number_of_bins, observation_range, out=np.zeros_like(self.observation_low),
+			where=observation_range > 0)
+		self.table_shape = (self.config_rl.number_of_bins,) * len(self.observation_low)
+		number_of_states = int(np.prod(self.table_shape, dtype=np.float64))
+		assert number_of_states * self.n_actions <= self.max_table_size, \
+			f'the Q-table would have {number_of_states * self.n_actions} entries, reduce number_of_bins: {self.config_rl.number_of_bins}'
+
+		print(f'Initializing a {type(self).__name__} with {number_of_states} discretized states')
+		self.is_training = load_path is None
+		if load_path:
+			with open(load_path, 'rb') as model_file:
+				self.q_table = np.load(model_file)
+			assert self.q_table.shape == (number_of_states, self.n_actions), \
+				f'the Q-table in {load_path} does not fit the marketplace and the number_of_bins: {self.q_table.shape}'
+		else:
+			self.q_table = np.zeros((number_of_states, self.n_actions), dtype=np.float32)
+			self.tgt_q_table = self.q_table.copy()
+			self.buffer = self._create_buffer()
+
+	def discretize(self, observations: np.array) -> np.array:
+		"""
+		Map observations to the rows of the Q-table.
+
+		Args:
+			observations (np.array): The observations, one per row.
+
+		Returns:
+			np.array: The indices of the rows, shape (n,).
+		"""
+		bins = np.floor((np.asarray(observations, dtype=np.float64) - self.observation_low) * self.bins_per_unit).astype(np.int64)
+		bins = np.clip(bins, 0, self.config_rl.number_of_bins - 1)
+		return np.ravel_multi_index(tuple(bins.T), self.table_shape)
+
+	def policy(self, observation, epsilon=0):
+		assert self.buffer_for_feedback is None or not self.is_training, 'one of buffer_for_feedback or is_training must be unset'
+		action = int(self.policy_batch(np.asarray(observation)[np.newaxis], epsilon, raw_action=True)[0])
+		if self.is_training:
+			self.buffer_for_feedback = (observation, action)
+		return self.agent_output_to_market_form(action)
+
+	def policy_batch(self, observations, epsilon=0, raw_action=False):
+		actions = np.argmax(self.q_table[self.discretize(observations)], axis=1)
+		if epsilon > 0:
+			is_random = self.random_generator.random(len(actions)) < epsilon
+			actions[is_random] = self.random_generator.integers(self.n_actions, size=int(is_random.sum()))
+		return actions if raw_action else self.agent_output_to_market_form_batch(actions)
+
+	def update_batch(self, states, actions, rewards, dones, next_states, weights=None) -> tuple:
+		"""
+		Apply the tabular Q-learning update for a batch of transitions, e.g. of several environments, at once.
+		The target values are taken from the target table, transitions which hit the same entry are all applied.
+
+		Args:
+			states (np.array): The observations before the actions.
+			actions (np.array): The indices of the actions.
+			rewards (np.array): The rewards.
+			dones (np.array): Whether the episodes ended with the transitions.
+			next_states (np.array): The observations after the actions.
+			weights (np.array, optional): The importance-sampling weights of a prioritized replay buffer. Defaults to None.
+
+		Returns:
+			tuple: The mean squared TD error, the mean of the Q-values of the selected actions and the TD errors as np.array.
+		"""
+		rows = self.discretize(states)
+		actions = np.asarray(actions, dtype=np.int64)
+		selected_q_values = self.q_table[rows, actions]
+		next_state_values = self.tgt_q_table[self.discretize(next_states)].max(axis=1)
+		expected_q_values = np.asarray(rewards) + self.config_rl.gamma * next_state_values * (1 - np.asarray(dones, dtype=np.float32))
+		td_errors = expected_q_values - selected_q_values
+		steps = self.config_rl.learning_rate * td_errors * (1 if weights is None else weights)
+		np.add.at(self.q_table, (rows, actions), steps)
+		return float(np.mean(td_errors ** 2)), float(np.mean(selected_q_values)), td_errors
+
+	def train_batch(self):
+		if isinstance(self.buffer, PrioritizedExperienceBuffer):
+			batch, indices, weights = self.buffer.sample_with_weights(self.config_rl.batch_size)
+		else:
+			batch, weights = self.buffer.sample(self.config_rl.batch_size), None
+		loss, selected_q_val_mean, td_errors = self.update_batch(*batch, weights)
+		if weights is not None:
+			self.buffer.update_priorities(indices, td_errors)
+		return loss, selected_q_val_mean
+
+	def synchronize_tgt_net(self):
+		self.tgt_q_table[:] = self.q_table
+
+	def get_model_snapshot(self):
+		"""
+		The Q-table is saved to the specified path like the network of a `QLearningAgent`.
+
+		Returns:
+			np.array: A copy of the Q-table.
+		"""
+		return self.q_table.copy()
+
+	@staticmethod
+	def write_model_snapshot(snapshot, model_path: str) -> None:
+		with open(model_path, 'wb') as model_file:
+			np.save(model_file, snapshot)
+
+	def get_state(self) -> dict:
+		assert self.is_training, 'only an agent in training has a state to resume'
+		return {
+			'q_table': self.q_table.copy(),
+			'tgt_q_table': self.tgt_q_table.copy(),
+			'buffer': self.buffer.get_state(),
+			'random_state': self.random_generator.bit_generator.state
+		}
+
+	def set_state(self, state: dict) -> None:
+		assert self.is_training, 'only an agent in training can resume a training'
+		assert state['q_table'].shape == self.q_table.shape, \
+			f'the Q-table of the state has the shape {state["q_table"].shape}, but this agent has {self.q_table.shape}'
+		self.q_table[:] = state['q_table']
+		self.tgt_q_table[:] = state['tgt_q_table']
+		self.buffer.set_state(state['buffer'])
+		self.random_generator.bit_generator.state = state['random_state']
+
+	@staticmethod
+	def get_configurable_fields() -> list:
+		return QLearningAgent.get_configurable_fields() + [('number_of_bins', int, greater_zero_rule)]
@@ -6,6 +6,7 @@ from attrdict import AttrDict
 
 from recommerce.configuration.path_manager import PathManager
 from recommerce.market.circular.circular_sim_market import CircularEconomyRebuyPriceDuopoly
+from recommerce.rl.policy_distillation import distill_policy
 from recommerce.rl.stable_baselines.sb_ppo import StableBaselinesPPO
 from recommerce.rl.stable_baselines.sb_sac import StableBaselinesSAC
 
@@ -15,7 +16,21 @@ def train_rl_vs_rl(
 		config_rl1: AttrDict,
 		config_rl2: AttrDict,
 		num_switches: int = 30,
-		num_steps_per_switch: int = 25000):
+		num_steps_per_switch: int = 25000,
+		distillation_bins: int = None):
+	"""
+	Train two agents against each other, the agents take turns in training while the other one is the competitor.
+
+	Args:
+		config_market (AttrDict): The config of the market.
+		config_rl1 (AttrDict): The config of the first agent, a `StableBaselinesPPO`.
+		config_rl2 (AttrDict): The config of the second agent, a `StableBaselinesSAC`.
+		num_switches (int, optional): The number of turns. Defaults to 30.
+		num_steps_per_switch (int, optional): The number of training steps of each turn. Defaults to 25000.
+		distillation_bins (int, optional): If not None, the competitor of each turn is the policy of the other agent distilled into
+			a `LookupTableAgent` with this number of bins per feature, which is much cheaper to ask than the agent itself.
+			Defaults to None, which means the agents compete directly.
+	"""
 	tmp_marketplace = CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True)
 	agent1 = StableBaselinesPPO(config_market=config_market, config_rl=config_rl1, marketplace=tmp_marketplace)
 	marketplace_for_agent2 = CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True, competitors=[agent1])
@@ -23,12 +38,16 @@ def train_rl_vs_rl(
 	marketplace_for_agent1 = CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True, competitors=[agent2])
 	agent1.set_marketplace(marketplace_for_agent1)
 	agents = [agent1, agent2]
+	marketplaces = [marketplace_for_agent1, marketplace_for_agent2]
 	assert len(agents) == 2, 'This scenario is only for exactly two agents.'
 
 	rewards = [[], []]
 
 	for i in range(num_switches):
 		print(f'\n\nTraining {i + 1}\nTraining generation {i // 2 + 1} of {agents[i % 2].name}.')
+		if distillation_bins is not None:
+			# the competitor does not learn during the turn, so its policy only needs to be tabulated once per turn
+			marketplaces[i % 2].competitors = [distill_policy(agents[(i + 1) % 2], marketplaces[i % 2], distillation_bins)]
 		last_dicts = agents[i % 2].train_agent(training_steps=num_steps_per_switch).all_dicts
 		for mydict in last_dicts:
 			rewards[i % 2].append(mydict['profits/all']['vendor_0'])
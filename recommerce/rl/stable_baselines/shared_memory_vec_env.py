@@ -0,0 +1,62 @@
+from typing import Any, Callable, List, Optional, Type
+
+import gym
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices
+
+from recommerce.market.sim_market import SimMarket
+from recommerce.rl.environment_pool import EnvironmentPool
+
+
+class SharedMemoryVecEnv(VecEnv):
+	"""
+	A vectorized environment for stable baselines, which steps every marketplace in its own worker process.
+	It works like the `SubprocVecEnv` of stable baselines, but it is backed by an `EnvironmentPool`, whose workers write
+	their observations, rewards, dones and metrics into arrays in shared memory instead of pickling them through a pipe.
+	The infos are rebuilt as `MetricsInfo` from the shared metrics rows, so all environments must return infos with the same schema.
+	"""
+	def __init__(self, env_fns: List[Callable[[], SimMarket]], start_method: str = None) -> None:
+		"""
+		Start one worker process per environment.
+
+		Args:
+			env_fns (list): The factories of the environments, e.g. created by `environment_pool.create_marketplace_factories`.
+			start_method (str, optional): The start method of the worker processes, see `multiprocessing.get_all_start_methods`.
+				Defaults to None, which means 'forkserver' if it is available and 'spawn' otherwise, like in stable baselines.
+		"""
+		self.pool = EnvironmentPool(env_fns, len(env_fns), start_method)
+		VecEnv.__init__(self, self.pool.number_of_envs, self.pool.observation_space, self.pool.action_space)
+
+	@property
+	def closed(self) -> bool:
+		return self.pool.closed
+
+	def reset(self) -> np.array:
+		return self.pool.reset()
+
+	def step_async(self, actions: np.array) -> None:
+		self.pool.step_async(None, actions)
+
+	def step_wait(self) -> tuple:
+		next_observations, rewards, dones, infos = self.pool.step_wait()
+		for env_index in np.flatnonzero(dones):
+			infos[env_index]['terminal_observation'] = next_observations[env_index]
+		return self.pool.get_observations(), rewards.astype(np.float32), dones, infos
+
+	def seed(self, seed: Optional[int] = None) -> list:
+		return self.pool.seed([None if seed is None else seed + env_index for env_index in range(self.num_envs)])
+
+	def close(self) -> None:
+		self.pool.close()
+
+	def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+		return self.pool.get_attr(attr_name, self._get_indices(indices))
+
+	def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+		self.pool.set_attr(attr_name, value, self._get_indices(indices))
+
+	def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
+		return self.pool.env_method(method_name, method_args, method_kwargs, self._get_indices(indices))
+
+	def env_is_wrapped(self, wrapper_class: Type[gym.Wrapper], indices: VecEnvIndices = None) -> List[bool]:
+		return self.pool.env_is_wrapped(wrapper_class, self._get_indices(indices))
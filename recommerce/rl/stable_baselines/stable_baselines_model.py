@@ -8,23 +8,47 @@ from recommerce.configuration.path_manager import PathManager
 from recommerce.market.circular.circular_vendors import CircularAgent
 from recommerce.market.linear.linear_vendors import LinearAgent
 from recommerce.market.sim_market import SimMarket
+from recommerce.market.vendors import RuleBasedAgent
 from recommerce.rl.callback import RecommerceCallback
+from recommerce.rl.environment_pool import create_marketplace_factories
 from recommerce.rl.reinforcement_learning_agent import ReinforcementLearningAgent
+from recommerce.rl.stable_baselines.shared_memory_vec_env import SharedMemoryVecEnv
 
 
 class StableBaselinesAgent(ReinforcementLearningAgent, LinearAgent, CircularAgent, ABC):
-	def __init__(self, config_market: AttrDict, config_rl: AttrDict, marketplace, load_path=None, name=''):
+	def __init__(self, config_market: AttrDict, config_rl: AttrDict, marketplace, load_path=None, name='', number_of_envs: int = 1):
+		"""
+		Initialize a stable baselines agent.
+
+		Args:
+			config_market (AttrDict): The config of the market.
+			config_rl (AttrDict): The config of the algorithm, which is passed to stable baselines.
+			marketplace (SimMarket): The marketplace the agent is trained on.
+			load_path (str, optional): The path of a saved model. Defaults to None, which means a new model.
+			name (str, optional): The name of the agent. Defaults to the name of the class.
+			number_of_envs (int, optional): The number of copies of the marketplace which are stepped in parallel worker processes
+				during training, see `SharedMemoryVecEnv`. The copies cannot share learning competitors,
+				so all competitors must be rule-based if it is greater than 1. Defaults to 1, which means training on the marketplace itself.
+		"""
 		assert marketplace is not None
 		assert isinstance(marketplace, SimMarket), \
 			f'if marketplace is provided, marketplace must be a SimMarket, but is {type(marketplace)}'
 		assert load_path is None or isinstance(load_path, str)
 		assert name is None or isinstance(name, str)
+		assert isinstance(number_of_envs, int) and number_of_envs > 0, 'number_of_envs must be a positive integer'
+		assert number_of_envs == 1 or all(isinstance(competitor, RuleBasedAgent) for competitor in marketplace.competitors), \
+			'training on several copies of the marketplace is only possible with rule-based competitors'
 		self.config_market = config_market
 		self.config_rl = config_rl
 		self.tensorboard_log = os.path.join(PathManager.results_path, 'runs')
 		self.marketplace = marketplace
+		self.number_of_envs = number_of_envs
+		# the worker processes of several copies only run while the agent is trained
+		self.training_env = None
 		if load_path is None:
-			self._initialize_model(marketplace)
+			# a new model is created with the environments it is trained on, because its buffers depend on their number
+			self.training_env = self._create_training_env()
+			self._initialize_model(self.training_env)
 			print(f'Initializing {self.name}-agent using {self.model.device} device')
 		if load_path is not None:
 			self._load(load_path)
@@ -32,6 +56,15 @@ class StableBaselinesAgent(ReinforcementLearningAgent, LinearAgent, CircularAgen
 
 		self.name = name if name != '' else type(self).__name__
 
+	def _create_training_env(self):
+		"""
+		Returns:
+			SimMarket or SharedMemoryVecEnv: The marketplace itself or a pool of number_of_envs copies of it.
+		"""
+		if self.number_of_envs == 1:
+			return self.marketplace
+		return SharedMemoryVecEnv(create_marketplace_factories(self.marketplace, self.number_of_envs))
+
 	@abstractmethod
 	def _initialize_model(self, marketplace):
 		raise NotImplementedError('This method is abstract. Use a subclass')
@@ -44,18 +77,43 @@ class StableBaselinesAgent(ReinforcementLearningAgent, LinearAgent, CircularAgen
 		assert isinstance(observation, np.ndarray), f'{observation}: this is a {type(observation)}, not a np ndarray'
 		return self.model.predict(observation)[0]
 
+	def policy_batch(self, observations: np.array) -> np.array:
+		assert isinstance(observations, np.ndarray), f'{observations}: this is a {type(observations)}, not a np ndarray'
+		return self.model.predict(observations)[0]
+
 	def synchronize_tgt_net(self):  # pragma: no cover
 		assert False, 'This method may never be used in a StableBaselinesAgent!'
 
 	def set_marketplace(self, new_marketplace: SimMarket):
+		"""
+		Train on another marketplace from now on. With several environments, the next training copies the new marketplace
+		number_of_envs times, so the model keeps the number of environments its buffers were created for.
+
+		Args:
+			new_marketplace (SimMarket): The marketplace.
+		"""
+		assert self.number_of_envs == 1 or all(isinstance(competitor, RuleBasedAgent) for competitor in new_marketplace.competitors), \
+			'training on several copies of the marketplace is only possible with rule-based competitors'
+		if isinstance(self.training_env, SharedMemoryVecEnv):
+			self.training_env.close()
 		self.marketplace = new_marketplace
-		self.model.set_env(new_marketplace)
+		# train_agent creates the environments of the new marketplace
+		self.training_env = None
 
-	def train_agent(self, training_steps=100001, iteration_length=500, analyze_after_training=True):
+	def train_agent(self, training_steps=100001, iteration_length=500, analyze_after_training=True, episode_hook=None):
 		callback = RecommerceCallback(
 			type(self), self.marketplace, self.config_market, self.config_rl, training_steps=training_steps, iteration_length=iteration_length,
-			signature=self.name, analyze_after_training=analyze_after_training)
-		self.model.learn(training_steps, callback=callback)
+			signature=self.name, analyze_after_training=analyze_after_training, episode_hook=episode_hook)
+		if self.training_env is None:
+			self.training_env = self._create_training_env()
+			self.model.set_env(self.training_env)
+		try:
+			self.model.learn(training_steps, callback=callback)
+		finally:
+			if isinstance(self.training_env, SharedMemoryVecEnv):
+				self.training_env.close()
+				# another training starts new worker processes
+				self.training_env = None
 		return callback.watcher
 
 	@staticmethod
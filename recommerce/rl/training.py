@@ -1,20 +1,27 @@
+import inspect
+import os
 from abc import ABC, abstractmethod
 
+import torch
 from attrdict import AttrDict
 
+from recommerce.configuration.utils import get_random_generator, spawn_random_generators
 from recommerce.market.sim_market import SimMarket
 from recommerce.rl.callback import RecommerceCallback
 from recommerce.rl.reinforcement_learning_agent import ReinforcementLearningAgent
 
 
 class RLTrainer(ABC):
+	checkpoint_file = 'checkpoint.pt'
+
 	def __init__(
 			self,
 			marketplace_class: SimMarket,
 			agent_class: ReinforcementLearningAgent,
 			config_market: AttrDict,
 			config_rl: AttrDict,
-			competitors: list = None):
+			competitors: list = None,
+			random_generator=None):
 		"""
 		Initialize an RLTrainer to train one specific configuration.
 
@@ -22,6 +29,8 @@ class RLTrainer(ABC):
 			marketplace_class (subclass of SimMarket): The market scenario you want to train.
 			agent_class (subclass of RLAgent): The agent you want to train.
 			competitors (list | None, optional): If set, which competitors should be used instead of the default ones.
+			random_generator (np.random.Generator, np.random.SeedSequence, int or None, optional): The parent of the random streams
+				of the agent and all environments created by the trainer. Pass a seed to make the training reproducible. Defaults to None.
 		"""
 		# TODO: assert Agent and marketplace fit together
 		assert issubclass(agent_class, ReinforcementLearningAgent)
@@ -30,12 +39,27 @@ class RLTrainer(ABC):
 		self.competitors = competitors
 		self.config_market = config_market
 		self.config_rl = config_rl
+		self._random_generator = get_random_generator(random_generator)
 		assert self.trainer_agent_fit()
 
-	def initialize_callback(self, training_steps):
+	def initialize_callback(self, training_steps, resume_from: str = None):
+		"""
+		Create the marketplace, the agent and the callback of a training.
+
+		Args:
+			training_steps (int): The number of steps of the training, for the progress bar.
+			resume_from (str, optional): The path of a checkpoint written by `save_checkpoint`, the callback then writes into the folders
+				of the interrupted training. The checkpoint itself is loaded by `load_checkpoint`. Defaults to None.
+
+		Returns:
+			SimMarket: The marketplace of the agent.
+		"""
 		# This marketplace gets returned
-		marketplace = self.marketplace_class(config=self.config_market, competitors=self.competitors)
-		agent = self.agent_class(marketplace=marketplace, config_market=self.config_market, config_rl=self.config_rl)
+		marketplace_random_generator, agent_random_generator = spawn_random_generators(self._random_generator, 2)
+		marketplace = self.marketplace_class(
+			config=self.config_market, competitors=self.competitors, random_generator=marketplace_random_generator)
+		agent = self.agent_class(
+			marketplace=marketplace, config_market=self.config_market, config_rl=self.config_rl, random_generator=agent_random_generator)
 		self.callback = RecommerceCallback(
 			self.agent_class,
 			marketplace,
@@ -45,12 +69,77 @@ class RLTrainer(ABC):
 			# TODO: Make this configurable
 			500,
 			'dat',
-			agent.name)
+			agent.name,
+			path_name=None if resume_from is None else os.path.basename(os.path.dirname(os.path.abspath(resume_from))))
 		self.callback.model = agent
 		return marketplace
 
-	def consider_sync_tgt_net(self, frame_idx) -> None:
-		if (frame_idx + 1) % self.config_rl.sync_target_frames == 0:
+	def save_checkpoint(self, loop_state: dict) -> str:
+		"""
+		Write everything needed to resume the training into the folder of the trained models of this run:
+		the state of the agent with its optimizers and replay buffer, the state of the callback with its watcher,
+		the random states and the state of the training loop, e.g. the current step and the states of the markets.
+		The checkpoint is written to a temporary file which replaces the previous checkpoint,
+		so an interruption while writing never leaves a broken checkpoint.
+
+		Args:
+			loop_state (dict): The variables of the training loop, they are returned by `load_checkpoint`.
+
+		Returns:
+			str: The path of the checkpoint.
+		"""
+		path = os.path.join(self.callback.save_path, self.checkpoint_file)
+		# the models listed in the state of the callback must be on the disk before the checkpoint refers to them
+		self.callback.model_writer.flush()
+		checkpoint = {
+			'agent': self.callback.model.get_state(),
+			'callback': self.callback.get_state(),
+			'random_state': self._random_generator.bit_generator.state,
+			'torch_random_state': torch.get_rng_state(),
+			'loop': loop_state
+		}
+		torch.save(checkpoint, f'{path}.tmp')
+		os.replace(f'{path}.tmp', path)
+		return path
+
+	def load_checkpoint(self, path: str) -> dict:
+		"""
+		Restore a checkpoint written by `save_checkpoint` into the agent and the callback of this trainer.
+
+		Args:
+			path (str): The path of the checkpoint.
+
+		Returns:
+			dict: The state of the training loop.
+		"""
+		assert os.path.exists(path), f'there is no checkpoint: {path}'
+		# the random state of torch must stay on the cpu, the networks move the parameters to their device when loading.
+		# The checkpoint contains numpy arrays and random states besides the tensors, so it cannot be restricted to weights.
+		# Versions of torch before 1.13 do not know weights_only and always load such objects.
+		load_kwargs = {'weights_only': False} if 'weights_only' in inspect.signature(torch.load).parameters else {}
+		checkpoint = torch.load(path, map_location='cpu', **load_kwargs)
+		self.callback.model.set_state(checkpoint['agent'])
+		self.callback.set_state(checkpoint['callback'])
+		self._random_generator.bit_generator.state = checkpoint['random_state']
+		torch.set_rng_state(checkpoint['torch_random_state'])
+		return checkpoint['loop']
+
+	@staticmethod
+	def is_checkpoint_due(checkpoint_interval: int, step: int, number_of_steps: int = 1) -> bool:
+		"""
+		Args:
+			checkpoint_interval (int or None): The number of steps between two checkpoints, None means no checkpoints.
+			step (int): The first step of the last iteration of the training loop.
+			number_of_steps (int, optional): The number of steps of the last iteration. Defaults to 1.
+
+		Returns:
+			bool: True if the steps of the last iteration passed a multiple of checkpoint_interval.
+		"""
+		return checkpoint_interval is not None and (step + number_of_steps) // checkpoint_interval > step // checkpoint_interval
+
+	def consider_sync_tgt_net(self, frame_idx, number_of_frames=1) -> None:
+		# if several frames were collected at once, the target net is synchronized if they passed a multiple of sync_target_frames
+		if (frame_idx + number_of_frames) // self.config_rl.sync_target_frames > frame_idx // self.config_rl.sync_target_frames:
 			self.callback.model.synchronize_tgt_net()
 
 	@abstractmethod
@@ -15,6 +15,7 @@ from recommerce.market.circular.circular_vendors import CircularAgent
 from recommerce.market.linear.linear_vendors import LinearAgent
 from recommerce.market.vendors import FixedPriceAgent
 from recommerce.rl.actorcritic.actorcritic_training import ActorCriticTrainer
+from recommerce.rl.cpu_scheduler import assign_cpus, get_available_cpus
 from recommerce.rl.q_learning.q_learning_training import QLearningTrainer
 from recommerce.rl.stable_baselines.sb_a2c import StableBaselinesA2C
 from recommerce.rl.stable_baselines.sb_ddpg import StableBaselinesDDPG
@@ -195,6 +196,8 @@ def train_from_config():
 
 
 def main():
+	# the training command is the only job, so it may use all cpus available to it, but not more
+	assign_cpus(get_available_cpus())
 	train_from_config()
 
 
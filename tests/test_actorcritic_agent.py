@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 import torch
 from attrdict import AttrDict
@@ -7,6 +8,7 @@ import recommerce.market.circular.circular_sim_market as circular_market
 import recommerce.market.linear.linear_sim_market as linear_market
 import recommerce.rl.actorcritic.actorcritic_agent as actorcritic_agent
 from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.metrics import MetricsInfo
 from recommerce.rl.actorcritic.actorcritic_agent import ContinuousActorCriticAgentFixedOneStd
 
 config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
@@ -96,6 +98,29 @@ def test_agents_generate_valid_actions(agent_class, market_class):
 	next_state, reward, done, info = marketplace.step(action)
 	assert isinstance(reward, float)
 	assert isinstance(done, bool)
-	assert isinstance(info, dict)
+	assert isinstance(info, MetricsInfo)
 	critic_output = agent.critic_net(torch.from_numpy(next_state).to(agent.device))
 	assert isinstance(critic_output.to('cpu').item(), float)
+
+
+@pytest.mark.parametrize(
+	'agent_class, market_class',
+	ut.cartesian_product(agent_initialization_testcases + [actorcritic_agent.ContinuousActorCriticAgentEstimatingStd], marketplace_classes)
+)
+@pytest.mark.parametrize('verbose', [False, True])
+def test_policy_batch_generates_one_valid_action_per_observation(agent_class, market_class, verbose):
+	marketplace = market_class(config=config_market)
+	agent = agent_class(marketplace=marketplace, config_market=config_market, config_rl=config_rl)
+	observations = np.array([marketplace.observation_space.sample() for _ in range(5)])
+	if verbose:
+		raw_actions, net_outputs, v_estimates = agent.policy_batch(observations, verbose=True, raw_action=True)
+		assert len(net_outputs) == len(v_estimates) == 5
+	else:
+		raw_actions = agent.policy_batch(observations, raw_action=True)
+	assert len(raw_actions) == 5
+	single_raw_action = agent.policy(observations[0], raw_action=True)
+	assert np.shape(raw_actions[0]) == np.shape(single_raw_action)
+	for raw_action in raw_actions:
+		assert marketplace.action_space.contains(agent.agent_output_to_market_form(raw_action))
+	for action in agent.policy_batch(observations):
+		assert marketplace.action_space.contains(tuple(action) if isinstance(action, np.ndarray) and action.ndim == 1 else action)
@@ -1,4 +1,7 @@
+import os
+
 import pytest
+import torch
 from attrdict import AttrDict
 
 import recommerce.market.circular.circular_sim_market as circular_market
@@ -37,3 +40,27 @@ def test_training_configurations(market_class, agent_class, verbose):
 		verbose=verbose,
 		number_of_training_steps=120,
 		total_envs=64)
+
+
+@pytest.mark.training
+@pytest.mark.slow
+@pytest.mark.parametrize('agent_class', [
+	actorcritic_agent.DiscreteActorCriticAgent,
+	actorcritic_agent.ContinuousActorCriticAgentEstimatingStd
+])
+def test_resumed_training_matches_uninterrupted_training(agent_class):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('actor_critic_config', agent_class)
+	config_rl.batch_size = 8
+	trainers = [ActorCriticTrainer(
+		circular_market.CircularEconomyRebuyPriceMonopoly, agent_class, config_market, config_rl, random_generator=7) for _ in range(2)]
+	trainers[0].train_agent(number_of_training_steps=60, total_envs=16, number_of_workers=1, checkpoint_interval=35)
+	checkpoint_path = os.path.join(trainers[0].callback.save_path, ActorCriticTrainer.checkpoint_file)
+	trainers[1].train_agent(number_of_training_steps=60, total_envs=16, number_of_workers=1, resume_from=checkpoint_path)
+
+	for network in ['actor_net', 'critic_net', 'critic_tgt_net']:
+		for parameter, resumed_parameter in zip(getattr(trainers[0].callback.model, network).parameters(),
+				getattr(trainers[1].callback.model, network).parameters()):
+			assert torch.equal(parameter, resumed_parameter)
+	assert trainers[1].callback.watcher.all_dicts == trainers[0].callback.watcher.all_dicts
+	assert trainers[1].callback.num_timesteps == trainers[0].callback.num_timesteps == 60 * 8
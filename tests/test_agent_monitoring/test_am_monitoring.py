@@ -44,6 +44,22 @@ def test_run_marketplace():
 		assert 1 == len(analysis_results['profits/all'])
 
 
+def test_run_marketplace_separate_markets_start_identically():
+	monitor.configurator.setup_monitoring(
+		separate_markets=True,
+		episodes=5,
+		plot_interval=5,
+		agents=[(FixedPriceCEAgent, [(5, 2)]), (FixedPriceCEAgent, [(5, 2)])]
+		)
+	with patch('recommerce.monitoring.agent_monitoring.am_evaluation.plt'), \
+		patch('recommerce.monitoring.agent_monitoring.am_configuration.os.makedirs'), \
+		patch('recommerce.monitoring.agent_monitoring.am_configuration.os.path.exists') as exists_mock:
+		exists_mock.return_value = True
+		first_results, second_results = monitor.run_marketplace()
+		# both agents play the same policy on markets restored from the same state, so they see the same customers
+		assert first_results == second_results
+
+
 def test_run_monitoring_session():
 	monitor.configurator.setup_monitoring(episodes=10, plot_interval=10, config_market=config_market)
 	with patch('recommerce.monitoring.agent_monitoring.am_evaluation.plt'), \
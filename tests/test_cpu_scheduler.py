@@ -0,0 +1,64 @@
+import os
+
+import pytest
+import torch
+
+from recommerce.rl.cpu_scheduler import CpuScheduler, assign_cpus, get_available_cpus
+
+cpus = list(range(8))
+
+
+@pytest.mark.parametrize('number_of_slots, cpus_per_job, expected_core_sets', [
+	(None, None, [[cpu] for cpu in cpus]),
+	(3, None, [[0, 1], [2, 3], [4, 5]]),
+	(None, 3, [[0, 1, 2], [3, 4, 5]]),
+	(2, 4, [[0, 1, 2, 3], [4, 5, 6, 7]]),
+	(3, 4, [[0, 1, 2, 3], [4, 5, 6, 7], [0, 1, 2, 3]]),
+	(16, None, [[cpu % 8] for cpu in range(16)]),
+	(None, 16, [[cpu % 8 for cpu in range(16)]])
+])
+def test_core_sets(number_of_slots, cpus_per_job, expected_core_sets):
+	assert CpuScheduler(number_of_slots, cpus_per_job, cpus).core_sets == expected_core_sets
+
+
+def test_acquire_and_release():
+	scheduler = CpuScheduler(2, cpus=cpus)
+	first_slot = scheduler.acquire()
+	second_slot = scheduler.acquire()
+	assert {first_slot, second_slot} == {0, 1}
+	assert not scheduler.has_free_slot()
+	with pytest.raises(AssertionError) as assertion_message:
+		scheduler.acquire()
+	assert 'all slots are taken' in str(assertion_message.value)
+
+	scheduler.release(first_slot)
+	assert scheduler.has_free_slot() and scheduler.acquire() == first_slot
+	scheduler.release(second_slot)
+	with pytest.raises(AssertionError) as assertion_message:
+		scheduler.release(second_slot)
+	assert 'the slot is not taken' in str(assertion_message.value)
+
+
+@pytest.mark.parametrize('number_of_slots, cpus_per_job, expected_message', [
+	(0, None, 'number_of_slots must be a positive integer'),
+	(2, 0, 'cpus_per_job must be a positive integer'),
+	(2.5, 1, 'number_of_slots must be a positive integer')
+])
+def test_invalid_parameters(number_of_slots, cpus_per_job, expected_message):
+	with pytest.raises(AssertionError) as assertion_message:
+		CpuScheduler(number_of_slots, cpus_per_job, cpus)
+	assert expected_message in str(assertion_message.value)
+
+
+def test_assign_cpus():
+	available_cpus = get_available_cpus()
+	assert 0 < len(available_cpus) <= os.cpu_count()
+	number_of_threads = torch.get_num_threads()
+	try:
+		assign_cpus(available_cpus[:1])
+		assert torch.get_num_threads() == 1
+		assert get_available_cpus() == available_cpus[:1]
+	finally:
+		assign_cpus(available_cpus)
+		torch.set_num_threads(number_of_threads)
+	assert get_available_cpus() == available_cpus
@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 from attrdict import AttrDict
 
+import recommerce.configuration.utils as ut
 import recommerce.market.circular.circular_sim_market as circular_market
 import recommerce.market.customer as customer
 import recommerce.market.linear.linear_sim_market as linear_market
@@ -22,18 +23,18 @@ def test_customer_parent_class():
 
 # the following list contains invalid parameters for generate_purchase_probabilities_from_offer and the expected error messages
 generate_purchase_probabilities_from_offer_testcases = [
-	(CustomerLinear, [], [[12], [15]], [3, 5], 'common_state must be a np.ndarray'),
-	(CustomerLinear, np.array([]), ([12], [15]), [3, 5], 'vendor_specific_state must be a list'),
-	(CustomerLinear, np.array([]), [[12], [15]], (3, 5), 'vendor_actions must be a list'),
-	(CustomerLinear, np.array([]), [[12]], [3, 5], 'they must have the same length'),
-	(CustomerLinear, np.array([]), [[12], [15]], [3], 'they must have the same length'),
-	(CustomerLinear, np.array([]), [], [], 'there must be at least one vendor'),
-	(CustomerCircular, [], [[17], [23]], [[3, 6], [4, 7]], 'common_state must be a np.ndarray'),
-	(CustomerLinear, np.array([]), ([17], [23]), [[3, 6], [4, 7]], 'vendor_specific_state must be a list'),
-	(CustomerCircular, np.array([]), [[17], [23]], ([3, 6], [4, 7]), 'vendor_actions must be a list'),
-	(CustomerCircular, np.array([]), [[17]], [[3, 6], [4, 7]], 'they must have the same length'),
-	(CustomerCircular, np.array([]), [[17], [23]], [[3, 6]], 'they must have the same length'),
-	(CustomerCircular, np.array([]), [], [], 'there must be at least one vendor'),
+	(CustomerLinear, [], np.array([[12], [15]]), np.array([[3], [5]]), 'common_state must be a np.ndarray'),
+	(CustomerLinear, np.array([]), [[12], [15]], np.array([[3], [5]]), 'vendor_specific_state must be a np.ndarray'),
+	(CustomerLinear, np.array([]), np.array([[12], [15]]), [3, 5], 'vendor_actions must be a np.ndarray'),
+	(CustomerLinear, np.array([]), np.array([[12]]), np.array([[3], [5]]), 'they must have the same length'),
+	(CustomerLinear, np.array([]), np.array([[12], [15]]), np.array([[3]]), 'they must have the same length'),
+	(CustomerLinear, np.array([]), np.empty((0, 1)), np.empty((0, 1)), 'there must be at least one vendor'),
+	(CustomerCircular, [], np.array([[17], [23]]), np.array([[3, 6], [4, 7]]), 'common_state must be a np.ndarray'),
+	(CustomerCircular, np.array([]), [[17], [23]], np.array([[3, 6], [4, 7]]), 'vendor_specific_state must be a np.ndarray'),
+	(CustomerCircular, np.array([]), np.array([[17], [23]]), [[3, 6], [4, 7]], 'vendor_actions must be a np.ndarray'),
+	(CustomerCircular, np.array([]), np.array([[17]]), np.array([[3, 6], [4, 7]]), 'they must have the same length'),
+	(CustomerCircular, np.array([]), np.array([[17], [23]]), np.array([[3, 6]]), 'they must have the same length'),
+	(CustomerCircular, np.array([]), np.empty((0, 1)), np.empty((0, 2)), 'there must be at least one vendor'),
 ]
 
 
@@ -64,14 +65,14 @@ def test_customer_action_range(customer, market):
 
 
 def test_linear_higher_price_lower_purchase_probability():
-	common_state, vendor_specific_state, vendor_actions = np.array([]), [[12], [12]], [3, 5]
+	common_state, vendor_specific_state, vendor_actions = np.array([]), np.array([[12], [12]]), np.array([[3], [5]])
 	probability_distribution = CustomerLinear.generate_purchase_probabilities_from_offer(
 		CustomerLinear, common_state, vendor_specific_state, vendor_actions)
 	assert probability_distribution[1] > probability_distribution[2]
 
 
 def test_linear_higher_quality_higher_purchase_probability():
-	common_state, vendor_specific_state, vendor_actions = np.array([]), [[13], [12]], [3, 3]
+	common_state, vendor_specific_state, vendor_actions = np.array([]), np.array([[13], [12]]), np.array([[3], [3]])
 	probability_distribution = CustomerLinear.generate_purchase_probabilities_from_offer(
 		CustomerLinear, common_state, vendor_specific_state, vendor_actions)
 	assert probability_distribution[1] > probability_distribution[2]
@@ -79,17 +80,17 @@ def test_linear_higher_quality_higher_purchase_probability():
 
 def test_equal_ratio_equal_purchase_probability():
 	# In the following line: [3, 1] means prices [4, 2]
-	common_state, vendor_specific_state, vendor_actions = np.array([]), [[16], [8]], [3, 1]
+	common_state, vendor_specific_state, vendor_actions = np.array([]), np.array([[16], [8]]), np.array([[3], [1]])
 	probability_distribution = CustomerLinear.generate_purchase_probabilities_from_offer(
 		CustomerLinear, common_state, vendor_specific_state, vendor_actions)
 	assert probability_distribution[1] == probability_distribution[2]
 
 
 def test_linear_lower_overall_price_lower_nothing_probability():
-	common_state1, vendor_specific_state1, vendor_actions1 = np.array([]), [[15], [15]], [3, 3]
+	common_state1, vendor_specific_state1, vendor_actions1 = np.array([]), np.array([[15], [15]]), np.array([[3], [3]])
 	probability_distribution1 = CustomerLinear.generate_purchase_probabilities_from_offer(
 		CustomerLinear, common_state1, vendor_specific_state1, vendor_actions1)
-	common_state2, vendor_specific_state2, vendor_actions2 = np.array([]), [[15], [15]], [4, 4]
+	common_state2, vendor_specific_state2, vendor_actions2 = np.array([]), np.array([[15], [15]]), np.array([[4], [4]])
 	probability_distribution2 = CustomerLinear.generate_purchase_probabilities_from_offer(
 		CustomerLinear, common_state2, vendor_specific_state2, vendor_actions2)
 	print(probability_distribution1)
@@ -100,13 +101,47 @@ def test_linear_lower_overall_price_lower_nothing_probability():
 
 
 def test_circular_higher_price_lower_purchase_probability():
-	common_state, vendor_specific_state, vendor_actions = np.array([]), [[17], [23]], [[3, 6], [4, 5]]
+	common_state, vendor_specific_state, vendor_actions = np.array([]), np.array([[17], [23]]), np.array([[3, 6], [4, 5]])
 	probability_distribution = CustomerCircular.generate_purchase_probabilities_from_offer(
 		CustomerCircular, common_state, vendor_specific_state, vendor_actions)
 	assert probability_distribution[1] > probability_distribution[3]
 	assert probability_distribution[2] < probability_distribution[4]
 
 
+def test_circular_preference_table_matches_direct_computation():
+	customer_with_table = CustomerCircular(config_market.max_price)
+	vendor_specific_state = np.array([[17], [23]])
+	for price_refurbished, price_new in ut.cartesian_product(list(range(config_market.max_price)), list(range(config_market.max_price))):
+		vendor_actions = np.array([[price_refurbished, price_new], [price_new, price_refurbished]])
+		assert np.allclose(
+			customer_with_table.generate_purchase_probabilities_from_offer(np.array([]), vendor_specific_state, vendor_actions),
+			CustomerCircular().generate_purchase_probabilities_from_offer(np.array([]), vendor_specific_state, vendor_actions))
+
+
+def test_linear_ratio_table_matches_direct_computation():
+	customer_with_table = CustomerLinear(config_market.max_price, config_market.max_quality)
+	for quality in range(1, config_market.max_quality + 1):
+		vendor_specific_state = np.array([[quality], [config_market.max_quality + 1 - quality]])
+		for price in range(config_market.max_price):
+			vendor_actions = np.array([[price], [config_market.max_price - 1 - price]])
+			assert np.allclose(
+				customer_with_table.generate_purchase_probabilities_from_offer(np.array([]), vendor_specific_state, vendor_actions),
+				CustomerLinear().generate_purchase_probabilities_from_offer(np.array([]), vendor_specific_state, vendor_actions))
+
+
+def test_preference_tables_are_not_used_for_continuous_actions():
+	vendor_specific_state, vendor_actions = np.array([[17], [23]]), np.array([[3.5, 6.25], [4.0, 5.5]], dtype=np.float32)
+	assert np.allclose(
+		CustomerCircular(config_market.max_price).generate_purchase_probabilities_from_offer(np.array([]), vendor_specific_state, vendor_actions),
+		CustomerCircular().generate_purchase_probabilities_from_offer(np.array([]), vendor_specific_state, vendor_actions))
+
+
+def test_linear_customer_needs_price_and_quality_bound():
+	with pytest.raises(AssertionError) as assertion_message:
+		CustomerLinear(config_market.max_price)
+	assert 'max_price must be given if and only if max_quality is given' in str(assertion_message.value)
+
+
 def random_offer(marketplace: SimMarket):
 	"""
 	Helper function that creates a random offer (state that includes the agent's price) to test customer behaviour.
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import utils_tests as ut_t
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+import recommerce.market.linear.linear_sim_market as linear_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.metrics import MetricsInfo
+from recommerce.rl.environment_pool import EnvironmentPool, create_marketplace_factories
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+
+
+def test_factories_create_independent_reproducible_copies():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	factories = create_marketplace_factories(marketplace, 3, random_generator=5)
+	assert len(factories) == 3
+	first_copies = [factory() for factory in factories]
+	second_copies = [factory() for factory in factories]
+	assert all(copy is not marketplace and copy.competitors[0] is not marketplace.competitors[0] for copy in first_copies)
+	action = ut_t.create_mock_action(circular_market.CircularEconomyRebuyPriceDuopoly)
+	first_infos = [copy.step(action)[3].to_dict() for copy in first_copies]
+	second_infos = [copy.step(action)[3].to_dict() for copy in second_copies]
+	assert first_infos == second_infos
+	assert first_infos[0] != first_infos[1]
+
+
+def test_invalid_number_of_envs():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	with pytest.raises(AssertionError) as assertion_message:
+		create_marketplace_factories(marketplace, 0)
+	assert 'number_of_envs must be a positive integer' in str(assertion_message.value)
+
+
+@pytest.mark.parametrize('market_class', [circular_market.CircularEconomyRebuyPriceDuopoly, linear_market.LinearEconomyMonopoly])
+def test_pool_steps_subsets_like_local_copies(market_class):
+	marketplace = market_class(config=config_market)
+	factories = create_marketplace_factories(marketplace, 7, random_generator=2)
+	local_copies = [factory() for factory in factories]
+	pool = EnvironmentPool(factories, number_of_workers=3, start_method='fork')
+	try:
+		assert pool.number_of_envs == 7
+		assert np.array_equal(pool.get_observations(), np.array([local_copy._observation() for local_copy in local_copies]))
+		random_generator = np.random.default_rng(4)
+		for _ in range(2 * config_market.episode_length):
+			env_indices = np.sort(random_generator.choice(7, 4, replace=False))
+			actions = [marketplace.action_space.sample() for _ in env_indices]
+			next_observations, rewards, dones, infos = pool.step(env_indices, actions)
+			for batch_index, env_index in enumerate(env_indices):
+				observation, reward, done, info = local_copies[env_index].step(actions[batch_index])
+				assert np.array_equal(next_observations[batch_index], observation)
+				assert rewards[batch_index] == reward
+				assert dones[batch_index] == done
+				assert isinstance(infos[batch_index], MetricsInfo)
+				assert np.array_equal(infos[batch_index].row, info.row)
+				if done:
+					local_copies[env_index].reset()
+				assert np.array_equal(pool.get_observations(env_index)[0], local_copies[env_index]._observation())
+	finally:
+		pool.close()
+	assert pool.closed
+
+
+def test_pool_forwards_commands_in_the_order_of_the_indices():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	pool = EnvironmentPool(create_marketplace_factories(marketplace, 5), number_of_workers=2, start_method='fork')
+	try:
+		pool.set_attr('step_counter', 3, env_indices=[4, 0])
+		assert pool.get_attr('step_counter', env_indices=[4, 1, 0]) == [3, 0, 3]
+		assert pool.env_method('get_observations_dimension', env_indices=[2, 3]) == [marketplace.get_observations_dimension()] * 2
+		assert pool.seed([8, 9], env_indices=[3, 1]) == [[8], [9]]
+		assert pool.reset(env_indices=[1, 4]).shape == (2, marketplace.get_observations_dimension())
+	finally:
+		pool.close()
+
+
+@pytest.mark.parametrize('number_of_workers', [0, 6, 2.0])
+def test_invalid_number_of_workers(number_of_workers):
+	marketplace = circular_market.CircularEconomyRebuyPriceMonopoly(config=config_market)
+	with pytest.raises(AssertionError) as assertion_message:
+		EnvironmentPool(create_marketplace_factories(marketplace, 5), number_of_workers=number_of_workers, start_method='fork')
+	assert 'number_of_workers must be a positive integer not greater than the number of environments' in str(assertion_message.value)
@@ -0,0 +1,187 @@
+import numpy as np
+import pytest
+
+import recommerce.market.circular.circular_sim_market as circular_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.rl.q_learning.experience_buffer import ExperienceBuffer, MemmapExperienceBuffer, PrioritizedExperienceBuffer
+from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
+
+
+def create_experience(index):
+	observation = np.full(3, index, dtype=np.float32)
+	return QLearningAgent.Experience(observation, index, float(index), index % 2 == 0, observation + 1)
+
+
+def test_ring_buffer_overwrites_oldest_experiences():
+	buffer = ExperienceBuffer(5)
+	assert len(buffer) == 0
+	for index in range(8):
+		buffer.append(create_experience(index))
+	assert len(buffer) == 5
+	assert sorted(buffer.actions.tolist()) == [3, 4, 5, 6, 7]
+
+
+def test_sample_returns_consistent_experiences():
+	buffer = ExperienceBuffer(50, random_generator=3)
+	for index in range(20):
+		buffer.append(create_experience(index))
+	states, actions, rewards, dones, next_states = buffer.sample(10)
+	assert states.shape == next_states.shape == (10, 3)
+	assert states.dtype == next_states.dtype == rewards.dtype == np.float32
+	assert actions.dtype == np.int64 and dones.dtype == np.uint8
+	assert len(set(actions.tolist())) == 10
+	assert np.array_equal(states[:, 0], actions) and np.array_equal(next_states[:, 0], actions + 1)
+	assert np.array_equal(rewards, actions) and np.array_equal(dones, actions % 2 == 0)
+
+
+def test_sample_is_reproducible():
+	samples = []
+	for _ in range(2):
+		buffer = ExperienceBuffer(50, random_generator=3)
+		for index in range(20):
+			buffer.append(create_experience(index))
+		samples.append(buffer.sample(10)[1])
+	assert np.array_equal(*samples)
+
+
+def test_sample_more_than_stored():
+	buffer = ExperienceBuffer(50)
+	buffer.append(create_experience(0))
+	with pytest.raises(ValueError):
+		buffer.sample(2)
+
+
+def test_invalid_capacity():
+	with pytest.raises(AssertionError) as assertion_message:
+		ExperienceBuffer(0)
+	assert 'capacity must be a positive integer' in str(assertion_message.value)
+
+
+def create_prioritized_buffer(capacity, number_of_experiences, **kwargs):
+	buffer = PrioritizedExperienceBuffer(capacity, random_generator=5, **kwargs)
+	for index in range(number_of_experiences):
+		buffer.append(create_experience(index))
+	return buffer
+
+
+@pytest.mark.parametrize('capacity', [1, 7, 8, 100])
+def test_sum_tree_sums_priorities(capacity):
+	buffer = create_prioritized_buffer(capacity, capacity)
+	buffer.update_priorities(np.arange(capacity), np.arange(capacity) - 2.5)
+	priorities = (np.abs(np.arange(capacity) - 2.5) + buffer.priority_offset) ** buffer.alpha
+	assert np.allclose(buffer.sum_tree[buffer.tree_capacity:buffer.tree_capacity + capacity], priorities)
+	assert np.isclose(buffer.sum_tree[1], priorities.sum())
+	for node in range(1, buffer.tree_capacity):
+		assert np.isclose(buffer.sum_tree[node], buffer.sum_tree[2 * node] + buffer.sum_tree[2 * node + 1])
+
+
+def test_prioritized_sampling_follows_priorities():
+	buffer = create_prioritized_buffer(10, 10, alpha=1)
+	buffer.update_priorities(np.arange(10), np.array([0, 0, 0, 0, 0, 0, 0, 0, 1, 3], dtype=np.float32))
+	batch, indices, weights = buffer.sample_with_weights(1000)
+	assert set(indices.tolist()) <= {8, 9}
+	assert 0.7 < np.mean(indices == 9) < 0.8
+	assert np.array_equal(batch[1], indices)
+	assert np.isclose(weights.max(), 1) and np.all(weights[indices == 9] < weights[indices == 8].min())
+
+
+def test_new_experiences_get_maximum_priority():
+	buffer = create_prioritized_buffer(10, 3)
+	buffer.update_priorities(np.array([0, 1]), np.array([4.0, 0.5]))
+	buffer.append(create_experience(3))
+	assert buffer.sum_tree[buffer.tree_capacity + 3] == buffer.sum_tree[buffer.tree_capacity]
+
+
+def test_beta_is_annealed():
+	buffer = create_prioritized_buffer(10, 0, beta_start=0.4, beta_annealing_frames=20)
+	assert buffer.beta == 0.4
+	for index in range(10):
+		buffer.append(create_experience(index))
+	assert np.isclose(buffer.beta, 0.7)
+	for index in range(20):
+		buffer.append(create_experience(index))
+	assert buffer.beta == 1
+
+
+@pytest.mark.parametrize('prioritized_replay', [False, True])
+def test_q_learning_agent_trains_on_replay_buffer(prioritized_replay):
+	config_market = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	config_rl.prioritized_replay = prioritized_replay
+	marketplace = circular_market.CircularEconomyRebuyPriceMonopoly(config=config_market)
+	agent = QLearningAgent(config_market, config_rl, marketplace, random_generator=1)
+	assert isinstance(agent.buffer, PrioritizedExperienceBuffer) == prioritized_replay
+	observation = marketplace.reset()
+	for _ in range(config_rl.batch_size):
+		action = agent.policy(observation, epsilon=1)
+		observation, reward, is_done, _ = marketplace.step(action)
+		agent.set_feedback(reward, is_done, observation)
+	loss, selected_q_values = agent.train_batch()
+	assert np.isfinite(loss) and np.isfinite(selected_q_values)
+	if prioritized_replay:
+		assert not np.allclose(agent.buffer.sum_tree[agent.buffer.tree_capacity:][:config_rl.batch_size], 1)
+
+
+def test_memmap_buffer_matches_buffer_in_memory(tmp_path):
+	buffer = ExperienceBuffer(20, random_generator=2)
+	memmap_buffer = MemmapExperienceBuffer(20, str(tmp_path), random_generator=2, hot_segment_size=3)
+	for index in range(27):
+		buffer.append(create_experience(index))
+		memmap_buffer.append(create_experience(index))
+		assert len(buffer) == len(memmap_buffer)
+		if index >= 4:
+			for field, memmap_field in zip(buffer.sample(4), memmap_buffer.sample(4)):
+				assert np.array_equal(field, memmap_field)
+	assert isinstance(memmap_buffer.states, np.memmap)
+	assert memmap_buffer.hot_segment_length == 0
+	memmap_buffer.append(create_experience(27))
+	assert memmap_buffer.hot_segment_length == 1 and memmap_buffer.actions[7] == 7
+	assert 27 in memmap_buffer._get_batch(np.array([7]))[1]
+
+
+def test_memmap_buffer_can_be_reopened(tmp_path):
+	memmap_buffer = MemmapExperienceBuffer(20, str(tmp_path), hot_segment_size=8)
+	for index in range(25):
+		memmap_buffer.append(create_experience(index))
+	memmap_buffer.flush()
+	reopened_buffer = MemmapExperienceBuffer(20, str(tmp_path), hot_segment_size=8)
+	assert len(reopened_buffer) == 20 and reopened_buffer.position == 5
+	assert sorted(reopened_buffer.sample(20)[1].tolist()) == list(range(5, 25))
+	reopened_buffer.append(create_experience(25))
+	reopened_buffer.flush()
+	assert reopened_buffer.actions[5] == 25
+	with pytest.raises(AssertionError) as assertion_message:
+		MemmapExperienceBuffer(30, str(tmp_path))
+	assert 'has the capacity 20' in str(assertion_message.value)
+
+
+@pytest.mark.parametrize('buffer_class', [ExperienceBuffer, PrioritizedExperienceBuffer])
+def test_state_round_trip(buffer_class):
+	buffer = buffer_class(20, random_generator=3)
+	assert buffer.get_state()['arrays'] is None
+	for index in range(14):
+		buffer.append(create_experience(index))
+	state = buffer.get_state()
+	restored_buffer = buffer_class(20, random_generator=3)
+	restored_buffer.set_state(state)
+	for index in range(14, 30):
+		buffer.append(create_experience(index))
+		restored_buffer.append(create_experience(index))
+	assert len(restored_buffer) == len(buffer) == 20 and restored_buffer.position == buffer.position
+	for field, restored_field in zip(buffer.sample(8), restored_buffer.sample(8)):
+		assert np.array_equal(field, restored_field)
+	if buffer_class is PrioritizedExperienceBuffer:
+		assert np.array_equal(restored_buffer.sum_tree, buffer.sum_tree) and restored_buffer.appended_frames == 30
+
+
+def test_memmap_buffer_state_rewinds_the_position(tmp_path):
+	memmap_buffer = MemmapExperienceBuffer(20, str(tmp_path), hot_segment_size=8)
+	for index in range(10):
+		memmap_buffer.append(create_experience(index))
+	state = memmap_buffer.get_state()
+	assert state == {'position': 10, 'size': 10}
+	for index in range(10, 13):
+		memmap_buffer.append(create_experience(index))
+	reopened_buffer = MemmapExperienceBuffer(20, str(tmp_path), hot_segment_size=8)
+	reopened_buffer.set_state(state)
+	assert len(reopened_buffer) == 10 and sorted(reopened_buffer.sample(10)[1].tolist()) == list(range(10))
@@ -25,6 +25,7 @@ def test_reading_file_values():
 	assert config.epsilon_decay_last_frame == 400
 	assert config.epsilon_start == 1.0
 	assert config.epsilon_final == 0.1
+	assert config.prioritized_replay is False
 
 
 # The following variables are input mock-json strings for the test_invalid_values test
@@ -0,0 +1,119 @@
+import csv
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+from attrdict import AttrDict
+
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.circular.circular_sim_market import CircularEconomyRebuyPriceMonopoly
+from recommerce.rl.hyperparameter_sweep import HyperparameterSweep, train_stable_baselines_agent
+from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
+from recommerce.rl.q_learning.q_learning_training import QLearningTrainer
+from recommerce.rl.stable_baselines.sb_ppo import StableBaselinesPPO
+
+
+class ReturnsWatcher():
+	def __init__(self):
+		self.returns = []
+
+	def get_average_dict(self) -> dict:
+		return {'profits/all': {'vendor_0': self.returns[-1]}}
+
+	def get_progress_values_of_property(self, property_name, vendor) -> list:
+		return self.returns
+
+
+def train_with_constant_quality(config_rl, training_steps, name, episode_hook):
+	# every episode has 10 steps and the return grows with the quality of the config
+	callback = SimpleNamespace(num_timesteps=0, watcher=ReturnsWatcher())
+	for num_timesteps in range(10, training_steps + 1, 10):
+		callback.num_timesteps = num_timesteps
+		callback.watcher.returns.append(config_rl.quality * num_timesteps)
+		if not episode_hook(callback):
+			break
+	return callback.watcher
+
+
+def create_sweep(number_of_configs=9, **kwargs):
+	configs = [AttrDict(quality=quality) for quality in range(number_of_configs)]
+	descriptions = [f'quality_{quality}' for quality in range(number_of_configs)]
+	return HyperparameterSweep(train_with_constant_quality, configs, descriptions, training_steps=90, start_method='fork', **kwargs)
+
+
+@pytest.mark.parametrize('number_of_workers', [1, 2, 9])
+def test_successive_halving(number_of_workers):
+	sweep = create_sweep(number_of_workers=number_of_workers)
+	assert sweep.budgets == [10, 30, 90]
+	results = sweep.run()
+	assert [result['training_steps'] for result in results] == [10] * 6 + [30, 30, 90]
+	assert results[8]['rung_returns'] == [80, 240, 720]
+	assert results[7]['rung_returns'] == [70, 210]
+	assert results[0]['rung_returns'] == [0]
+	assert results[8]['returns'] == [8 * steps for steps in range(10, 91, 10)]
+	assert results[3]['returns'] == [30]
+
+
+def test_single_rung_trains_all_configs():
+	results = create_sweep(number_of_configs=3, number_of_rungs=1, number_of_workers=2).run()
+	assert all(result['training_steps'] == 90 and len(result['returns']) == 9 for result in results)
+
+
+def test_save_results():
+	sweep = create_sweep(number_of_configs=4, number_of_rungs=2, reduction_factor=2)
+	path = sweep.save_results(sweep.run(), 'test_sweep')
+	with open(path) as table:
+		rows = list(csv.reader(table))
+	assert rows[0] == ['description', 'training_steps', 'mean_return_rung_1', 'mean_return_rung_2']
+	assert [row[0] for row in rows[1:]] == ['quality_3', 'quality_2', 'quality_1', 'quality_0']
+	# the rung ends with the first episode after 45 steps
+	assert rows[1][1:] == ['90', '150', '270']
+	assert rows[3][1:] == ['50', '50']
+
+
+@pytest.mark.parametrize('kwargs, expected_message', [
+	({'number_of_rungs': 0}, 'number_of_rungs must be a positive integer'),
+	({'reduction_factor': 1}, 'reduction_factor must be an integer greater 1'),
+	({'number_of_workers': 0}, 'number_of_workers must be a positive integer'),
+	({'number_of_rungs': 6}, 'the first rung would be empty')
+])
+def test_invalid_parameters(kwargs, expected_message):
+	with pytest.raises(AssertionError) as assertion_message:
+		create_sweep(**kwargs)
+	assert expected_message in str(assertion_message.value)
+
+
+def test_descriptions_must_be_unique():
+	with pytest.raises(AssertionError) as assertion_message:
+		HyperparameterSweep(train_with_constant_quality, [AttrDict(quality=1)] * 2, ['same', 'same'], 90)
+	assert 'the descriptions must be unique' in str(assertion_message.value)
+
+
+@pytest.mark.parametrize('continue_training', [True, False])
+def test_stopped_trainings_are_not_analyzed(continue_training):
+	config_market = HyperparameterConfigLoader.load('market_config', CircularEconomyRebuyPriceMonopoly)
+	trainer = QLearningTrainer(CircularEconomyRebuyPriceMonopoly, QLearningAgent, config_market,
+		HyperparameterConfigLoader.load('q_learning_config', QLearningAgent))
+	trainer.initialize_callback(10)
+	callback = trainer.callback
+	callback.episode_hook = lambda callback: continue_training
+	for step in range(5 * config_market.episode_length):
+		result = callback._on_step((step + 1) // config_market.episode_length, {'profits/all': {'vendor_0': 1.0}})
+	callback.model_writer.close()
+	assert result == continue_training
+	assert callback.analyze_after_training == continue_training
+
+
+@pytest.mark.training
+@pytest.mark.slow
+def test_sweep_stable_baselines_agents():
+	config_market = HyperparameterConfigLoader.load('market_config', CircularEconomyRebuyPriceMonopoly)
+	configs = [HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO) for _ in range(3)]
+	for config, learning_rate in zip(configs, [1e-5, 1e-4, 1e-3]):
+		config.learning_rate = learning_rate
+	train_function = partial(train_stable_baselines_agent, CircularEconomyRebuyPriceMonopoly, config_market, StableBaselinesPPO)
+	sweep = HyperparameterSweep(train_function, configs, ['lr_1e-5', 'lr_1e-4', 'lr_1e-3'], 1500, number_of_rungs=2,
+		number_of_workers=2, start_method='fork')
+	results = sweep.run()
+	assert sorted(result['training_steps'] >= 1500 for result in results) == [False, False, True]
+	assert all(len(result['returns']) > 0 for result in results)
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+import utils_tests as ut_t
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+import recommerce.market.linear.linear_sim_market as linear_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.large_oligopoly import LargeOligopoly
+
+large_market_classes = [
+	circular_market.CircularEconomyLargeOligopoly,
+	circular_market.CircularEconomyRebuyPriceLargeOligopoly,
+	linear_market.LinearEconomyLargeOligopoly
+]
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+
+
+def get_other_blocks(market, vendor_view):
+	blocks = market.vendor_actions.astype(np.float32)
+	if market.config.opposite_own_state_visibility:
+		blocks = np.concatenate((blocks, market.vendor_specific_state), axis=1)
+	return np.delete(blocks, vendor_view, axis=0), np.delete(np.arange(market._get_number_of_vendors()), vendor_view)
+
+
+@pytest.mark.parametrize('market_class', large_market_classes)
+@pytest.mark.parametrize('observation_mode', LargeOligopoly.observation_modes)
+def test_steps_with_many_competitors(market_class, observation_mode):
+	market = market_class(config=config_market, number_of_competitors=150, observation_mode=observation_mode)
+	assert len(market.competitors) == 150
+	assert market._get_number_of_vendors() == 151
+	for _ in range(config_market.episode_length):
+		observation, _, is_done, info = market.step(ut_t.create_mock_action(market_class))
+		assert observation.shape == (market.get_observations_dimension(),)
+		assert len(info['profits/all']) == 151
+	assert is_done
+
+
+@pytest.mark.parametrize('market_class', large_market_classes)
+def test_observation_size_is_bounded(market_class):
+	for observation_mode in ['cheapest', 'aggregated']:
+		dimensions = {market_class(config=config_market, number_of_competitors=number_of_competitors,
+			observation_mode=observation_mode).get_observations_dimension() for number_of_competitors in [10, 50, 200]}
+		assert len(dimensions) == 1
+	dimensions = [market_class(config=config_market, number_of_competitors=number_of_competitors,
+		observation_mode='vendors').get_observations_dimension() for number_of_competitors in [10, 50]]
+	assert dimensions[0] < dimensions[1]
+
+
+@pytest.mark.parametrize('market_class', large_market_classes)
+def test_all_customers_are_simulated_in_one_round(market_class):
+	market = market_class(config=config_market, number_of_competitors=50)
+	_, _, _, info = market.step(ut_t.create_mock_action(market_class))
+	purchases = sum(info['customer/purchases'].values()) if 'customer/purchases' in info else \
+		sum(info['customer/purchases_new'].values()) + sum(info['customer/purchases_refurbished'].values())
+	assert purchases + info['customer/buy_nothing'] == config_market.number_of_customers
+
+
+@pytest.mark.parametrize('market_class', large_market_classes)
+def test_cheapest_views(market_class):
+	market = market_class(config=config_market, number_of_competitors=30, observation_mode='cheapest', number_of_visible_competitors=5)
+	market.vendor_actions[:] = np.random.randint(1, config_market.max_price, market.vendor_actions.shape)
+	for vendor_view in [0, 1, 17, 30]:
+		other_blocks, other_vendors = get_other_blocks(market, vendor_view)
+		cheapest = np.argsort(market.vendor_actions[other_vendors, market._ranking_action_column], kind='stable')[:5]
+		observation = market._observation(vendor_view)
+		prefix_size = market._observation_prefix_size
+		assert np.array_equal(observation[:prefix_size], market._flat_state[market._observation_indices[vendor_view, :prefix_size]])
+		assert np.array_equal(observation[prefix_size:], other_blocks[cheapest].ravel())
+	assert market.observation_space.contains(market._observation())
+
+
+@pytest.mark.parametrize('market_class', large_market_classes)
+def test_aggregated_view(market_class):
+	market = market_class(config=config_market, number_of_competitors=40, observation_mode='aggregated')
+	market.vendor_actions[:] = np.random.randint(1, config_market.max_price, market.vendor_actions.shape)
+	observation = market._observation()
+	other_blocks, _ = get_other_blocks(market, 0)
+	summary = observation[market._observation_prefix_size:].reshape(6, -1)
+	assert np.allclose(summary[0], other_blocks.min(axis=0))
+	assert np.allclose(summary[2], np.median(other_blocks, axis=0))
+	assert np.allclose(summary[4], other_blocks.max(axis=0))
+	assert np.allclose(summary[5], other_blocks.mean(axis=0))
+	assert market.observation_space.contains(observation)
+
+
+@pytest.mark.parametrize('market_class, regular_market_class', [
+	(circular_market.CircularEconomyLargeOligopoly, circular_market.CircularEconomyOligopoly),
+	(circular_market.CircularEconomyRebuyPriceLargeOligopoly, circular_market.CircularEconomyRebuyPriceOligopoly),
+	(linear_market.LinearEconomyLargeOligopoly, linear_market.LinearEconomyOligopoly)
+])
+def test_vendors_view_matches_regular_layout(market_class, regular_market_class):
+	market = market_class(config=config_market, number_of_competitors=12, observation_mode='vendors')
+	market.step(ut_t.create_mock_action(market_class))
+	regular_market = regular_market_class(config=config_market, competitors=market.competitors)
+	regular_market.vendor_specific_state[:] = market.vendor_specific_state
+	regular_market.vendor_actions[:] = market.vendor_actions
+	regular_market._set_common_state_array(market._get_common_state_array())
+	assert np.array_equal(market._observation(), regular_market._observation())
+
+
+def test_competitor_list_is_repeated():
+	market = circular_market.CircularEconomyRebuyPriceLargeOligopoly(config=config_market, number_of_competitors=10)
+	regular_competitors = circular_market.CircularEconomyRebuyPriceOligopoly(config=config_market).competitors
+	assert [type(competitor) for competitor in market.competitors] == \
+		[type(regular_competitors[index % len(regular_competitors)]) for index in range(10)]
+
+
+def test_custom_competitors_are_used():
+	competitors = circular_market.CircularEconomyRebuyPriceOligopoly(config=config_market).competitors * 3
+	market = circular_market.CircularEconomyRebuyPriceLargeOligopoly(config=config_market, competitors=competitors, number_of_competitors=100)
+	assert market.competitors == competitors
+
+
+invalid_parameters_testcases = [
+	({'observation_mode': 'raw'}, 'observation_mode must be one of'),
+	({'number_of_competitors': 0}, 'number_of_competitors must be a positive integer'),
+	({'number_of_visible_competitors': 0}, 'number_of_visible_competitors must be a positive integer'),
+	({'number_of_competitors': 3, 'number_of_visible_competitors': 4}, 'number_of_visible_competitors must not exceed')
+]
+
+
+@pytest.mark.parametrize('parameters, expected_message', invalid_parameters_testcases)
+def test_invalid_parameters(parameters, expected_message):
+	with pytest.raises(AssertionError) as assertion_message:
+		circular_market.CircularEconomyRebuyPriceLargeOligopoly(config=config_market, **parameters)
+	assert expected_message in str(assertion_message.value)
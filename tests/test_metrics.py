@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+import recommerce.market.linear.linear_sim_market as linear_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.metrics import MetricsInfo, MetricsSchema
+from recommerce.monitoring.watcher import Watcher
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+
+
+def create_schema() -> MetricsSchema:
+	schema = MetricsSchema(2)
+	schema.add('customer/buy_nothing')
+	schema.add('profits/all', per_vendor=True, is_integer=False)
+	return schema
+
+
+def test_schema_columns():
+	schema = create_schema()
+	assert schema.size == 3
+	assert schema.get_index('customer/buy_nothing') == 0
+	assert schema.get_index('profits/all') == slice(1, 3)
+	assert schema.get_index('profits/all', 1) == 2
+
+
+def test_schema_rejects_duplicates():
+	schema = create_schema()
+	with pytest.raises(AssertionError) as assertion_message:
+		schema.add('profits/all')
+	assert 'already part of the schema' in str(assertion_message.value)
+
+
+def test_schema_global_metric_has_no_vendor():
+	with pytest.raises(AssertionError) as assertion_message:
+		create_schema().get_index('customer/buy_nothing', 0)
+	assert 'is not recorded per vendor' in str(assertion_message.value)
+
+
+def test_info_builds_legacy_dict():
+	info = MetricsInfo(create_schema(), np.array([4.0, 1.5, -2.0]))
+	assert info['customer/buy_nothing'] == 4 and isinstance(info['customer/buy_nothing'], int)
+	assert info['profits/all'] == {'vendor_0': 1.5, 'vendor_1': -2.0}
+	assert info.to_dict() == {'customer/buy_nothing': 4, 'profits/all': {'vendor_0': 1.5, 'vendor_1': -2.0}}
+	with pytest.raises(KeyError):
+		info['not/a_metric']
+
+
+def test_info_extra_keys():
+	info = MetricsInfo(create_schema(), np.array([4.0, 1.5, -2.0]))
+	info['a/reward'] = 1.5
+	assert list(info) == ['customer/buy_nothing', 'profits/all', 'a/reward']
+	assert len(info) == 3
+	del info['a/reward']
+	assert 'a/reward' not in info
+
+
+def test_info_accumulate_does_not_change_other():
+	schema = create_schema()
+	info_1 = MetricsInfo(schema, np.array([4.0, 1.5, -2.0]))
+	info_2 = MetricsInfo(schema, np.array([1.0, 1.0, 1.0]))
+	info_1['a/reward'] = 1.0
+	info_2['a/reward'] = 2.0
+	accumulated = info_1.copy()
+	accumulated.accumulate(info_2)
+	assert accumulated.to_dict() == {'customer/buy_nothing': 5, 'profits/all': {'vendor_0': 2.5, 'vendor_1': -1.0}, 'a/reward': 3.0}
+	assert info_1['customer/buy_nothing'] == 4 and info_1['a/reward'] == 1.0
+
+
+@pytest.mark.parametrize('market_class', [
+	linear_market.LinearEconomyOligopoly,
+	circular_market.CircularEconomyMonopoly,
+	circular_market.CircularEconomyRebuyPriceDuopoly
+])
+def test_watcher_sums_market_infos(market_class):
+	market = market_class(config=config_market)
+	watcher = Watcher(config_market)
+	expected_dict = None
+	for _ in range(config_market.episode_length):
+		_, reward, _, info = market.step(market.action_space.sample())
+		info['a/reward'] = reward
+		step_dict = info.to_dict()
+		expected_dict = step_dict if expected_dict is None else {
+			name: {vendor: value + step_dict[name][vendor] for vendor, value in content.items()} if isinstance(content, dict)
+			else content + step_dict[name] for name, content in expected_dict.items()}
+		watcher.add_info(info)
+	assert len(watcher.all_dicts) == 1
+	assert isinstance(watcher.all_dicts[0], dict)
+	assert watcher.all_dicts[0].keys() == expected_dict.keys()
+	for name, content in expected_dict.items():
+		assert watcher.all_dicts[0][name] == pytest.approx(content), name
+
+
+def test_info_accumulate_across_markets():
+	info_1 = MetricsInfo(create_schema(), np.array([4.0, 1.5, -2.0]))
+	info_1.accumulate(MetricsInfo(create_schema(), np.array([1.0, 1.0, 1.0])))
+	assert info_1['customer/buy_nothing'] == 5
+	other_schema = MetricsSchema(2)
+	other_schema.add('customer/buy_nothing')
+	other_schema.add('profits/all', per_vendor=True)
+	with pytest.raises(AssertionError) as assertion_message:
+		info_1.accumulate(MetricsInfo(other_schema, np.array([1.0, 1.0, 1.0])))
+	assert 'only infos with the same schema can be accumulated' in str(assertion_message.value)
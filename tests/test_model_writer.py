@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+
+import pytest
+import torch
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.rl.model_writer import BackgroundModelWriter
+from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
+from recommerce.rl.q_learning.q_learning_training import QLearningTrainer
+from recommerce.rl.stable_baselines.sb_ppo import StableBaselinesPPO
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+
+
+def test_jobs_are_executed_in_order(tmp_path):
+	writer = BackgroundModelWriter(max_pending_jobs=1)
+	path = os.path.join(tmp_path, 'tmp.txt')
+	renamed_path = os.path.join(tmp_path, 'renamed.txt')
+	executed_in = []
+
+	def write(content):
+		executed_in.append(threading.current_thread())
+		with open(path, 'w') as file:
+			file.write(content)
+
+	writer.submit(write, 'first')
+	writer.submit(os.rename, path, renamed_path)
+	writer.submit(write, 'second')
+	writer.flush()
+	with open(renamed_path) as file:
+		assert file.read() == 'first'
+	assert os.path.exists(path) and threading.current_thread() not in executed_in
+	writer.close()
+	assert writer._thread is None
+
+
+def test_errors_are_raised_in_the_training_thread(tmp_path):
+	writer = BackgroundModelWriter()
+	writer.submit(os.rename, os.path.join(tmp_path, 'missing.dat'), os.path.join(tmp_path, 'renamed.dat'))
+	writer.submit(os.makedirs, os.path.join(tmp_path, 'skipped'))
+	with pytest.raises(RuntimeError) as error:
+		writer.flush()
+	assert 'writing in the background failed' in str(error.value) and isinstance(error.value.__cause__, FileNotFoundError)
+	assert not os.path.exists(os.path.join(tmp_path, 'skipped'))
+	# the writer can be used again after the error was raised
+	writer.submit(os.makedirs, os.path.join(tmp_path, 'written'))
+	writer.close()
+	assert os.path.exists(os.path.join(tmp_path, 'written'))
+
+
+def test_save_model_writes_a_snapshot(tmp_path):
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	agent = QLearningAgent(config_market, config_rl, circular_market.CircularEconomyRebuyPriceMonopoly(config=config_market))
+	expected_parameters = [parameter.detach().clone() for parameter in agent.net.parameters()]
+	writer = BackgroundModelWriter()
+	model_path = os.path.join(tmp_path, 'model.dat')
+	writer.save_model(agent, model_path)
+	with torch.no_grad():
+		for parameter in agent.net.parameters():
+			parameter.add_(1)
+	writer.close()
+	loaded_agent = QLearningAgent(config_market, config_rl, circular_market.CircularEconomyRebuyPriceMonopoly(config=config_market),
+		load_path=model_path)
+	for parameter, expected_parameter in zip(loaded_agent.net.parameters(), expected_parameters):
+		assert torch.equal(parameter, expected_parameter)
+
+
+def test_save_stable_baselines_model(tmp_path):
+	config_rl: AttrDict = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	marketplace = circular_market.CircularEconomyRebuyPriceMonopoly(config=config_market, support_continuous_action_space=True)
+	agent = StableBaselinesPPO(config_market, config_rl, marketplace)
+	writer = BackgroundModelWriter()
+	model_path = os.path.join(tmp_path, 'model.zip')
+	writer.save_model(agent.model, model_path)
+	writer.close()
+	loaded_agent = StableBaselinesPPO(config_market, config_rl, marketplace, load_path=model_path)
+	for parameter, loaded_parameter in zip(agent.model.policy.parameters(), loaded_agent.model.policy.parameters()):
+		assert torch.equal(parameter, loaded_parameter)
+
+
+def test_checkpoint_waits_for_pending_models():
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = QLearningTrainer(circular_market.CircularEconomyRebuyPriceMonopoly, QLearningAgent, config_market, config_rl)
+	trainer.initialize_callback(10)
+	callback = trainer.callback
+	# a slow disk delays the following jobs
+	callback.model_writer.submit(time.sleep, 0.5)
+	callback.model_writer.save_model(callback.model, callback.tmp_parameters)
+	callback.best_mean_interim_reward = 1.0
+	callback.save_parameters(5)
+	callback.model_writer.save_model(callback.model, callback.tmp_parameters)
+	callback.best_mean_interim_reward = 2.0
+
+	callback_state = torch.load(trainer.save_checkpoint({}))['callback']
+	assert len(callback_state['saved_parameter_paths']) == 1
+	for path in callback_state['saved_parameter_paths'] + [callback.tmp_parameters]:
+		assert os.path.exists(path)
+	callback.model_writer.close()
+
+
+def test_invalid_max_pending_jobs():
+	with pytest.raises(AssertionError) as assertion_message:
+		BackgroundModelWriter(0)
+	assert 'max_pending_jobs must be a positive integer' in str(assertion_message.value)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from recommerce.market.owner import OwnerRebuy, OwnerRebuyOld, UniformDistributionOwner
+
+rebuy_owner_classes = [OwnerRebuy, OwnerRebuyOld]
+
+
+@pytest.mark.parametrize('owner_class', rebuy_owner_classes)
+def test_batched_kernel_matches_single_offers(owner_class):
+	vendor_actions = np.random.randint(0, 10, (16, 3, 3))
+	batched_probabilities = owner_class.calculate_return_probabilities(vendor_actions)
+	assert batched_probabilities.shape == (16, 5)
+	for market_actions, probabilities in zip(vendor_actions, batched_probabilities):
+		assert np.allclose(probabilities, owner_class().generate_return_probabilities_from_offer(
+			np.array([]), np.zeros((3, 1), dtype=np.int64), market_actions))
+
+
+@pytest.mark.parametrize('owner_class', rebuy_owner_classes)
+def test_discrete_offers_are_memoized(owner_class):
+	vendor_actions = np.array([[3, 6, 2], [4, 5, 1]])
+	probabilities = owner_class().generate_return_probabilities_from_offer(np.array([]), np.array([[3], [5]]), vendor_actions)
+	assert probabilities is owner_class().generate_return_probabilities_from_offer(np.array([]), np.array([[3], [5]]), vendor_actions.copy())
+	assert not probabilities.flags.writeable
+	assert np.isclose(probabilities.sum(), 1)
+
+
+@pytest.mark.parametrize('owner_class', rebuy_owner_classes)
+def test_continuous_offers_are_calculated(owner_class):
+	vendor_actions = np.array([[3.5, 6.25, 2.0], [4.0, 5.5, 1.5]], dtype=np.float32)
+	probabilities = owner_class().generate_return_probabilities_from_offer(np.array([]), np.array([[3], [5]]), vendor_actions)
+	assert probabilities.flags.writeable
+	assert np.allclose(probabilities, owner_class.calculate_return_probabilities(vendor_actions))
+
+
+def test_uniform_distribution_owner():
+	probabilities = UniformDistributionOwner().generate_return_probabilities_from_offer(
+		np.array([]), np.array([[3], [5]]), np.array([[3, 6], [4, 5]]))
+	assert np.allclose(probabilities, [0.25] * 4)
+	assert not probabilities.flags.writeable
+
+
+@pytest.mark.parametrize('owner_class', rebuy_owner_classes + [UniformDistributionOwner])
+def test_invalid_offers(owner_class):
+	with pytest.raises(AssertionError) as assertion_message:
+		owner_class().generate_return_probabilities_from_offer(np.array([]), np.array([[3]]), np.array([[3, 6, 2], [4, 5, 1]]))
+	assert 'they must have the same length' in str(assertion_message.value)
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+import recommerce.market.circular.circular_vendors as circular_vendors
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.rl.policy_distillation import LookupTableAgent, distill_policy
+from recommerce.rl.rl_vs_rl_training import train_rl_vs_rl
+from recommerce.rl.stable_baselines.sb_ppo import StableBaselinesPPO
+from recommerce.rl.stable_baselines.sb_sac import StableBaselinesSAC
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+
+
+def test_distilled_policy_matches_agent_in_cell_centres():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	agent = circular_vendors.RuleBasedCERebuyAgent(config_market=config_market)
+	lookup_agent = distill_policy(agent, marketplace, number_of_bins=3, chunk_size=100)
+	assert lookup_agent.name == 'RuleBasedCERebuyAgent_distilled'
+	assert isinstance(lookup_agent, circular_vendors.RuleBasedAgent) and not lookup_agent.continuous_action_space
+	assert len(lookup_agent.actions) == np.prod(lookup_agent.table_shape)
+
+	cells = np.arange(len(lookup_agent.actions))
+	centres = lookup_agent.get_cell_centres(cells)
+	assert np.array_equal(lookup_agent.discretize(centres), cells)
+	for centre in centres[::37]:
+		assert lookup_agent.policy(centre) == agent.policy(centre)
+	assert np.array_equal(lookup_agent.policy_batch(centres), agent.policy_batch(centres))
+
+
+def test_discretize_clips_observations():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	lookup_agent = distill_policy(circular_vendors.RuleBasedCERebuyAgent(config_market=config_market), marketplace, number_of_bins=4)
+	low, high = marketplace.observation_space.low, marketplace.observation_space.high
+	cells = lookup_agent.discretize(np.array([low, low - 1, high, high + 1]))
+	assert cells[0] == cells[1] == 0
+	assert cells[2] == cells[3] == len(lookup_agent.actions) - 1
+
+
+def test_distilled_continuous_agent_as_competitor():
+	config_rl: AttrDict = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	tmp_marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True)
+	agent = StableBaselinesPPO(config_market=config_market, config_rl=config_rl, marketplace=tmp_marketplace)
+	lookup_agent = distill_policy(agent, tmp_marketplace, number_of_bins=2)
+	assert lookup_agent.continuous_action_space
+	assert lookup_agent.actions.shape == (np.prod(lookup_agent.table_shape),) + tmp_marketplace.action_space.shape
+
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(
+		config=config_market, support_continuous_action_space=True, competitors=[lookup_agent])
+	marketplace.reset()
+	observation, _, _, _ = marketplace.step(marketplace.action_space.sample())
+	assert marketplace.observation_space.contains(observation)
+
+
+def test_save_and_load(tmp_path):
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	lookup_agent = distill_policy(circular_vendors.RuleBasedCERebuyAgent(config_market=config_market), marketplace, number_of_bins=3)
+	model_path = os.path.join(tmp_path, 'table.npz')
+	lookup_agent.save(model_path)
+	loaded_agent = LookupTableAgent(config_market, load_path=model_path)
+	for field in LookupTableAgent.table_fields:
+		assert np.array_equal(getattr(loaded_agent, field), getattr(lookup_agent, field))
+	observations = np.array([marketplace.observation_space.sample() for _ in range(20)])
+	assert np.array_equal(loaded_agent.policy_batch(observations), lookup_agent.policy_batch(observations))
+
+	with pytest.raises(AssertionError) as assertion_message:
+		lookup_agent.save(os.path.join(tmp_path, 'table.dat'))
+	assert 'the modelname must end in ".npz"' in str(assertion_message.value)
+
+
+def test_invalid_parameters():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	agent = circular_vendors.RuleBasedCERebuyAgent(config_market=config_market)
+	with pytest.raises(AssertionError) as assertion_message:
+		distill_policy(agent, marketplace, number_of_bins=1000)
+	assert 'reduce number_of_bins' in str(assertion_message.value)
+	with pytest.raises(AssertionError) as assertion_message:
+		distill_policy(agent, marketplace, number_of_bins=0)
+	assert 'number_of_bins must be a positive integer' in str(assertion_message.value)
+	with pytest.raises(AssertionError) as assertion_message:
+		LookupTableAgent(config_market)
+	assert 'exactly one of load_path and policy_table must be provided' in str(assertion_message.value)
+
+
+@pytest.mark.training
+@pytest.mark.slow
+def test_rl_vs_rl_with_distilled_competitors():
+	config_rl1: AttrDict = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	config_rl2: AttrDict = HyperparameterConfigLoader.load('sb_sac_config', StableBaselinesSAC)
+	train_rl_vs_rl(config_market, config_rl1, config_rl2, num_switches=2, num_steps_per_switch=230, distillation_bins=2)
@@ -1,10 +1,14 @@
+import os
+
 import pytest
+import torch
 from attrdict import AttrDict
 
 import recommerce.market.circular.circular_sim_market as circular_market
 import recommerce.market.linear.linear_sim_market as linear_market
 import recommerce.rl.q_learning.q_learning_training as q_learning_training
 from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.rl.q_learning.experience_buffer import MemmapExperienceBuffer
 from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
 
 test_scenarios = [
@@ -30,3 +34,127 @@ def test_market_scenario(marketplace_class):
 		config_market=config_market,
 		config_rl=config_rl
 		).train_agent(600)
+
+
+@pytest.mark.training
+@pytest.mark.slow
+def test_training_with_replay_buffer_on_disk():
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = q_learning_training.QLearningTrainer(
+		marketplace_class=circular_market.CircularEconomyRebuyPriceMonopoly,
+		agent_class=QLearningAgent,
+		config_market=config_market,
+		config_rl=config_rl
+		)
+	trainer.train_agent(300, replay_buffer_on_disk=True)
+	buffer = trainer.callback.model.buffer
+	assert isinstance(buffer, MemmapExperienceBuffer) and len(buffer) == 300
+	assert os.path.exists(os.path.join(trainer.callback.save_path, 'replay_buffer', 'experience_buffer.json'))
+
+
+@pytest.mark.training
+@pytest.mark.slow
+@pytest.mark.parametrize('number_of_envs, replay_ratio', [(4, 0.25), (3, 2.0)])
+def test_training_on_several_environments(number_of_envs, replay_ratio):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = q_learning_training.QLearningTrainer(
+		marketplace_class=circular_market.CircularEconomyRebuyPriceDuopoly,
+		agent_class=QLearningAgent,
+		config_market=config_market,
+		config_rl=config_rl
+		)
+	trainer.train_agent(number_of_envs * 2 * config_market.episode_length, number_of_envs=number_of_envs, replay_ratio=replay_ratio)
+	assert trainer.callback.watcher.number_envs == number_of_envs
+	assert len(trainer.callback.watcher.all_dicts) == 2 * number_of_envs
+	assert len(trainer.callback.model.buffer) == min(config_rl.replay_size, number_of_envs * 2 * config_market.episode_length)
+
+
+@pytest.mark.training
+@pytest.mark.slow
+def test_last_frame_does_not_exceed_the_training_steps():
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = q_learning_training.QLearningTrainer(circular_market.CircularEconomyRebuyPriceDuopoly, QLearningAgent, config_market, config_rl)
+	trainer.train_agent(100, number_of_envs=3)
+	assert len(trainer.callback.model.buffer) == 100
+	assert trainer.callback.num_timesteps == 99
+
+
+@pytest.mark.parametrize('parameters, expected_message', [
+	({'number_of_envs': 0}, 'number_of_envs must be a positive integer'),
+	({'replay_ratio': 0}, 'replay_ratio must be positive'),
+	({'checkpoint_interval': 0}, 'checkpoint_interval must be a positive integer')
+])
+def test_invalid_training_parameters(parameters, expected_message):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = q_learning_training.QLearningTrainer(circular_market.CircularEconomyRebuyPriceMonopoly, QLearningAgent, config_market, config_rl)
+	with pytest.raises(AssertionError) as assertion_message:
+		trainer.train_agent(10, **parameters)
+	assert expected_message in str(assertion_message.value)
+
+
+def test_load_checkpoint_with_torch_without_weights_only(monkeypatch):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = q_learning_training.QLearningTrainer(circular_market.CircularEconomyRebuyPriceMonopoly, QLearningAgent, config_market, config_rl)
+	trainer.initialize_callback(10)
+	checkpoint_path = trainer.save_checkpoint({'frame_idx': 3})
+	torch_load = torch.load
+
+	# the signature of torch.load before torch 1.13
+	def load_without_weights_only(f, map_location=None, pickle_module=None, **pickle_load_args):
+		return torch_load(f, map_location=map_location, weights_only=False)
+
+	monkeypatch.setattr(torch, 'load', load_without_weights_only)
+	assert trainer.load_checkpoint(checkpoint_path) == {'frame_idx': 3}
+
+
+@pytest.mark.training
+@pytest.mark.slow
+@pytest.mark.parametrize('number_of_actors', [1, 2])
+def test_training_with_actor_learner_split(number_of_actors):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	trainer = q_learning_training.QLearningTrainer(
+		marketplace_class=circular_market.CircularEconomyRebuyPriceDuopoly,
+		agent_class=QLearningAgent,
+		config_market=config_market,
+		config_rl=config_rl
+		)
+	trainer.train_agent_asynchronously(6 * config_market.episode_length, number_of_actors=number_of_actors, start_method='fork')
+	assert trainer.callback.watcher.number_envs == number_of_actors
+	assert trainer.callback.num_timesteps == 6 * config_market.episode_length - 1
+	assert len(trainer.callback.model.buffer) == min(config_rl.replay_size, 6 * config_market.episode_length)
+	assert len(trainer.callback.watcher.all_dicts) >= 6 - number_of_actors
+
+
+@pytest.mark.training
+@pytest.mark.slow
+@pytest.mark.parametrize('number_of_envs, prioritized_replay', [(1, False), (2, True)])
+def test_resumed_training_matches_uninterrupted_training(number_of_envs, prioritized_replay):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_rl: AttrDict = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	config_rl.replay_start_size = 100
+	config_rl.sync_target_frames = 100
+	config_rl.prioritized_replay = prioritized_replay
+	trainers = [q_learning_training.QLearningTrainer(
+		circular_market.CircularEconomyRebuyPriceDuopoly, QLearningAgent, config_market, config_rl, random_generator=5) for _ in range(2)]
+	# the only checkpoint is written after 400 transitions, in the middle of an episode
+	trainers[0].train_agent(600, number_of_envs=number_of_envs, checkpoint_interval=400, number_of_workers=1)
+	checkpoint_path = os.path.join(trainers[0].callback.save_path, q_learning_training.QLearningTrainer.checkpoint_file)
+	trainers[1].train_agent(600, number_of_envs=number_of_envs, resume_from=checkpoint_path, number_of_workers=1)
+
+	uninterrupted_agent, resumed_agent = trainers[0].callback.model, trainers[1].callback.model
+	assert trainers[1].callback.save_path == trainers[0].callback.save_path
+	for parameter, resumed_parameter in zip(uninterrupted_agent.net.parameters(), resumed_agent.net.parameters()):
+		assert torch.equal(parameter, resumed_parameter)
+	assert resumed_agent.buffer.position == uninterrupted_agent.buffer.position
+	assert trainers[1].callback.watcher.all_dicts == trainers[0].callback.watcher.all_dicts
+	assert trainers[1].callback.num_timesteps == trainers[0].callback.num_timesteps
+
+	with pytest.raises(AssertionError) as assertion_message:
+		trainers[1].train_agent(500, number_of_envs=number_of_envs, resume_from=checkpoint_path, number_of_workers=1)
+	assert 'the checkpoint was written by a training with other parameters' in str(assertion_message.value)
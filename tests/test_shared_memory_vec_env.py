@@ -0,0 +1,151 @@
+import os
+
+import gym
+import numpy as np
+import pytest
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+import recommerce.market.linear.linear_sim_market as linear_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.metrics import MetricsInfo
+from recommerce.rl.environment_pool import create_marketplace_factories
+from recommerce.rl.q_learning.q_learning_agent import QLearningAgent
+from recommerce.rl.stable_baselines.sb_ppo import StableBaselinesPPO
+from recommerce.rl.stable_baselines.shared_memory_vec_env import SharedMemoryVecEnv
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+
+vec_env_testcases = [
+	(circular_market.CircularEconomyRebuyPriceDuopoly, False),
+	(circular_market.CircularEconomyRebuyPriceDuopoly, True),
+	(linear_market.LinearEconomyOligopoly, False)
+]
+
+
+def create_actions(marketplace, number_of_envs):
+	return np.array([marketplace.action_space.sample() for _ in range(number_of_envs)])
+
+
+def get_market_action(marketplace, actions, env_index):
+	return tuple(actions[env_index].tolist()) if isinstance(marketplace.action_space, gym.spaces.Tuple) else actions[env_index]
+
+
+@pytest.mark.parametrize('market_class, support_continuous_action_space', vec_env_testcases)
+def test_vec_env_matches_local_copies(market_class, support_continuous_action_space):
+	marketplace = market_class(config=config_market, support_continuous_action_space=support_continuous_action_space)
+	factories = create_marketplace_factories(marketplace, 3, random_generator=8)
+	local_copies = [factory() for factory in factories]
+	vec_env = SharedMemoryVecEnv(factories, start_method='fork')
+	try:
+		assert vec_env.num_envs == 3
+		assert vec_env.observation_space == marketplace.observation_space and vec_env.action_space == marketplace.action_space
+		observations = vec_env.reset()
+		assert np.array_equal(observations, np.array([local_copy.reset() for local_copy in local_copies]))
+		for _ in range(config_market.episode_length):
+			actions = create_actions(marketplace, 3)
+			observations, rewards, dones, infos = vec_env.step(actions)
+			for env_index, local_copy in enumerate(local_copies):
+				observation, reward, done, info = local_copy.step(get_market_action(marketplace, actions, env_index))
+				if done:
+					assert np.array_equal(infos[env_index]['terminal_observation'], observation)
+					observation = local_copy.reset()
+				assert np.array_equal(observations[env_index], observation)
+				assert rewards[env_index] == np.float32(reward)
+				assert dones[env_index] == done
+				assert isinstance(infos[env_index], MetricsInfo)
+				assert infos[env_index].schema == marketplace.get_metrics_schema()
+				assert np.array_equal(infos[env_index].row, info.row)
+		assert dones.all()
+	finally:
+		vec_env.close()
+
+
+def test_vec_env_forwards_attributes_and_methods():
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	vec_env = SharedMemoryVecEnv(create_marketplace_factories(marketplace, 2), start_method='fork')
+	try:
+		assert vec_env.get_attr('step_counter') == [0, 0]
+		vec_env.step(create_actions(marketplace, 2))
+		vec_env.set_attr('step_counter', 7, indices=1)
+		assert vec_env.get_attr('step_counter') == [1, 7]
+		assert vec_env.env_method('get_observations_dimension') == [marketplace.get_observations_dimension()] * 2
+		assert vec_env.seed(3) == [[3], [4]]
+		assert vec_env.env_is_wrapped(gym.Wrapper) == [False, False]
+	finally:
+		vec_env.close()
+	assert vec_env.closed
+
+
+def test_vec_env_with_default_start_method():
+	marketplace = circular_market.CircularEconomyRebuyPriceMonopoly(config=config_market)
+	vec_env = SharedMemoryVecEnv(create_marketplace_factories(marketplace, 2))
+	try:
+		assert vec_env.reset().shape == (2, marketplace.get_observations_dimension())
+	finally:
+		vec_env.close()
+
+
+def test_copies_need_rule_based_competitors():
+	config_rl = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	q_learning_config = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	competitor = QLearningAgent(config_market, q_learning_config, circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market))
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, competitors=[competitor])
+	with pytest.raises(AssertionError) as assertion_message:
+		StableBaselinesPPO(config_market, config_rl, marketplace, number_of_envs=2)
+	assert 'only possible with rule-based competitors' in str(assertion_message.value)
+
+
+def test_loaded_agent_starts_no_workers(tmp_path):
+	config_rl = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True)
+	model_path = os.path.join(tmp_path, 'model.zip')
+	StableBaselinesPPO(config_market, config_rl, marketplace).model.save(model_path)
+	agent = StableBaselinesPPO(config_market, config_rl, marketplace, load_path=model_path, number_of_envs=2)
+	assert agent.training_env is None
+
+
+def test_set_marketplace_with_several_environments():
+	config_rl = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	agent = StableBaselinesPPO(config_market, config_rl,
+		circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True), number_of_envs=2)
+	worker_processes = agent.training_env.pool.processes
+	new_marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True)
+	agent.set_marketplace(new_marketplace)
+	assert agent.marketplace is new_marketplace and agent.training_env is None
+	assert not any(process.is_alive() for process in worker_processes)
+
+	q_learning_config = HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	competitor = QLearningAgent(config_market, q_learning_config, circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market))
+	with pytest.raises(AssertionError) as assertion_message:
+		agent.set_marketplace(circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, competitors=[competitor]))
+	assert 'only possible with rule-based competitors' in str(assertion_message.value)
+
+
+@pytest.mark.training
+@pytest.mark.slow
+def test_training_after_set_marketplace_keeps_the_environments():
+	config_rl = HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO)
+	config_rl.n_steps = 256
+	agent = StableBaselinesPPO(config_market, config_rl,
+		circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True), number_of_envs=2)
+	agent.set_marketplace(circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True))
+	watcher = agent.train_agent(512, analyze_after_training=False)
+	assert agent.model.n_envs == agent.model.rollout_buffer.n_envs == watcher.number_envs == 2
+	assert agent.training_env is None
+
+
+@pytest.mark.training
+@pytest.mark.slow
+def test_ppo_training_on_several_environments():
+	agent = StableBaselinesPPO(
+		config_market,
+		HyperparameterConfigLoader.load('sb_ppo_config', StableBaselinesPPO),
+		circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market, support_continuous_action_space=True),
+		number_of_envs=4
+	)
+	worker_processes = agent.training_env.pool.processes
+	watcher = agent.train_agent(2000, 30)
+	assert watcher.number_envs == 4
+	assert len(watcher.all_dicts) >= 4
+	assert agent.training_env is None and not any(process.is_alive() for process in worker_processes)
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 import utils_tests as ut_t
 from attrdict import AttrDict
@@ -72,6 +73,97 @@ def test_unique_output_dict(marketclass):
 	assert id(info_dict_1) != id(info_dict_2)
 
 
+@pytest.mark.parametrize('marketclass', market_classes)
+def test_vendor_arrays_are_reused(marketclass):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	market = marketclass(config=config_market)
+	vendor_specific_state = market.get_vendor_specific_state()
+	vendor_actions = market.get_vendor_actions()
+	assert vendor_specific_state.shape[0] == vendor_actions.shape[0] == market._get_number_of_vendors()
+	market.step(ut_t.create_mock_action(marketclass))
+	market.reset()
+	assert market.get_vendor_specific_state() is vendor_specific_state
+	assert market.get_vendor_actions() is vendor_actions
+
+
+@pytest.mark.parametrize('marketclass', market_classes)
+def test_seeded_markets_are_reproducible(marketclass):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	markets = [marketclass(config=config_market, random_generator=13) for _ in range(2)]
+	assert (markets[0]._observation() == markets[1]._observation()).all()
+	for _ in range(10):
+		action = ut_t.create_mock_action(marketclass)
+		(first_observation, first_reward, _, first_info), (second_observation, second_reward, _, second_info) = \
+			(market.step(action) for market in markets)
+		assert (first_observation == second_observation).all()
+		assert first_reward == second_reward
+		assert first_info.to_dict() == second_info.to_dict()
+
+
+@pytest.mark.parametrize('marketclass', market_classes)
+def test_seed_makes_markets_reproducible(marketclass):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	markets = [marketclass(config=config_market) for _ in range(2)]
+	for market in markets:
+		competitor_random_generators = [competitor.random_generator for competitor in market.competitors]
+		assert market.seed(21) == [21]
+		assert all(competitor.random_generator is not competitor_random_generator
+			for competitor, competitor_random_generator in zip(market.competitors, competitor_random_generators))
+		market.reset()
+	for _ in range(10):
+		action = ut_t.create_mock_action(marketclass)
+		(first_observation, _, _, first_info), (second_observation, _, _, second_info) = (market.step(action) for market in markets)
+		assert (first_observation == second_observation).all()
+		assert first_info.to_dict() == second_info.to_dict()
+
+
+def concatenate_observation(market, vendor_view):
+	observations = [market._get_common_state_array()] if market.config.common_state_visibility else []
+	observations.append(market.vendor_specific_state[vendor_view])
+	for vendor_index in range(market._get_number_of_vendors()):
+		if vendor_index != vendor_view:
+			observations.append(market.vendor_actions[vendor_index])
+			if market.config.opposite_own_state_visibility:
+				observations.append(market.vendor_specific_state[vendor_index])
+	return np.concatenate(observations, dtype=np.float32)
+
+
+@pytest.mark.parametrize('market_class, config_market', market_combinations)
+def test_observation_indices_match_concatenated_views(market_class, config_market):
+	market = market_class(config=config_market)
+	for _ in range(3):
+		market.step(ut_t.create_mock_action(market_class))
+		for vendor_view in range(market._get_number_of_vendors()):
+			observation = market._observation(vendor_view)
+			assert observation.dtype == np.float32
+			assert np.array_equal(observation, concatenate_observation(market, vendor_view))
+
+
+@pytest.mark.parametrize('marketclass', market_classes)
+def test_set_state_restores_the_market(marketclass):
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	market = marketclass(config=config_market)
+	market.step(ut_t.create_mock_action(marketclass))
+	state = market.get_state()
+	observation = market._observation()
+	trajectories = []
+	for _ in range(2):
+		market.set_state(state)
+		assert (market._observation() == observation).all()
+		trajectories.append([market.step(ut_t.create_mock_action(marketclass))[3].to_dict() for _ in range(5)])
+	assert trajectories[0] == trajectories[1]
+	assert state['step_counter'] == 1
+
+
+def test_get_possible_rl_agents():
+	possible_agents = circular_market.CircularEconomyRebuyPriceDuopoly.get_possible_rl_agents()
+	assert 'recommerce.rl.q_learning.q_learning_agent.QLearningAgent' in possible_agents
+	assert 'recommerce.rl.q_learning.tabular_q_learning_agent.TabularQLearningAgent' in possible_agents
+	assert possible_agents == sorted(possible_agents) and len(possible_agents) == len(set(possible_agents))
+	for agent_str in possible_agents:
+		ut.get_class(agent_str)
+
+
 @pytest.mark.parametrize('market_class, config_market, agent_class, config_agent, continuos_action_space',
 	market_initialization_and_steps_testcases)
 def test_market_initialization_and_steps(market_class, config_market, agent_class, config_agent, continuos_action_space):
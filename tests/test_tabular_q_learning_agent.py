@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+import recommerce.rl.q_learning.q_learning_training as q_learning_training
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.configuration.path_manager import PathManager
+from recommerce.rl.q_learning.tabular_q_learning_agent import TabularQLearningAgent
+
+config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+config_rl: AttrDict = HyperparameterConfigLoader.load('tabular_q_learning_config', TabularQLearningAgent)
+
+
+def create_agent(marketplace_class=circular_market.CircularEconomyRebuyPriceMonopoly, **kwargs):
+	marketplace = marketplace_class(config=config_market)
+	return marketplace, TabularQLearningAgent(config_market=config_market, config_rl=config_rl, marketplace=marketplace, **kwargs)
+
+
+def test_discretize_observations():
+	marketplace, agent = create_agent()
+	low, high = marketplace.observation_space.low, marketplace.observation_space.high
+	assert agent.q_table.shape == (config_rl.number_of_bins ** len(low), marketplace.get_n_actions())
+	observations = np.array([low, high, high + 5, low - 1, (low + high) / 2])
+	rows = agent.discretize(observations)
+	assert rows[0] == rows[3] == 0
+	assert rows[1] == rows[2] == agent.q_table.shape[0] - 1
+	assert rows[4] == np.ravel_multi_index((config_rl.number_of_bins // 2,) * len(low), agent.table_shape)
+
+
+def test_policy_batch_is_greedy():
+	marketplace, agent = create_agent()
+	observations = np.array([marketplace.observation_space.sample() for _ in range(10)])
+	rows = agent.discretize(observations)
+	agent.q_table[rows, 17] = 1
+	assert np.array_equal(agent.policy_batch(observations, raw_action=True), np.full(10, 17))
+	assert agent.policy(observations[0]) == agent.agent_output_to_market_form(17)
+	assert agent.buffer_for_feedback[1] == 17
+
+
+def test_update_batch_applies_all_transitions():
+	marketplace, agent = create_agent()
+	observation = marketplace.observation_space.low
+	states = np.array([observation] * 3)
+	loss, selected_q_values, td_errors = agent.update_batch(states, [4, 4, 5], [1.0, 1.0, 2.0], [False, False, True], states)
+	row = agent.discretize(states[:1])[0]
+	assert agent.q_table[row, 4] == pytest.approx(2 * config_rl.learning_rate)
+	assert agent.q_table[row, 5] == pytest.approx(2 * config_rl.learning_rate)
+	assert np.allclose(td_errors, [1, 1, 2]) and loss == pytest.approx(2) and selected_q_values == 0
+	agent.synchronize_tgt_net()
+	assert np.array_equal(agent.tgt_q_table, agent.q_table)
+
+
+def test_save_and_load(tmp_path):
+	marketplace, agent = create_agent()
+	agent.q_table[:] = np.random.random(agent.q_table.shape)
+	model_path = os.path.join(tmp_path, 'table.dat')
+	agent.save(model_path)
+	_, loaded_agent = create_agent(load_path=model_path)
+	assert np.array_equal(loaded_agent.q_table, agent.q_table)
+	assert not loaded_agent.is_training
+	with pytest.raises(AssertionError) as assertion_message:
+		agent.save(os.path.join(tmp_path, 'table.npy'))
+	assert 'the modelname must end in ".dat"' in str(assertion_message.value)
+
+
+def test_too_large_table():
+	large_config_rl = AttrDict(config_rl, number_of_bins=30)
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	with pytest.raises(AssertionError) as assertion_message:
+		TabularQLearningAgent(config_market=config_market, config_rl=large_config_rl, marketplace=marketplace)
+	assert 'reduce number_of_bins' in str(assertion_message.value)
+
+
+@pytest.mark.training
+@pytest.mark.slow
+@pytest.mark.parametrize('number_of_envs', [1, 3])
+def test_training_with_trainer(number_of_envs):
+	trainer = q_learning_training.QLearningTrainer(
+		marketplace_class=circular_market.CircularEconomyRebuyPriceMonopoly,
+		agent_class=TabularQLearningAgent,
+		config_market=config_market,
+		config_rl=config_rl
+		)
+	trainer.train_agent(600, number_of_envs=number_of_envs)
+	assert np.any(trainer.callback.model.q_table != 0)
+	assert os.path.abspath(trainer.callback.save_path).startswith(os.path.abspath(PathManager.results_path))
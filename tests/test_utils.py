@@ -45,6 +45,40 @@ def test_softmax(input_array: np.array, expected: np.array):
 	assert np.allclose(ut.softmax(input_array), expected)
 
 
+def test_softmax_batched():
+	preferences = np.array([[3., 4., 1., 10., 3., -1.], [1., 1., 1., 1., 1., 1.]])
+	probabilities = ut.softmax(preferences)
+	assert probabilities.shape == preferences.shape
+	assert np.allclose(probabilities[0], ut.softmax(preferences[0]))
+	assert np.allclose(probabilities[1], np.ones(6) / 6)
+
+
+def test_get_random_generator():
+	random_generator = np.random.default_rng()
+	assert ut.get_random_generator(random_generator) is random_generator
+	assert isinstance(ut.get_random_generator(), np.random.Generator)
+	assert ut.get_random_generator(3).random() == ut.get_random_generator(np.random.SeedSequence(3)).random()
+	with pytest.raises(AssertionError) as assertion_message:
+		ut.get_random_generator(0.5)
+	assert 'random_generator must be a np.random.Generator' in str(assertion_message.value)
+
+
+@pytest.mark.parametrize('parent', [5, np.random.SeedSequence(5)])
+def test_spawn_random_generators_is_reproducible(parent):
+	first_children = ut.spawn_random_generators(5, 3)
+	second_children = ut.spawn_random_generators(parent, 3)
+	assert len(first_children) == 3
+	first_numbers = [child.random() for child in first_children]
+	assert first_numbers == [child.random() for child in second_children]
+	assert len(set(first_numbers)) == 3
+
+
+def test_spawn_random_generators_from_generator():
+	children_a = ut.spawn_random_generators(np.random.default_rng(11), 2)
+	children_b = ut.spawn_random_generators(np.random.default_rng(11), 2)
+	assert [child.integers(1000000) for child in children_a] == [child.integers(1000000) for child in children_b]
+
+
 testcases_shuffle_from_probabilities = [
 	np.array([0.1, 0.2, 0.3, 0.4, 0.5]),
 	np.array([0.1, 0.2, 0.3, 0.3, 0.01, 0.05, 0.04]),
@@ -57,6 +91,35 @@ def test_shuffle_from_probabilities(probabilities: np.array):
 	assert ut.shuffle_from_probabilities(probabilities) < len(probabilities)
 
 
+def test_sample_from_probabilities_follows_probabilities():
+	probabilities = np.tile(np.array([[0.2, 0., 0.5, 0.3], [0., 0., 0., 1.]], dtype=np.float32), (5000, 1))
+	indices = ut.sample_from_probabilities(probabilities, np.random.default_rng(3))
+	assert indices.shape == (10000,)
+	assert np.all(indices[1::2] == 3)
+	frequencies = np.bincount(indices[::2], minlength=4) / 5000
+	assert frequencies[1] == 0
+	assert np.allclose(frequencies, [0.2, 0., 0.5, 0.3], atol=0.03)
+
+
+def test_sample_from_probabilities_is_reproducible():
+	probabilities = np.random.dirichlet(np.ones(1000), size=20)
+	assert np.array_equal(ut.sample_from_probabilities(probabilities, np.random.default_rng(1)),
+		ut.sample_from_probabilities(probabilities, np.random.default_rng(1)))
+
+
+@pytest.mark.parametrize('max_price', [2, 10])
+@pytest.mark.parametrize('actions_dimension', [1, 2, 3])
+def test_decode_discrete_actions(max_price, actions_dimension):
+	actions = np.arange(max_price ** actions_dimension)
+	decoded_actions = ut.decode_discrete_actions(actions, max_price, actions_dimension)
+	for action, decoded_action in zip(actions, decoded_actions):
+		prices = []
+		for _ in range(actions_dimension):
+			prices.append(action % max_price)
+			action = action // max_price
+		assert list(reversed(prices)) == np.atleast_1d(decoded_action).tolist()
+
+
 testcases_cartesian_product = [
 	([2, 3, 4], [5, 6], [(2, 5), (2, 6), (3, 5), (3, 6), (4, 5), (4, 6)]),
 	([7, 5], [9, 4], [(7, 9), (7, 4), (5, 9), (5, 4)]),
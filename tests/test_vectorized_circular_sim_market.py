@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from attrdict import AttrDict
+
+import recommerce.market.circular.circular_sim_market as circular_market
+from recommerce.configuration.hyperparameter_config import HyperparameterConfigLoader
+from recommerce.market.circular.vectorized_circular_sim_market import VectorizedCircularEconomyRebuyPrice
+
+market_classes = [
+	circular_market.CircularEconomyRebuyPriceMonopoly,
+	circular_market.CircularEconomyRebuyPriceDuopoly,
+	circular_market.CircularEconomyRebuyPriceOligopoly
+]
+
+
+def create_config(opposite_own_state_visibility=True, common_state_visibility=True) -> AttrDict:
+	config_market: AttrDict = HyperparameterConfigLoader.load('market_config', circular_market.CircularEconomyRebuyPriceMonopoly)
+	config_market.opposite_own_state_visibility = opposite_own_state_visibility
+	config_market.common_state_visibility = common_state_visibility
+	return config_market
+
+
+class DeterministicRandomGenerator():
+	"""
+	Replaces the multinomial sampling by a deterministic rounding of the expected values, so single and batched markets can be compared.
+	"""
+	def multinomial(self, n, pvals):
+		pvals = np.asarray(pvals)
+		n = np.broadcast_to(np.asarray(n), pvals.shape[:-1])
+		counts = np.floor(n[..., None] * pvals).astype(np.int64)
+		np.put_along_axis(counts, np.argmax(pvals, axis=-1)[..., None],
+			np.take_along_axis(counts, np.argmax(pvals, axis=-1)[..., None], axis=-1) + (n - counts.sum(axis=-1))[..., None], axis=-1)
+		return counts
+
+
+def copy_state_to_single_market(vectorized_market, market, market_index):
+	market.in_circulation = int(vectorized_market.in_circulation[market_index])
+	market.vendor_specific_state[:, 0] = vectorized_market.in_storage[market_index]
+	market.vendor_actions[:] = vectorized_market.vendor_actions[market_index]
+
+
+def test_initial_state_within_bounds():
+	vectorized_market = VectorizedCircularEconomyRebuyPrice(create_config(), circular_market.CircularEconomyRebuyPriceOligopoly, 64)
+	observations = vectorized_market.reset()
+	assert observations.shape == (64, vectorized_market.get_observations_dimension())
+	assert all(vectorized_market.observation_space.contains(observation) for observation in observations)
+	assert np.all(vectorized_market.in_storage >= 0) and np.all(vectorized_market.in_storage <= vectorized_market.max_storage)
+
+
+@pytest.mark.parametrize('market_class', market_classes)
+@pytest.mark.parametrize('opposite_own_state_visibility, common_state_visibility',
+	[(True, True), (True, False), (False, True), (False, False)])
+def test_observations_match_single_market(market_class, opposite_own_state_visibility, common_state_visibility):
+	config_market = create_config(opposite_own_state_visibility, common_state_visibility)
+	vectorized_market = VectorizedCircularEconomyRebuyPrice(config_market, market_class, 8)
+	vectorized_market.vendor_actions[:] = np.random.randint(0, config_market.max_price, vectorized_market.vendor_actions.shape)
+	market = market_class(config_market)
+	for vendor_view in range(vectorized_market._number_of_vendors):
+		observations = vectorized_market._observation(vendor_view)
+		for market_index in range(vectorized_market.number_of_markets):
+			copy_state_to_single_market(vectorized_market, market, market_index)
+			assert np.array_equal(observations[market_index], market._observation(vendor_view))
+
+
+@pytest.mark.parametrize('market_class', market_classes)
+def test_probabilities_match_single_market(market_class):
+	config_market = create_config()
+	vectorized_market = VectorizedCircularEconomyRebuyPrice(config_market, market_class, 8)
+	vectorized_market.vendor_actions[:] = np.random.randint(0, config_market.max_price, vectorized_market.vendor_actions.shape)
+	market = market_class(config_market)
+	purchase_probabilities = vectorized_market._purchase_probabilities()
+	return_probabilities = vectorized_market._return_probabilities()
+	for market_index in range(vectorized_market.number_of_markets):
+		copy_state_to_single_market(vectorized_market, market, market_index)
+		assert np.allclose(purchase_probabilities[market_index], market._customer.generate_purchase_probabilities_from_offer(
+			market._get_common_state_array(), market.vendor_specific_state, market.vendor_actions))
+		assert np.allclose(return_probabilities[market_index], market._owner.generate_return_probabilities_from_offer(
+			market._get_common_state_array(), market.vendor_specific_state, market.vendor_actions))
+
+
+@pytest.mark.parametrize('market_class', market_classes)
+def test_steps_match_single_market(market_class):
+	config_market = create_config()
+	vectorized_market = VectorizedCircularEconomyRebuyPrice(config_market, market_class, 4)
+	vectorized_market._random_generator = DeterministicRandomGenerator()
+	markets = [market_class(config_market) for _ in range(vectorized_market.number_of_markets)]
+	for market_index, market in enumerate(markets):
+		market._random_generator = DeterministicRandomGenerator()
+		copy_state_to_single_market(vectorized_market, market, market_index)
+
+	for _ in range(5):
+		actions = np.random.randint(0, config_market.max_price, (vectorized_market.number_of_markets, 3))
+		observations, rewards, dones, infos = vectorized_market.step(actions)
+		for market_index, market in enumerate(markets):
+			observation, reward, done, market_info = market.step(tuple(actions[market_index].tolist()))
+			assert np.array_equal(observations[market_index], observation)
+			assert rewards[market_index] == pytest.approx(reward)
+			assert dones[market_index] == done
+			assert infos[market_index].keys() == market_info.keys()
+			for name, content in market_info.items():
+				assert infos[market_index][name] == pytest.approx(content), name
+
+
+def test_episode_finishes_for_all_markets():
+	config_market = create_config()
+	vectorized_market = VectorizedCircularEconomyRebuyPrice(config_market, circular_market.CircularEconomyRebuyPriceDuopoly, 16)
+	actions = np.tile([3, 6, 2], (16, 1))
+	for _ in range(config_market.episode_length - 1):
+		observations, _, dones, _ = vectorized_market.step(actions)
+		assert not np.any(dones)
+		assert np.all(vectorized_market.in_circulation >= 0) and np.all(vectorized_market.in_circulation <= vectorized_market.max_circulation)
+		assert np.all(vectorized_market.in_storage >= 0) and np.all(vectorized_market.in_storage <= vectorized_market.max_storage)
+	_, _, dones, _ = vectorized_market.step(actions)
+	assert np.all(dones)
+
+
+def test_invalid_actions():
+	vectorized_market = VectorizedCircularEconomyRebuyPrice(create_config(), circular_market.CircularEconomyRebuyPriceMonopoly, 2)
+	with pytest.raises(AssertionError) as assertion_message:
+		vectorized_market.step(np.array([[3, 6, 2]]))
+	assert 'actions must have the shape' in str(assertion_message.value)
+	with pytest.raises(AssertionError) as assertion_message:
+		vectorized_market.step(np.array([[3, 6, 2], [3, 60, 2]]))
+	assert 'the actions must be valid prices' in str(assertion_message.value)
+
+
+def test_seeded_batches_are_reproducible():
+	config_market = create_config()
+	vectorized_markets = [
+		VectorizedCircularEconomyRebuyPrice(config_market, circular_market.CircularEconomyRebuyPriceDuopoly, 8, random_generator=42)
+		for _ in range(2)]
+	actions = np.tile([3, 6, 2], (8, 1))
+	for _ in range(5):
+		first_step, second_step = (vectorized_market.step(actions) for vectorized_market in vectorized_markets)
+		assert np.array_equal(first_step[0], second_step[0])
+		assert np.array_equal(first_step[1], second_step[1])
+
+
+def test_only_rebuy_markets_supported():
+	with pytest.raises(AssertionError) as assertion_message:
+		VectorizedCircularEconomyRebuyPrice(create_config(), circular_market.CircularEconomyMonopoly, 2)
+	assert 'must be a subclass of CircularEconomyRebuyPrice' in str(assertion_message.value)
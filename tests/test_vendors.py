@@ -21,6 +21,7 @@ abstract_agent_classes_testcases = [
 	vendors.HumanPlayer,
 	vendors.RuleBasedAgent,
 	vendors.FixedPriceAgent,
+	circular_vendors.CompilableRuleBasedAgent,
 	ReinforcementLearningAgent
 ]
 
@@ -215,3 +216,91 @@ def test_get_competitors_prices():
 	for competitor in range(len(competitors_new_prices)):
 		assert competitors_refurbished_prices[competitor] == observation[(competitor * 4) + 2]
 		assert competitors_new_prices[competitor] == observation[(competitor * 4) + 3]
+
+
+compilable_agent_classes_testcases = [
+	circular_vendors.RuleBasedCEAgent,
+	circular_vendors.RuleBasedCERebuyAgent,
+	circular_vendors.RuleBasedCERebuyAgentCompetitive,
+	circular_vendors.RuleBasedCERebuyAgentStorageMinimizer
+]
+
+
+@pytest.mark.parametrize('agent_class', compilable_agent_classes_testcases)
+@pytest.mark.parametrize('number_of_competitors', [1, 2, 3])
+def test_compiled_policy_matches_policy(agent_class, number_of_competitors):
+	compiled_agent = agent_class(config_market=config_market, compiled=True)
+	agent = agent_class(config_market=config_market)
+	assert compiled_agent._policy_table is not None and agent._policy_table is None
+	for _ in range(200):
+		observation = [random.randint(0, 1000), random.randint(0, config_market.max_storage)]
+		for _ in range(number_of_competitors):
+			observation += list(random.randint(0, config_market.max_price, 3)) + [random.randint(0, config_market.max_storage)]
+		observation = np.array(observation, dtype=np.float32)
+		assert compiled_agent.policy(observation) == agent.policy(observation)
+
+
+@pytest.mark.parametrize('agent_class', compilable_agent_classes_testcases)
+def test_compiled_policy_table_is_shared(agent_class):
+	assert agent_class(config_market=config_market, compiled=True)._policy_table is \
+		agent_class(config_market=config_market, compiled=True)._policy_table
+
+
+def test_compiled_policy_not_used_for_continuous_action_space():
+	agent = circular_vendors.RuleBasedCERebuyAgentCompetitive(config_market=config_market, continuous_action_space=True, compiled=True)
+	assert agent._policy_table is None
+
+
+@pytest.mark.parametrize('values', [[3], [1, 2], [4, 1, 7], [2, 9, 5, 5], [0.5, 3.25, 8.0, 1.75, 6.5]])
+@pytest.mark.parametrize('quantile', [0, 0.25, 0.5, 0.75, 1])
+def test_linear_quantile(values, quantile):
+	assert circular_vendors._linear_quantile(values, quantile) == np.quantile(values, quantile)
+
+
+def create_random_circular_observations(number_of_observations, number_of_competitors):
+	observations = []
+	for _ in range(number_of_observations):
+		observation = [random.randint(0, 1000), random.randint(0, config_market.max_storage)]
+		for _ in range(number_of_competitors):
+			observation += list(random.randint(0, config_market.max_price, 3)) + [random.randint(0, config_market.max_storage)]
+		observations.append(observation)
+	return np.array(observations, dtype=np.float32)
+
+
+policy_batch_agent_testcases = [testcase[0] for testcase in fixed_price_agent_observation_policy_pairs_testcases] + \
+	[agent_class(config_market=config_market, compiled=compiled)
+		for agent_class in compilable_agent_classes_testcases for compiled in [False, True]]
+
+
+@pytest.mark.parametrize('agent', policy_batch_agent_testcases)
+def test_policy_batch_matches_policy(agent):
+	observations = create_random_circular_observations(20, 2)
+	actions = agent.policy_batch(observations)
+	assert len(actions) == 20
+	for observation, action in zip(observations, actions):
+		assert np.array_equal(action, agent.policy(observation))
+
+
+def test_random_agent_policy_batch():
+	agent = linear_vendors.LERandomAgent(config_market=config_market)
+	actions = agent.policy_batch(np.zeros((50, 4)))
+	assert actions.shape == (50,)
+	assert ((actions > config_market.production_price) & (actions < config_market.max_price)).all()
+
+
+@pytest.mark.parametrize('epsilon', [0, 1])
+def test_qlearning_policy_batch(epsilon):
+	marketplace = circular_market.CircularEconomyRebuyPriceDuopoly(config=config_market)
+	agent = QLearningAgent(
+		marketplace=marketplace,
+		config_market=config_market,
+		config_rl=HyperparameterConfigLoader.load('q_learning_config', QLearningAgent)
+	)
+	observations = np.array([marketplace.observation_space.sample() for _ in range(10)])
+	actions = agent.policy_batch(observations, epsilon)
+	assert actions.shape == (10, 3)
+	assert all(marketplace.action_space.contains(tuple(action.tolist())) for action in actions)
+	if epsilon == 0:
+		for observation, action in zip(observations, actions):
+			assert tuple(action.tolist()) == agent.policy(observation)
+			agent.buffer_for_feedback = None
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alpha_business_app', '0016_alter_simmarketconfig_common_state_visibility_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rlconfig',
+            name='prioritized_replay',
+            field=models.BooleanField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alpha_business_app', '0017_rlconfig_prioritized_replay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rlconfig',
+            name='number_of_bins',
+            field=models.IntegerField(default=None, null=True),
+        ),
+    ]
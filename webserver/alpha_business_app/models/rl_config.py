@@ -22,6 +22,8 @@ class RlConfig(AbstractConfig, models.Model):
 	n_epochs = models.IntegerField(null=True, default=None)
 	n_steps = models.IntegerField(null=True, default=None)
 	neurones_per_hidden_layer = models.IntegerField(null=True, default=None)
+	number_of_bins = models.IntegerField(null=True, default=None)
+	prioritized_replay = models.BooleanField(null=True, default=None)
 	replay_size = models.IntegerField(null=True, default=None)
 	replay_start_size = models.IntegerField(null=True, default=None)
 	sync_target_frames = models.IntegerField(null=True, default=None)
@@ -129,6 +129,8 @@ EMPTY_STRUCTURE_CONFIG = {
 					'clip_range': None,
 					'gamma': None,
 					'neurones_per_hidden_layer': None,
+					'number_of_bins': None,
+					'prioritized_replay': None,
 					'replay_start_size': None,
 					'learning_starts': None,
 					'ent_coef': None,
@@ -155,6 +155,8 @@ class ConfigModelParserTest(TestCase):
 		assert hyperparameter_rl_config.tau is None
 		assert hyperparameter_rl_config.clip_range is None
 		assert hyperparameter_rl_config.neurones_per_hidden_layer is None
+		assert hyperparameter_rl_config.number_of_bins is None
+		assert hyperparameter_rl_config.prioritized_replay is None
 		assert hyperparameter_rl_config.ent_coef is None
 		assert hyperparameter_rl_config.buffer_size is None
 		assert hyperparameter_rl_config.learning_starts is None
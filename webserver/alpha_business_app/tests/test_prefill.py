@@ -43,6 +43,8 @@ class ConfigMergerTest(TestCase):
 		expected_dict['hyperparameter']['rl']['tau'] = None
 		expected_dict['hyperparameter']['rl']['clip_range'] = None
 		expected_dict['hyperparameter']['rl']['neurones_per_hidden_layer'] = None
+		expected_dict['hyperparameter']['rl']['number_of_bins'] = None
+		expected_dict['hyperparameter']['rl']['prioritized_replay'] = None
 		expected_dict['hyperparameter']['rl']['ent_coef'] = None
 		expected_dict['hyperparameter']['rl']['buffer_size'] = None
 		expected_dict['hyperparameter']['rl']['learning_starts'] = None
@@ -144,6 +146,8 @@ class ConfigMergerTest(TestCase):
 					'tau': None,
 					'clip_range': None,
 					'neurones_per_hidden_layer': None,
+					'number_of_bins': None,
+					'prioritized_replay': None,
 					'ent_coef': None,
 					'buffer_size': None,
 					'learning_starts': None
@@ -186,6 +190,8 @@ class ConfigMergerTest(TestCase):
 					'tau': None,
 					'clip_range': None,
 					'neurones_per_hidden_layer': None,
+					'number_of_bins': None,
+					'prioritized_replay': None,
 					'ent_coef': None,
 					'buffer_size': None,
 					'learning_starts': None
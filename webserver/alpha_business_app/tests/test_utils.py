@@ -37,6 +37,8 @@ class UtilsTest(TestCase):
 					'clip_range': None,
 					'gamma': None,
 					'neurones_per_hidden_layer': None,
+					'number_of_bins': None,
+					'prioritized_replay': None,
 					'replay_start_size': None,
 					'learning_starts': None,
 					'ent_coef': None,
@@ -97,6 +99,8 @@ class UtilsTest(TestCase):
 			('gamma', float),
 			('learning_rate', float),
 			('neurones_per_hidden_layer', int),
+			('number_of_bins', int),
+			('prioritized_replay', bool),
 			('sync_target_frames', int),
 			('batch_size', int)
 		}